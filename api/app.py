@@ -1,16 +1,77 @@
-from flask import Flask, jsonify, request
+from flask import Flask, jsonify, request, Response, stream_with_context
 from flask_sqlalchemy import SQLAlchemy
+import io
+import json
 import os
+import sqlite3
+import sys
+import zlib
 
 # Configuración de la API
 basedir = os.path.abspath(os.path.dirname(__file__))
+
+# Las métricas Prometheus son compartidas con el agente y el dashboard (app_riesgo_academico/metricas.py)
+sys.path.insert(0, os.path.join(basedir, '..', 'app_riesgo_academico'))
+from metricas import instrumentar_flask, servir_metricas_worker  # noqa: E402
+
 app = Flask(__name__)
+# Latencia por ruta y GET /metrics en formato Prometheus
+instrumentar_flask(app, 'comovoy_api')
 
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(basedir, 'comovoy.db')
+# COMOVOY_DATABASE_URI permite apuntar a otra base (por ejemplo, las cohortes sintéticas de los benchmarks)
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get(
+    'COMOVOY_DATABASE_URI', 'sqlite:///' + os.path.join(basedir, 'comovoy.db')
+)
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
 db = SQLAlchemy(app)
 
+# Configuración de cada conexión SQLite. WAL permite que las lecturas largas del agente (carga completa,
+# páginas columnares) corran en paralelo con las escrituras de la API sin bloquearse mutuamente;
+# con WAL, synchronous=NORMAL solo sincroniza en los checkpoints y sigue siendo consistente ante caídas.
+PRAGMAS_SQLITE = (
+    'journal_mode=WAL',
+    'synchronous=NORMAL',
+    'cache_size=-65536',       # 64 MB de cache de páginas por conexión (valor negativo = KB)
+    'mmap_size=268435456',     # lecturas de hasta 256 MB del archivo vía mmap
+    'temp_store=MEMORY',       # ordenamientos y GROUP BY temporales en memoria
+    'busy_timeout=5000',       # espera el lock de escritura en vez de fallar de inmediato
+)
+
+
+def configurar_sqlite(conexion_dbapi, registro_conexion):
+    """
+    Aplica PRAGMAS_SQLITE a cada conexión nueva del pool (solo si la base es SQLite).
+    """
+    if not isinstance(conexion_dbapi, sqlite3.Connection):
+        return
+    cursor = conexion_dbapi.cursor()
+    for pragma in PRAGMAS_SQLITE:
+        cursor.execute(f'PRAGMA {pragma}')
+    cursor.close()
+
+
+with app.app_context():
+    db.event.listen(db.engine, 'connect', configurar_sqlite)
+
+# Tamaño de los lotes leídos desde la BD al transmitir la respuesta y límite máximo por página
+TAMANO_LOTE = 500
+LIMITE_MAXIMO = 5000
+# Las páginas columnares (.npz) pueden ser más grandes: el costo por fila es mucho menor que en JSON
+LIMITE_MAXIMO_COLUMNAR = 100000
+
+# Compresión gzip de las respuestas JSON y .npz cuando el cliente la acepta
+NIVEL_GZIP = 5
+TAMANO_MINIMO_GZIP = 1024
+TIPOS_COMPRIMIBLES = ('application/json', 'application/octet-stream')
+
+# Máximo de actualizaciones por PATCH /estudiantes y tamaño de los IN (...) (límite de variables de SQLite)
+MAX_ACTUALIZACIONES = 20000
+LOTE_IDS = 900
+
+# Columnas por las que se puede agrupar o filtrar en /estudiantes/agregados (las más consultadas tienen índice)
+COLUMNAS_AGRUPABLES = ('Carrera', 'Jornada', 'Aprobado', 'Genero', 'Region', 'Via_Ingreso', 'Rama_Educacional', 'Dependencia')
+
 class Estudiante(db.Model):
     """
     Modelo de SQLAlchemy que define la estructura de la tabla estudiantes con todos los campos que lo definen.
@@ -19,7 +80,7 @@ class Estudiante(db.Model):
     __tablename__ = 'estudiantes'
     id = db.Column(db.Integer, primary_key=True)
 
-    Aprobado = db.Column(db.Integer)  # 0 = Reprobado, 1 = Aprobado
+    Aprobado = db.Column(db.Integer, index=True)  # 0 = Reprobado, 1 = Aprobado
     Nota_final = db.Column(db.Integer)
     C1 = db.Column(db.Integer)
     C2 = db.Column(db.Integer)
@@ -54,8 +115,8 @@ class Estudiante(db.Model):
     # Campos Categóricos/Demográficos (object)
     Genero = db.Column(db.String(10))
     Region = db.Column(db.String(50))
-    Carrera = db.Column(db.String(100))
-    Jornada = db.Column(db.String(20))
+    Carrera = db.Column(db.String(100), index=True)
+    Jornada = db.Column(db.String(20), index=True)
     Via_Ingreso = db.Column(db.String(50))
     Rama_Educacional = db.Column(db.String(50))
     Dependencia = db.Column(db.String(50))
@@ -74,6 +135,9 @@ class Estudiante(db.Model):
     Nota_Test_Ingreso = db.Column(db.Float)
     LAWSON_PRE = db.Column(db.Float)
 
+    # Versión de fila: valor del contador global en la última escritura (feed de cambios)
+    version = db.Column(db.Integer, nullable=False, default=1, index=True)
+
     def to_dict(self):
         """
         Serialización del objeto Estudiante a un diccionario.
@@ -82,14 +146,380 @@ class Estudiante(db.Model):
         return {c.name: getattr(self, c.name) for c in self.__table__.columns}
 
 
+class EstudianteEliminado(db.Model):
+    """
+    Registro (tombstone) de estudiantes eliminados, para que el feed de cambios pueda informarlos.
+    """
+
+    __tablename__ = 'estudiantes_eliminados'
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, index=True)
+
+
+class ContadorVersion(db.Model):
+    """
+    Contador global y monótono de versiones. Tiene una sola fila (id = 1).
+    """
+
+    __tablename__ = 'contador_version'
+    id = db.Column(db.Integer, primary_key=True)
+    valor = db.Column(db.Integer, nullable=False, default=1)
+
+
+def reservar_version():
+    """
+    Incrementa el contador global dentro de la transacción actual y retorna la nueva versión.
+    El UPDATE toma el lock de escritura de SQLite, por lo que las versiones se confirman en orden.
+    """
+    tabla = ContadorVersion.__table__
+    db.session.execute(tabla.update().where(tabla.c.id == 1).values(valor=tabla.c.valor + 1))
+    return db.session.execute(db.select(tabla.c.valor).where(tabla.c.id == 1)).scalar_one()
+
+
+def version_actual():
+    """
+    Retorna la última versión confirmada (marca de agua del feed de cambios).
+    """
+    tabla = ContadorVersion.__table__
+    return db.session.execute(db.select(tabla.c.valor).where(tabla.c.id == 1)).scalar_one()
+
+
+def asegurar_esquema():
+    """
+    Crea las tablas faltantes y migra bases existentes que no tienen la columna de versión
+    ni los índices del modelo (create_all no agrega índices a tablas que ya existen).
+    Debe llamarse dentro de un app_context.
+    """
+    db.create_all()
+    columnas = {c['name'] for c in db.inspect(db.engine).get_columns('estudiantes')}
+    if 'version' not in columnas:
+        db.session.execute(db.text('ALTER TABLE estudiantes ADD COLUMN version INTEGER NOT NULL DEFAULT 1'))
+    db.session.commit()
+
+    for indice in Estudiante.__table__.indexes:
+        indice.create(db.engine, checkfirst=True)
+    # Estadísticas para que el planificador elija los índices nuevos
+    db.session.execute(db.text('PRAGMA optimize'))
+
+    if db.session.get(ContadorVersion, 1) is None:
+        maximo = db.session.execute(db.select(db.func.max(Estudiante.version))).scalar() or 1
+        db.session.add(ContadorVersion(id=1, valor=maximo))
+    db.session.commit()
+
+
+def parsear_campos(parametro):
+    """
+    Valida la proyección de columnas pedida en ?fields=. El id siempre se incluye porque es el cursor.
+    :param parametro: lista de columnas separadas por coma (o None para todas)
+    :return: (lista de columnas, mensaje de error o None)
+    """
+    columnas = Estudiante.__table__.columns
+    if not parametro:
+        return [c.name for c in columnas], None
+
+    campos = ['id']
+    for campo in parametro.split(','):
+        campo = campo.strip()
+        if not campo or campo in campos:
+            continue
+        if campo not in columnas:
+            return None, f'campo "{campo}" no válido para el estudiante'
+        campos.append(campo)
+    return campos, None
+
+
+def parsear_entero(nombre, defecto=None):
+    """
+    Lee un parámetro entero no negativo de la query string. A diferencia de request.args.get(type=int),
+    un valor que no se puede convertir es un error y no se reemplaza en silencio por el valor por defecto.
+    :return: (valor o `defecto` si el parámetro no viene, mensaje de error o None)
+    """
+    texto = request.args.get(nombre)
+    if texto is None:
+        return defecto, None
+    try:
+        valor = int(texto)
+    except ValueError:
+        return None, f'{nombre} debe ser un entero no negativo'
+    if valor < 0:
+        return None, f'{nombre} debe ser un entero no negativo'
+    return valor, None
+
+
+def iterar_filas(campos, after_id=0, limite=None, condicion=None):
+    """
+    Recorre la tabla por keyset (id > cursor) en lotes de TAMANO_LOTE, devolviendo tuplas crudas
+    sin construir objetos ORM. Cada lote es una consulta corta, así no se mantiene un cursor abierto.
+    `condicion` es un filtro adicional opcional (por ejemplo, un rango de versiones).
+    """
+    tabla = Estudiante.__table__
+    seleccion = [tabla.c[campo] for campo in campos]
+    cursor = after_id
+    restantes = limite
+
+    while restantes is None or restantes > 0:
+        tamano = TAMANO_LOTE if restantes is None else min(TAMANO_LOTE, restantes)
+        consulta = db.select(*seleccion).where(tabla.c.id > cursor).order_by(tabla.c.id).limit(tamano)
+        if condicion is not None:
+            consulta = consulta.where(condicion)
+        filas = db.session.connection().execute(consulta).all()
+        if not filas:
+            return
+        for fila in filas:
+            yield fila
+        cursor = filas[-1][0]
+        if restantes is not None:
+            restantes -= len(filas)
+        if len(filas) < tamano:
+            return
+
+
+def generar_json(campos, filas, cierre=None):
+    """
+    Escribe la respuesta JSON de forma incremental. Sin `cierre` produce un arreglo
+    (formato histórico de /estudiantes); con `cierre` produce un objeto {"estudiantes": [...], **cierre}
+    donde `cierre` es una función evaluada al terminar de recorrer las filas.
+    """
+    yield '[' if cierre is None else '{"estudiantes": ['
+    primero = True
+    for fila in filas:
+        registro = json.dumps(dict(zip(campos, fila)))
+        yield registro if primero else ',' + registro
+        primero = False
+    if cierre is None:
+        yield ']'
+    else:
+        yield '], ' + json.dumps(cierre())[1:]
+
+
 # Rutas de la API
 @app.route('/estudiantes', methods=['GET'])
 def get_estudiantes():
     """
-    Ruta para obtener la lista completa de estudiantes.
+    Ruta para obtener la lista de estudiantes como respuesta transmitida.
+    Parámetros opcionales:
+    - fields: columnas a incluir separadas por coma (id siempre se incluye)
+    - after_id: cursor, retorna solo estudiantes con id mayor al indicado
+    - limit: tamaño de página; si se entrega, la respuesta es {"estudiantes": [...], "siguiente_after_id": id}
+      donde siguiente_after_id es null cuando no quedan más páginas
+    - since: feed de cambios, retorna {"estudiantes": [...], "eliminados": [ids], "version": marca}
+      con las filas modificadas/eliminadas en versiones posteriores a `since`. Usar since=0 para la carga inicial
+      y luego enviar la `version` recibida en la siguiente consulta. Si `since` es mayor que la versión vigente
+      (la base se regeneró y el contador volvió a empezar) responde 410 y el cliente debe recargar todo.
     """
-    estudiantes = Estudiante.query.all()
-    return jsonify([e.to_dict() for e in estudiantes])
+    campos, error = parsear_campos(request.args.get('fields'))
+    if error:
+        return jsonify({'error': error}), 400
+
+    after_id, error = parsear_entero('after_id', 0)
+    if error:
+        return jsonify({'error': error}), 400
+    limite, error = parsear_entero('limit')
+    if error or (limite is not None and not 0 < limite <= LIMITE_MAXIMO):
+        return jsonify({'error': f'limit debe estar entre 1 y {LIMITE_MAXIMO}'}), 400
+
+    since, error = parsear_entero('since')
+    if error:
+        return jsonify({'error': error}), 400
+    if since is not None:
+        if limite is not None:
+            return jsonify({'error': 'since no se puede combinar con limit'}), 400
+        return feed_cambios(campos, since)
+
+    if limite is None:
+        cuerpo = generar_json(campos, iterar_filas(campos, after_id))
+    else:
+        pagina = {'ultimo_id': None, 'total': 0}
+
+        def recorrer():
+            for fila in iterar_filas(campos, after_id, limite):
+                pagina['ultimo_id'] = fila[0]
+                pagina['total'] += 1
+                yield fila
+
+        def cierre():
+            completa = pagina['total'] == limite
+            return {'siguiente_after_id': pagina['ultimo_id'] if completa else None}
+
+        cuerpo = generar_json(campos, recorrer(), cierre)
+
+    return Response(stream_with_context(cuerpo), mimetype='application/json')
+
+
+def feed_cambios(campos, since):
+    """
+    Respuesta transmitida del feed de cambios. La marca de agua se lee al inicio y las filas se
+    acotan a ella: lo escrito durante la transmisión queda con una versión mayor y llega en la siguiente consulta.
+    """
+    marca = version_actual()
+    if since > marca:
+        return jsonify({'error': f'since ({since}) es posterior a la versión vigente; se requiere una carga completa',
+                        'version': marca}), 410
+    condicion = Estudiante.version.between(since + 1, marca)
+
+    def cierre():
+        consulta = db.select(EstudianteEliminado.id).where(EstudianteEliminado.version.between(since + 1, marca))
+        eliminados = db.session.execute(consulta).scalars().all()
+        return {'eliminados': eliminados, 'version': marca}
+
+    cuerpo = generar_json(campos, iterar_filas(campos, condicion=condicion), cierre)
+    return Response(stream_with_context(cuerpo), mimetype='application/json')
+
+
+def exportar_columnar(campos, resultado, n, version):
+    """
+    Construye un archivo NumPy .npz con una entrada por columna: enteros como int64 (float64 si hay nulos),
+    decimales como float64 y textos codificados como diccionario ('<col>__codigos' int32, -1 = nulo, y
+    '<col>__categorias'). '__columnas__' guarda el orden y '__version__' la marca del feed de cambios.
+    Las filas de `resultado` (a lo más n) se leen por bloques de TAMANO_LOTE con fetchmany y se copian
+    directo a arreglos preasignados por columna, sin armar la tabla completa como tuplas de Python.
+    :return: (buffer con el .npz, cantidad de filas, id de la última fila o None)
+    """
+    # numpy solo se necesita en este endpoint; importarlo aquí evita su costo en el arranque de cada worker
+    import numpy as np
+
+    tabla = Estudiante.__table__
+    tipos = [tabla.c[campo].type.python_type for campo in campos]
+    columnas = [
+        np.empty(n, dtype=np.int32 if tipo is str else np.int64 if tipo is int else np.float64)
+        for tipo in tipos
+    ]
+    categorias = [{} if tipo is str else None for tipo in tipos]
+
+    inicio = 0
+    while inicio < n:
+        filas = resultado.fetchmany(min(TAMANO_LOTE, n - inicio))
+        if not filas:
+            break
+        fin = inicio + len(filas)
+        for j, valores in enumerate(zip(*filas)):
+            if categorias[j] is not None:
+                vistas = categorias[j]
+                columnas[j][inicio:fin] = np.fromiter(
+                    (-1 if v is None else vistas.setdefault(v, len(vistas)) for v in valores),
+                    dtype=np.int32, count=len(filas)
+                )
+                continue
+            if None in valores and columnas[j].dtype == np.int64:
+                # Primer nulo en una columna entera: se pasa a float64 para representarlo como NaN
+                columnas[j] = columnas[j].astype(np.float64)
+            columnas[j][inicio:fin] = np.array(valores, dtype=columnas[j].dtype)
+        inicio = fin
+    resultado.close()
+
+    arreglos = {'__columnas__': np.array(campos), '__version__': np.array(version)}
+    for campo, columna, vistas in zip(campos, columnas, categorias):
+        if vistas is None:
+            arreglos[campo] = columna[:inicio]
+        else:
+            arreglos[f'{campo}__codigos'] = columna[:inicio]
+            arreglos[f'{campo}__categorias'] = np.array(list(vistas), dtype=str)
+
+    buffer = io.BytesIO()
+    np.savez(buffer, **arreglos)
+    # El id es siempre la primera columna (parsear_campos)
+    return buffer, inicio, int(columnas[0][inicio - 1]) if inicio else None
+
+
+@app.route('/estudiantes.npz', methods=['GET'])
+def get_estudiantes_columnar():
+    """
+    Ruta para exportar la tabla de estudiantes en formato columnar binario (NumPy .npz), pensada
+    para el agente de predicción. Acepta ?fields= igual que /estudiantes. Las filas se acotan a la
+    versión vigente al inicio (incluida en '__version__'), así el agente puede continuar con ?since=.
+    Paginación opcional:
+    - after_id y limit: página por cursor; el encabezado X-Siguiente-After-Id trae el cursor de la
+      página siguiente (ausente en la última)
+    - version: acota las filas a esa versión, para que todas las páginas de una carga correspondan a la
+      misma marca (la de la primera página); lo escrito después llega por el feed ?since=
+    """
+    campos, error = parsear_campos(request.args.get('fields'))
+    if error:
+        return jsonify({'error': error}), 400
+
+    after_id, error = parsear_entero('after_id', 0)
+    if error:
+        return jsonify({'error': error}), 400
+    limite, error = parsear_entero('limit')
+    if error or (limite is not None and not 0 < limite <= LIMITE_MAXIMO_COLUMNAR):
+        return jsonify({'error': f'limit debe estar entre 1 y {LIMITE_MAXIMO_COLUMNAR}'}), 400
+
+    marca, error = parsear_entero('version')
+    if error:
+        return jsonify({'error': error}), 400
+    if marca is None:
+        marca = version_actual()
+
+    # El conteo y la lectura van en la misma transacción, así ven la misma foto de la tabla
+    tabla = Estudiante.__table__
+    condicion = db.and_(tabla.c.id > after_id, tabla.c.version <= marca)
+    n = db.session.execute(db.select(db.func.count()).select_from(tabla).where(condicion)).scalar_one()
+    if limite is not None:
+        n = min(n, limite)
+    consulta = db.select(*(tabla.c[campo] for campo in campos)).where(condicion).order_by(tabla.c.id).limit(n)
+    buffer, filas, ultimo_id = exportar_columnar(campos, db.session.execute(consulta), n, marca)
+
+    respuesta = Response(buffer.getvalue(), mimetype='application/octet-stream')
+    if limite is not None and filas == limite:
+        respuesta.headers['X-Siguiente-After-Id'] = str(ultimo_id)
+    return respuesta
+
+
+def parsear_lista(parametro, validas, nombre):
+    """
+    Valida una lista de columnas separadas por coma contra `validas`.
+    :return: (lista sin repetidos, mensaje de error o None)
+    """
+    columnas = []
+    for columna in (parametro or '').split(','):
+        columna = columna.strip()
+        if not columna or columna in columnas:
+            continue
+        if columna not in validas:
+            return None, f'{nombre} "{columna}" no válido; opciones: {", ".join(validas)}'
+        columnas.append(columna)
+    return columnas, None
+
+
+@app.route('/estudiantes/agregados', methods=['GET'])
+def get_agregados():
+    """
+    Resumen por grupo calculado en SQL (GROUP BY), sin transferir las filas. Parámetros:
+    - group_by: columnas de agrupación separadas por coma (obligatorio), de COLUMNAS_AGRUPABLES
+    - promedios: columnas numéricas cuyo promedio se agrega como Promedio_<columna>
+    - <columna>=<valor>: filtros de igualdad opcionales sobre COLUMNAS_AGRUPABLES (por ejemplo Jornada=Diurna)
+    Cada grupo trae Total_Estudiantes, Aprobados y Tasa_Aprobacion (sobre los que tienen Aprobado informado).
+    """
+    tabla = Estudiante.__table__
+    grupos, error = parsear_lista(request.args.get('group_by'), COLUMNAS_AGRUPABLES, 'group_by')
+    if error:
+        return jsonify({'error': error}), 400
+    if not grupos:
+        return jsonify({'error': f'group_by es obligatorio; opciones: {", ".join(COLUMNAS_AGRUPABLES)}'}), 400
+
+    numericas = [c.name for c in tabla.columns if c.type.python_type in (int, float) and c.name not in ('id', 'version')]
+    promedios, error = parsear_lista(request.args.get('promedios'), numericas, 'promedios')
+    if error:
+        return jsonify({'error': error}), 400
+
+    consulta = db.select(
+        *(tabla.c[columna] for columna in grupos),
+        db.func.count().label('Total_Estudiantes'),
+        db.func.sum(tabla.c.Aprobado).label('Aprobados'),
+        db.func.avg(tabla.c.Aprobado).label('Tasa_Aprobacion'),
+        *(db.func.avg(tabla.c[columna]).label(f'Promedio_{columna}') for columna in promedios),
+    ).group_by(*(tabla.c[columna] for columna in grupos)).order_by(*(tabla.c[columna] for columna in grupos))
+
+    for columna in COLUMNAS_AGRUPABLES:
+        if columna in request.args:
+            valor = request.args.get(columna, type=tabla.c[columna].type.python_type)
+            if valor is None:
+                return jsonify({'error': f'valor no válido para {columna}'}), 400
+            consulta = consulta.where(tabla.c[columna] == valor)
+
+    marca = version_actual()
+    filas = db.session.execute(consulta).mappings().all()
+    return jsonify({'group_by': grupos, 'version': marca, 'grupos': [dict(fila) for fila in filas]})
 
 
 @app.route('/estudiante/<int:estudiante_id>', methods=['GET'])
@@ -119,12 +549,15 @@ def actualizar_estudiante(estudiante_id):
     if not datos_actualizacion:
         return jsonify({'error': 'No se entregaron datos para actualizar'}), 404
 
+    # id y version no se escriben desde el cliente: la versión la asigna reservar_version (feed de cambios)
+    campos_validos = {c.name for c in Estudiante.__table__.columns} - {'id', 'version'}
     for campo, valor in datos_actualizacion.items():
-        if hasattr(estudiante, campo):
+        if campo in campos_validos:
             setattr(estudiante, campo, valor)
         else:
             return jsonify({'error': f'campo "{campo}" no válido para el estudiante'}), 404
     try:
+        estudiante.version = reservar_version()
         db.session.commit()
         return jsonify({
             'mensaje': f'Datos actualizados correctamente para el estudiante {estudiante_id}',
@@ -133,7 +566,205 @@ def actualizar_estudiante(estudiante_id):
     except Exception as e:
         db.session.rollback()
         return  jsonify({'error': f'Error al guardar en la base de datos: {e}'}), 500
+
+
+def convertir_valor(columna, valor):
+    """
+    Valida un valor recibido por JSON contra el tipo Python de la columna, para no depender de la
+    afinidad de tipos de SQLite (que guardaría, por ejemplo, un texto en una columna Float).
+    Los booleanos se rechazan aunque en Python sean int; un float entero se acepta en columnas Integer.
+    :return: (valor convertido, mensaje de error o None)
+    """
+    if valor is None:
+        return None, None
+    tipo = columna.type.python_type
+    if tipo is str and isinstance(valor, str):
+        return valor, None
+    if tipo in (int, float) and isinstance(valor, (int, float)) and not isinstance(valor, bool):
+        if tipo is float:
+            return float(valor), None
+        if isinstance(valor, int) or valor.is_integer():
+            return int(valor), None
+    return None, f'valor no válido para {columna.name}: se esperaba {tipo.__name__}'
+
+
+@app.route('/estudiantes', methods=['PATCH'])
+def actualizar_estudiantes():
+    """
+    Ruta para actualizar muchos estudiantes en una sola petición y una sola transacción.
+    Recibe una lista de objetos {"id": ..., campo: valor, ...}. Los nombres de campo se validan una vez
+    contra las columnas de la tabla; las filas con el mismo conjunto de campos se escriben con un único
+    UPDATE executemany. Los valores se validan contra el tipo de cada columna; un id repetido en la misma
+    petición invalida todas sus filas (no se elige una en silencio).
+    Retorna el estado de cada fila: actualizado, no_encontrado o invalido.
+    """
+    actualizaciones = request.get_json(silent=True)
+    if not isinstance(actualizaciones, list) or not actualizaciones:
+        return jsonify({'error': 'Se esperaba una lista no vacía de actualizaciones'}), 400
+    if len(actualizaciones) > MAX_ACTUALIZACIONES:
+        return jsonify({'error': f'Máximo {MAX_ACTUALIZACIONES} actualizaciones por petición'}), 400
+
+    tabla = Estudiante.__table__
+    campos_validos = {c.name for c in tabla.columns} - {'id', 'version'}
+
+    campos_recibidos = set()
+    for fila in actualizaciones:
+        if isinstance(fila, dict):
+            campos_recibidos.update(fila)
+    campos_invalidos = campos_recibidos - campos_validos - {'id'}
+
+    apariciones = {}
+    for fila in actualizaciones:
+        if isinstance(fila, dict) and isinstance(fila.get('id'), int) and not isinstance(fila['id'], bool):
+            apariciones[fila['id']] = apariciones.get(fila['id'], 0) + 1
+
+    resultados = []
+    pendientes = {}
+    for fila in actualizaciones:
+        if not isinstance(fila, dict) or not isinstance(fila.get('id'), int) or isinstance(fila['id'], bool):
+            resultados.append({'id': fila.get('id') if isinstance(fila, dict) else None,
+                               'estado': 'invalido', 'error': 'falta un id entero'})
+            continue
+        if apariciones[fila['id']] > 1:
+            resultados.append({'id': fila['id'], 'estado': 'invalido', 'error': 'id repetido en la petición'})
+            continue
+        invalidos = campos_invalidos.intersection(fila)
+        if invalidos:
+            resultados.append({'id': fila['id'], 'estado': 'invalido',
+                               'error': f'campos no válidos para el estudiante: {sorted(invalidos)}'})
+            continue
+        if len(fila) == 1:
+            resultados.append({'id': fila['id'], 'estado': 'invalido', 'error': 'no se entregaron datos para actualizar'})
+            continue
+        convertida = {'id': fila['id']}
+        errores = []
+        for campo, valor in fila.items():
+            if campo != 'id':
+                convertida[campo], error = convertir_valor(tabla.c[campo], valor)
+                if error:
+                    errores.append(error)
+        if errores:
+            resultados.append({'id': fila['id'], 'estado': 'invalido', 'error': '; '.join(errores)})
+            continue
+        resultados.append({'id': fila['id'], 'estado': 'actualizado'})
+        pendientes[fila['id']] = convertida
+
+    ids = list(pendientes)
+    existentes = set()
+    for inicio in range(0, len(ids), LOTE_IDS):
+        consulta = db.select(tabla.c.id).where(tabla.c.id.in_(ids[inicio:inicio + LOTE_IDS]))
+        existentes.update(db.session.execute(consulta).scalars())
+
+    for resultado in resultados:
+        if resultado['estado'] == 'actualizado' and resultado['id'] not in existentes:
+            resultado['estado'] = 'no_encontrado'
+            pendientes.pop(resultado['id'], None)
+
+    if not pendientes:
+        return jsonify({'actualizados': 0, 'resultados': resultados})
+
+    # Agrupar por conjunto de campos: cada grupo es un UPDATE ... WHERE id = ? ejecutado con executemany
+    grupos = {}
+    for estudiante_id, fila in pendientes.items():
+        campos = tuple(sorted(c for c in fila if c != 'id'))
+        grupos.setdefault(campos, []).append(fila)
+
+    try:
+        version = reservar_version()
+        for campos, filas in grupos.items():
+            valores = {campo: db.bindparam(campo) for campo in campos}
+            valores['version'] = version
+            sentencia = tabla.update().where(tabla.c.id == db.bindparam('_id')).values(valores)
+            parametros = [{'_id': f['id'], **{campo: f[campo] for campo in campos}} for f in filas]
+            db.session.execute(sentencia, parametros)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Error al guardar en la base de datos: {e}'}), 500
+
+    return jsonify({'actualizados': len(pendientes), 'version': version, 'resultados': resultados})
+
+
+@app.route('/estudiante/<int:estudiante_id>', methods=['DELETE'])
+def eliminar_estudiante(estudiante_id):
+    """
+    Ruta para eliminar un estudiante. Deja un registro en estudiantes_eliminados para el feed de cambios.
+    """
+    estudiante = db.session.get(Estudiante, estudiante_id)
+    if estudiante is None:
+        return jsonify({'error': 'Estudiante no encontrado'}), 404
+
+    try:
+        db.session.delete(estudiante)
+        db.session.merge(EstudianteEliminado(id=estudiante_id, version=reservar_version()))
+        db.session.commit()
+        return jsonify({'mensaje': f'Estudiante {estudiante_id} eliminado correctamente'})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Error al guardar en la base de datos: {e}'}), 500
+
+
+def comprimir_flujo(trozos):
+    """
+    Comprime en gzip una respuesta transmitida a medida que se genera.
+    """
+    compresor = zlib.compressobj(NIVEL_GZIP, zlib.DEFLATED, 31)
+    try:
+        for trozo in trozos:
+            datos = compresor.compress(trozo.encode('utf-8') if isinstance(trozo, str) else trozo)
+            if datos:
+                yield datos
+        yield compresor.flush()
+    finally:
+        # Si el cliente corta la conexión, se cierra también el generador original (y su contexto)
+        if hasattr(trozos, 'close'):
+            trozos.close()
+
+
+@app.after_request
+def comprimir_respuesta(response):
+    """
+    Comprime con gzip las respuestas JSON y .npz si el cliente envía Accept-Encoding: gzip.
+    Las respuestas transmitidas se comprimen por trozos, sin armarlas completas en memoria.
+    """
+    if 'gzip' not in request.headers.get('Accept-Encoding', '').lower() \
+            or response.status_code != 200 or response.direct_passthrough \
+            or response.mimetype not in TIPOS_COMPRIMIBLES or 'Content-Encoding' in response.headers:
+        return response
+
+    if response.is_streamed:
+        response.response = comprimir_flujo(response.response)
+        response.headers.pop('Content-Length', None)
+    else:
+        datos = response.get_data()
+        if len(datos) < TAMANO_MINIMO_GZIP:
+            return response
+        response.set_data(zlib.compress(datos, NIVEL_GZIP, wbits=31))
+    response.headers['Content-Encoding'] = 'gzip'
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+@app.route('/health', methods=['GET'])
+def health():
+    """
+    Sonda de disponibilidad para el supervisor (app.py en la raíz): 200 si la base responde.
+    """
+    try:
+        db.session.execute(db.text('SELECT 1'))
+    except Exception as e:
+        return jsonify({'estado': 'error', 'detalle': str(e)}), 503
+    return jsonify({'estado': 'ok', 'pid': os.getpid()})
+
+
 if __name__ == '__main__':
-    with app.app_context():
-        db.create_all()
-    app.run(debug=True, port=5000)
\ No newline at end of file
+    from werkzeug.serving import make_server
+
+    # Con varios workers, el supervisor entrega el socket compartido (COMOVOY_SOCKET_FD) y solo el
+    # primer worker (COMOVOY_WORKER=0) migra el esquema, antes de que se inicien los demás
+    if os.environ.get('COMOVOY_WORKER', '0') == '0':
+        with app.app_context():
+            asegurar_esquema()
+    servir_metricas_worker()
+    fd = os.environ.get('COMOVOY_SOCKET_FD')
+    make_server('127.0.0.1', 5000, app, threaded=True, fd=int(fd) if fd else None).serve_forever()
\ No newline at end of file
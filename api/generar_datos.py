@@ -1,11 +1,14 @@
-from app import app, db, Estudiante
+from app import app, db, Estudiante, asegurar_esquema, reservar_version
 from faker import Faker
+import argparse
 import random
+import time
 import numpy as np
 
 fake = Faker('es_CL')
 NUM_REGISTROS = 100
 PROB_BAJO_RENDIMIENTO = 0.40
+TAMANO_LOTE = 50000
 
 GENEROS = ['Femenino', 'Masculino']
 REGIONES = [fake.city() for _ in range(16)]
@@ -15,6 +18,28 @@ VIAS_INGRESO = ['PSU_PTU', 'PACE', 'Talento Deportivo', 'Traslado']
 RAMAS_EDUCACIONALES = ['Científico Humanísta', 'Técnico Profesional']
 DEPENDENCIAS = ['Municipal', 'Particular Subvencionado', 'Particular Pagado']
 
+COLUMNAS_NOTAS = [
+    'C1', 'C2', 'CR', 'Prom_certamenes', 'Prom_cuestionarios',
+    'T_U1_U2', 'T_U3_U5', 'T_Listas', 'T_Texto_Archivos', 'Prom_tareas',
+    'Ctrl_U1', 'Ctrl_U2', 'Ctrl_U3_Ciclos', 'Ctrl_U5_Func', 'Ctrl_U6_Strings', 'Ctrl_U7',
+    'Ctrl_Diccionarios', 'Ctrl_U10', 'Prom_controles',
+    'TS_U1', 'TS_U2', 'TS_U3', 'TS_U5', 'TS_U6', 'TS_U7', 'TS_U8', 'Prom_tickets_salida',
+    'C1_R', 'C2_R'
+]
+COLUMNAS_PUNTAJES = [
+    'Puntaje_Ponderado', 'Puntaje_NEM', 'Puntaje_Ranking', 'Puntaje_Lenguaje', 'Puntaje_Mat_M1',
+    'Puntaje_Mat_M2', 'Puntaje_Historia', 'Puntaje_Ciencias', 'Nota_Test_Ingreso'
+]
+COLUMNAS_CATEGORICAS = {
+    'Genero': GENEROS,
+    'Region': REGIONES,
+    'Carrera': CARRERAS,
+    'Jornada': JORNADAS,
+    'Via_Ingreso': VIAS_INGRESO,
+    'Rama_Educacional': RAMAS_EDUCACIONALES,
+    'Dependencia': DEPENDENCIAS
+}
+
 def generar_notas(es_bajo_rendimiento):
     """
     Genera una nota entera con sesgo:
@@ -99,22 +124,110 @@ def generar_datos_estudiante(es_bajo_rendimiento):
         LAWSON_PRE=generar_float_rango(1.0, 100.0)
     )
 
-def poblar_db():
+def generar_lote(rng, n):
+    """
+    Genera n estudiantes de forma vectorizada con NumPy, con el mismo sesgo que generar_datos_estudiante:
+    las notas siguen la distribución triangular de generar_notas según el grupo de rendimiento.
+    :return: diccionario columna -> arreglo de largo n
+    """
+    bajo = rng.random(n) < PROB_BAJO_RENDIMIENTO
+
+    def notas():
+        # random.triangular(1, 100, 40) / random.triangular(60, 100, 80) -> rng.triangular(min, moda, max)
+        return rng.triangular(np.where(bajo, 1, 60), np.where(bajo, 40, 80), 100).astype(np.int64)
+
+    def float_rango(minimo, maximo, decimales=2):
+        return np.round(rng.uniform(minimo, maximo), decimales)
+
+    columnas = {'Nota_final': notas()}
+    columnas['Aprobado'] = (columnas['Nota_final'] >= 55).astype(np.int64)
+    for col in COLUMNAS_NOTAS:
+        columnas[col] = notas()
+
+    for col, valores in COLUMNAS_CATEGORICAS.items():
+        columnas[col] = np.asarray(valores, dtype=object)[rng.integers(0, len(valores), n)]
+
+    puntaje_base = np.where(bajo, rng.integers(300, 601, n), rng.integers(650, 951, n))
+    columnas['NEM'] = np.where(bajo, float_rango(np.full(n, 1.0), 5.0, 1), float_rango(np.full(n, 5.5), 7.0, 1))
+    columnas['Ano_Egreso'] = rng.integers(2015, 2025, n).astype(np.float64)
+    for col in COLUMNAS_PUNTAJES:
+        columnas[col] = float_rango(puntaje_base, puntaje_base + 100)
+    columnas['Puntaje_Mat_M2'] = np.where(rng.random(n) > 0.3, columnas['Puntaje_Mat_M2'], 100.0)
+    columnas['LAWSON_PRE'] = float_rango(np.full(n, 1.0), 100.0)
+
+    return columnas
+
+
+def poblar_db_vectorizado(num_registros, semilla=None, tamano_lote=TAMANO_LOTE):
+    """
+    Inserta num_registros estudiantes generados por lotes con NumPy, usando el insert() de SQLAlchemy Core
+    compilado una vez y ejecutado con executemany del driver (sin instancias ORM ni diccionarios por fila).
+    Cada lote se confirma por separado para acotar la memoria.
+    :return: filas por segundo
+    """
+    rng = np.random.default_rng(semilla)
+    tabla = Estudiante.__table__
+    version = reservar_version()
+
+    # Columnas en el orden de la tabla, que es el orden de los parámetros posicionales del INSERT compilado
+    nombres = [c.name for c in tabla.columns if c.name != 'id']
+    sentencia = tabla.insert().compile(dialect=db.engine.dialect, column_keys=nombres)
+    conexion = db.session.connection()
+
+    inicio = time.perf_counter()
+    insertados = 0
+    while insertados < num_registros:
+        n = min(tamano_lote, num_registros - insertados)
+        columnas = generar_lote(rng, n)
+        columnas['version'] = np.full(n, version)
+        # tolist() convierte a tipos nativos de Python, que es lo que espera el driver sqlite3
+        filas = list(zip(*(columnas[c].tolist() for c in sentencia.positiontup)))
+
+        conexion.exec_driver_sql(str(sentencia), filas)
+        db.session.commit()
+        conexion = db.session.connection()
+        insertados += n
+        print(f"Insertados {insertados}/{num_registros} estudiantes")
+
+    duracion = time.perf_counter() - inicio
+    filas_por_segundo = num_registros / duracion if duracion > 0 else float('inf')
+    print(f"Generación vectorizada: {num_registros} filas en {duracion:.2f}s ({filas_por_segundo:,.0f} filas/s)")
+    return filas_por_segundo
+
+
+def poblar_db(num_registros=NUM_REGISTROS, semilla=None, vectorizado=False, tamano_lote=TAMANO_LOTE):
     """
     Borra y recrea la base de datos con datos simulados y sesgados.
+    Con vectorizado=True usa poblar_db_vectorizado, pensado para cohortes de prueba de carga (1M filas).
     :return:
     """
 
     with app.app_context():
         db.drop_all()
-        db.create_all()
+        asegurar_esquema()
+
+        if vectorizado:
+            poblar_db_vectorizado(num_registros, semilla, tamano_lote)
+            return
+
+        if semilla is not None:
+            random.seed(semilla)
 
         estudiantes = []
-        for _ in range(NUM_REGISTROS):
+        for _ in range(num_registros):
             es_bajo_rendimiento = random.random() < PROB_BAJO_RENDIMIENTO
             estudiantes.append(generar_datos_estudiante(es_bajo_rendimiento))
 
         db.session.add_all(estudiantes)
         db.session.commit()
+
+
 if __name__ == '__main__':
-    poblar_db()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Genera la base de datos de estudiantes simulados.')
+    parser.add_argument('--registros', type=int, default=NUM_REGISTROS, help='Cantidad de estudiantes a generar')
+    parser.add_argument('--semilla', type=int, default=None, help='Semilla para datos reproducibles')
+    parser.add_argument('--vectorizado', action='store_true', help='Genera con NumPy por lotes e inserta con Core')
+    parser.add_argument('--lote', type=int, default=TAMANO_LOTE, help='Tamaño de lote del modo vectorizado')
+    args = parser.parse_args()
+
+    poblar_db(args.registros, args.semilla, args.vectorizado, args.lote)
@@ -1,54 +1,180 @@
 # /app.py (En la carpeta raíz del proyecto)
 
+import importlib.util
+import signal
 import subprocess
+import socket
 import time
 import os
 import sys
+import urllib.request
 
 # Definición de las rutas relativas de los scripts a ejecutar
 PYTHON_BIN = sys.executable
 
-API_SCRIPT = './api/app.py'  # Corregido de api_datos_universidad a api
-AGENTE_SCRIPT = './app_riesgo_academico/agente_prediccion.py'
-DASHBOARD_SCRIPT = './app_riesgo_academico/dashboard_web.py'
-
-# Puertos y secuencia de comandos
+RAIZ = os.path.dirname(os.path.abspath(__file__))
+API_SCRIPT = os.path.join(RAIZ, 'api', 'app.py')  # Corregido de api_datos_universidad a api
+AGENTE_SCRIPT = os.path.join(RAIZ, 'app_riesgo_academico', 'agente_prediccion.py')
+DASHBOARD_SCRIPT = os.path.join(RAIZ, 'app_riesgo_academico', 'dashboard_web.py')
+
+HOST = '127.0.0.1'
+# Workers por servicio HTTP; comparten un socket abierto por el supervisor y el kernel reparte las conexiones.
+# Sin herencia de descriptores (Windows) cada servicio corre con un solo worker que abre su propio puerto.
+WORKERS_HTTP = int(os.environ.get('COMOVOY_WORKERS', min(4, os.cpu_count() or 1))) if os.name == 'posix' else 1
+
+# Salida de cada worker: logs/<servicio>-<n>.log (se agrega al final en cada reinicio)
+LOGS_DIR = 'logs'
+
+# Espera máxima a que un servicio responda su sonda de salud y cada cuánto se consulta
+TIMEOUT_LISTO = 60
+INTERVALO_SONDEO = 0.25
+# Reinicio de workers caídos: espera BACKOFF_INICIAL * 2^fallos (hasta BACKOFF_MAXIMO); si el worker
+# alcanzó a correr SEGUNDOS_ESTABLE, el contador de fallos vuelve a cero
+BACKOFF_INICIAL = 1
+BACKOFF_MAXIMO = 60
+SEGUNDOS_ESTABLE = 30
+TIMEOUT_DETENCION = 5
+
+# Servicios por etapa: los de una etapa se inician juntos cuando los de la anterior ya responden su sonda.
+# 'cwd': el agente usa rutas relativas a su carpeta (modelo/, logs/, static/)
+# 'metricas': cada worker n expone sus métricas en metricas + n (COMOVOY_METRICAS_PUERTO). El /metrics del
+# puerto compartido lo responde cualquier worker, así que Prometheus debe tener como objetivos
+# 127.0.0.1:5100..5100+WORKERS_HTTP-1 (API), 127.0.0.1:5200..5200+WORKERS_HTTP-1 (dashboard) y
+# 127.0.0.1:5004 (agente, un solo proceso con su propio servidor de métricas).
 PROCESOS = [
-    {"name": "API de Datos (Puerto 5000)", "cmd": [PYTHON_BIN, API_SCRIPT], "delay": 5},
-    {"name": "Agente de Predicción", "cmd": [PYTHON_BIN, AGENTE_SCRIPT], "delay": 5},
-    {"name": "Dashboard Web (Puerto 5001)", "cmd": [PYTHON_BIN, DASHBOARD_SCRIPT], "delay": 2}
+    {"clave": "api", "name": "API de Datos (Puerto 5000)", "cmd": [PYTHON_BIN, API_SCRIPT],
+     "puerto": 5000, "workers": WORKERS_HTTP, "salud": f"http://{HOST}:5000/health", "etapa": 0,
+     "metricas": 5100},
+    {"clave": "agente", "name": "Agente de Predicción", "cmd": [PYTHON_BIN, AGENTE_SCRIPT],
+     "cwd": os.path.dirname(AGENTE_SCRIPT), "puerto": None, "workers": 1,
+     "salud": f"http://{HOST}:5004/metrics", "etapa": 1},
+    {"clave": "dashboard", "name": "Dashboard Web (Puerto 5001)", "cmd": [PYTHON_BIN, DASHBOARD_SCRIPT],
+     "puerto": 5001, "workers": WORKERS_HTTP, "salud": f"http://{HOST}:5001/health", "etapa": 1,
+     "metricas": 5200},
 ]
 
 
-def iniciar_proyecto_completo():
+def crear_socket_compartido(puerto):
     """
-    Inicia la API, el Agente y el Dashboard en paralelo.
+    Abre el socket de escucha que heredan todos los workers de un servicio.
     """
-    print("--- INICIANDO PROYECTO DE RIESGO ACADÉMICO ---")
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((HOST, puerto))
+    sock.listen(128)
+    sock.set_inheritable(True)
+    return sock
+
+
+def iniciar_worker(worker):
+    """
+    Lanza (o relanza) el proceso de un worker con su salida redirigida a su archivo de log.
+    """
+    servicio = worker['servicio']
+    entorno = dict(os.environ, PYTHONUNBUFFERED='1', COMOVOY_WORKER=str(worker['indice']))
+    if servicio.get('metricas'):
+        entorno['COMOVOY_METRICAS_PUERTO'] = str(servicio['metricas'] + worker['indice'])
+    descriptores = ()
+    if servicio.get('socket') is not None:
+        descriptores = (servicio['socket'].fileno(),)
+        entorno['COMOVOY_SOCKET_FD'] = str(descriptores[0])
+
+    with open(worker['log'], 'ab') as log:
+        log.write(f"\n=== {time.strftime('%d/%m/%Y %H:%M:%S')} inicio de {servicio['name']} (worker {worker['indice']}) ===\n".encode('utf-8'))
+        log.flush()
+        worker['proceso'] = subprocess.Popen(servicio['cmd'], stdout=log, stderr=subprocess.STDOUT,
+                                             cwd=servicio.get('cwd', RAIZ), env=entorno, pass_fds=descriptores)
+    worker['inicio'] = time.time()
+    worker['reinicio'] = None
+    print(f"[STATUS] '{servicio['name']}' worker {worker['indice']} iniciado con PID {worker['proceso'].pid} (log: {worker['log']})")
+
+
+def supervisar_workers(workers):
+    """
+    Detecta workers terminados y programa su reinicio con backoff exponencial; relanza los que ya cumplieron su espera.
+    """
+    ahora = time.time()
+    for worker in workers:
+        proceso = worker['proceso']
+        if proceso is not None and proceso.poll() is not None:
+            duracion = ahora - worker['inicio']
+            worker['fallos'] = 0 if duracion >= SEGUNDOS_ESTABLE else worker['fallos'] + 1
+            espera = min(BACKOFF_MAXIMO, BACKOFF_INICIAL * 2 ** worker['fallos'])
+            worker['proceso'] = None
+            worker['reinicio'] = ahora + espera
+            print(f"[CAÍDA] '{worker['servicio']['name']}' worker {worker['indice']} terminó con código {proceso.returncode} "
+                  f"tras {duracion:.0f}s. Reinicio en {espera}s (ver {worker['log']})")
+        elif proceso is None and worker['reinicio'] is not None and ahora >= worker['reinicio']:
+            iniciar_worker(worker)
+
+
+def responde_salud(url):
+    try:
+        with urllib.request.urlopen(url, timeout=1) as respuesta:
+            return respuesta.status == 200
+    except OSError:
+        return False
 
-    os.chdir(os.path.dirname(os.path.abspath(__file__)))
 
-    procesos_iniciados = []
+def esperar_listos(servicios, workers, timeout=TIMEOUT_LISTO):
+    """
+    Sondea la salud de los servicios (supervisando los workers mientras tanto) hasta que todos respondan o
+    venza el timeout.
+    :return: servicios que no quedaron listos
+    """
+    pendientes = list(servicios)
+    limite = time.time() + timeout
+    while pendientes and time.time() < limite:
+        supervisar_workers(workers)
+        for servicio in [s for s in pendientes if responde_salud(s['salud'])]:
+            print(f"[LISTO] '{servicio['name']}' responde en {servicio['salud']} ({time.time() - servicio['arranque']:.1f}s)")
+            pendientes.remove(servicio)
+        if pendientes:
+            time.sleep(INTERVALO_SONDEO)
+    return pendientes
 
-    for p in PROCESOS:
-        print(f"\n[INICIO] Ejecutando: {p['name']}...")
 
-        try:
-            proceso = subprocess.Popen(p['cmd'],
-                                       stdout=subprocess.DEVNULL,
-                                       stderr=subprocess.DEVNULL,
-                                       cwd=os.getcwd())
-            procesos_iniciados.append(proceso)
-            print(f"[STATUS] '{p['name']}' iniciado con PID {proceso.pid}. Esperando {p['delay']}s...")
-
-            time.sleep(p['delay'])
-
-        except Exception as e:
-            print(
-                f"[ERROR] Error al iniciar {p['name']}. Revise si el script existe y las librerías están instaladas: {e}")
-            detener_procesos(procesos_iniciados)
-            sys.exit(1)
+def iniciar_proyecto_completo():
+    """
+    Supervisor de la API, el Agente y el Dashboard. Cada servicio HTTP corre con WORKERS_HTTP procesos sobre
+    un socket compartido; el primer worker hace la preparación única (esquema de la BD, servidor SSE) y los demás
+    se lanzan cuando responde su sonda de salud. Los workers caídos se reinician con backoff.
+    """
+    print("--- INICIANDO PROYECTO DE RIESGO ACADÉMICO ---")
+
+    os.chdir(RAIZ)
+    os.makedirs(LOGS_DIR, exist_ok=True)
+
+    workers = []
+    inicio = time.time()
+    try:
+        for etapa in sorted({p['etapa'] for p in PROCESOS}):
+            servicios = [p for p in PROCESOS if p['etapa'] == etapa]
+            for servicio in servicios:
+                print(f"\n[INICIO] Ejecutando: {servicio['name']} ({servicio['workers']} worker(s))...")
+                servicio['socket'] = crear_socket_compartido(servicio['puerto']) if servicio['puerto'] and servicio['workers'] > 1 else None
+                servicio['workers_activos'] = [
+                    {'servicio': servicio, 'indice': i, 'proceso': None, 'inicio': None, 'reinicio': None, 'fallos': 0,
+                     'log': os.path.join(LOGS_DIR, f"{servicio['clave']}-{i}.log")}
+                    for i in range(servicio['workers'])
+                ]
+                workers.extend(servicio['workers_activos'])
+                servicio['arranque'] = time.time()
+                iniciar_worker(servicio['workers_activos'][0])
+
+            for servicio in esperar_listos(servicios, workers):
+                print(f"[ADVERTENCIA] '{servicio['name']}' no respondió en {TIMEOUT_LISTO}s; se sigue reintentando. "
+                      f"Revisa {servicio['workers_activos'][0]['log']}")
+            for servicio in servicios:
+                for worker in servicio['workers_activos'][1:]:
+                    iniciar_worker(worker)
+    except Exception as e:
+        print(
+            f"[ERROR] Error al iniciar los servicios. Revise si el script existe, el puerto está libre y las librerías están instaladas: {e}")
+        detener_procesos(workers)
+        sys.exit(1)
 
+    print(f"\n[STATUS] Servicios iniciados en {time.time() - inicio:.1f}s")
     dashboard_url = "http://127.0.0.1:5001/"
     print(f"\n[ABRIR] Abriendo Dashboard en: {dashboard_url}")
 
@@ -62,34 +188,49 @@ def iniciar_proyecto_completo():
     print("Mantén esta terminal abierta. Presiona Ctrl+C para detener todos los procesos.")
     try:
         while True:
-            time.sleep(1)
+            supervisar_workers(workers)
+            time.sleep(INTERVALO_SONDEO)
     except KeyboardInterrupt:
         print("\n[DETECCIÓN] Señal de detención (Ctrl+C) recibida.")
-        detener_procesos(procesos_iniciados)
+        detener_procesos(workers)
+
 
+def detener_por_senal(signum, frame):
+    """
+    SIGTERM (por ejemplo, desde un administrador de servicios) detiene el proyecto igual que Ctrl+C.
+    """
+    raise KeyboardInterrupt
 
-def detener_procesos(procesos):
+
+def detener_procesos(workers):
     """
-    Detiene todos los procesos iniciados.
+    Detiene todos los workers (terminate y, si no salen a tiempo, kill) y cierra los sockets compartidos.
     """
     print("\n--- DETENIENDO PROCESOS ---")
-    for p in procesos:
-        if p.poll() is None:
-            p.terminate()
+    activos = [w['proceso'] for w in workers if w['proceso'] is not None and w['proceso'].poll() is None]
+    for p in activos:
+        p.terminate()
+    for p in activos:
+        try:
+            p.wait(timeout=TIMEOUT_DETENCION)
+        except subprocess.TimeoutExpired:
+            p.kill()
             p.wait()
-            print(f"[DETENIDO] Proceso con PID {p.pid} terminado.")
+        print(f"[DETENIDO] Proceso con PID {p.pid} terminado.")
+
+    for servicio in PROCESOS:
+        if servicio.get('socket') is not None:
+            servicio['socket'].close()
 
     print("--- PROYECTO APAGADO ---")
 
 
 if __name__ == '__main__':
-    try:
-        import requests
-        import pandas
-        import joblib
-        import flask
-    except ImportError as e:
-        print(f"\n[ERROR CRÍTICO] Falta una librería esencial: {e.name}. Ejecuta: pip install -r requirements.txt")
-        sys.exit(1)
+    # Solo se verifica que estén instaladas: importarlas aquí retrasaría el arranque sin que el supervisor las use
+    for libreria in ('requests', 'pandas', 'joblib', 'flask'):
+        if importlib.util.find_spec(libreria) is None:
+            print(f"\n[ERROR CRÍTICO] Falta una librería esencial: {libreria}. Ejecuta: pip install -r requirements.txt")
+            sys.exit(1)
 
-    iniciar_proyecto_completo()
\ No newline at end of file
+    signal.signal(signal.SIGTERM, detener_por_senal)
+    iniciar_proyecto_completo()
@@ -1,37 +1,110 @@
+import io
+import sys
+import gzip
 import json
+import hashlib
+import queue
+import sqlite3
+import threading
 
-import requests
 import pandas as pd
-import joblib
 import time
 from datetime import datetime
 import os
 import numpy as np
 
+from metricas import medir_etapa, fijar, incrementar, servir_metricas
+from modelo_compilado import MODELO_COMPILADO_PATH, ModeloCompilado
+import historial_riesgo
+
 
 # Configuración general
-API_URL = "http://127.0.0.1:5000/"
+API_URL = "http://127.0.0.1:5000"
 ENDPOINT_ESTUDIANTES = "/estudiantes"
+ENDPOINT_ESTUDIANTES_COLUMNAR = "/estudiantes.npz"
 MODELO_PATH = 'modelo/comovoy.joblib'
-LOGS_CORREOS_PATH = 'logs/log_correos_simulados.txt'
+CACHE_PUNTAJES_PATH = 'modelo/cache_puntajes.npz'
+LOGS_ALERTAS_PATH = 'logs/log_alertas.jsonl'
+ESTADO_ALERTAS_PATH = 'logs/estado_alertas.pkl'
 CORREO_DESTINATARIO = 'docente@comovoy.cl'
 
 #UMBRAL_RIESGO_ALTO = 0.60
 #ALERTA_THRESHOLD = 0.50
+UMBRAL_RIESGO_MEDIO = 0.40
+UMBRAL_ALERTA = 0.75
+# Una alerta ya notificada se vuelve a anunciar (ESCALADA) solo si su IR sube al menos estos puntos
+DELTA_ESCALAMIENTO_IR = 5
+# Log de alertas JSONL: al superar el tamaño máximo se rota a .1, .2, ... conservando ARCHIVOS_LOG_ALERTAS respaldos
+TAMANO_MAXIMO_LOG_ALERTAS = 10 * 1024 * 1024
+ARCHIVOS_LOG_ALERTAS = 5
 
 REPORTE_DASHBOARD_PATH = 'static/dashboard_data.json'
 
+INTERVALO_CICLO_SEGUNDOS = 60
+
+# Conexiones HTTP: una sesión compartida con keep-alive, gzip, reintentos y timeouts (conexión, lectura)
+TIMEOUT_HTTP = (3.05, 60)
+REINTENTOS_HTTP = 2
+# Carga completa por páginas columnares: se puntúa cada página mientras se descargan las siguientes
+TAMANO_PAGINA_COLUMNAR = 20000
+PAGINAS_EN_COLA = 4
+# Procesos para puntuar cohortes grandes (puntuacion_paralela.ModeloParalelo); con 1 se predice en este proceso
+PROCESOS_PUNTUACION = int(os.environ.get('COMOVOY_PROCESOS_PUNTUACION', '1'))
+# Métricas del agente en formato Prometheus (GET /metrics)
+HOST_METRICAS = "127.0.0.1"
+PUERTO_METRICAS = 5004
+
+def crear_sesion_http():
+    """
+    Sesión HTTP que reutiliza conexiones entre consultas y ciclos, pide respuestas gzip y reintenta
+    con espera creciente las fallas transitorias (conexión rechazada, 502/503/504).
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    sesion = requests.Session()
+    reintentos = Retry(total=REINTENTOS_HTTP, backoff_factor=0.5, status_forcelist=(502, 503, 504),
+                       allowed_methods=('GET',))
+    adaptador = HTTPAdapter(pool_connections=2, pool_maxsize=PAGINAS_EN_COLA, max_retries=reintentos)
+    sesion.mount('http://', adaptador)
+    sesion.mount('https://', adaptador)
+    sesion.headers['Accept-Encoding'] = 'gzip'
+    return sesion
+
+
+# Se crea en la primera consulta: los procesos que solo usan las funciones de predicción (servicio_prediccion,
+# benchmarks) no cargan requests
+SESION_HTTP = None
+_sesion_lock = threading.Lock()
+
+
+def obtener_sesion_http():
+    global SESION_HTTP
+    if SESION_HTTP is None:
+        with _sesion_lock:
+            if SESION_HTTP is None:
+                SESION_HTTP = crear_sesion_http()
+    return SESION_HTTP
+
+
 def obtener_datos_de_api(url_base, endpoint):
     """
     Realiza una petición GET a la API para obtener una lista de estudiantes.
     """
+    import requests
+
     url_completa = url_base + endpoint
     print(f"[{datetime.now().strftime('%d/%m/%Y %H:%M:%S')}] Conectando a la API {url_completa}")
     try:
-        response = requests.get(url_completa)
-        response.raise_for_status()
-
-        datos_json = response.json()
+        with medir_etapa("descarga") as etapa:
+            response = obtener_sesion_http().get(url_completa, timeout=TIMEOUT_HTTP)
+            response.raise_for_status()
+            etapa["bytes"] = len(response.content)
+
+        with medir_etapa("decodificacion") as etapa:
+            datos_json = response.json()
+            etapa["filas"] = len(datos_json)
         print(f"[{datetime.now().strftime('%H:%M:%S')}] Datos recibidos correctamente desde la API. Total de estudiantes: {len(datos_json)}")
         return datos_json
     except requests.exceptions.ConnectionError:
@@ -42,6 +115,213 @@ def obtener_datos_de_api(url_base, endpoint):
         return None
 
 
+def leer_columnar(contenido):
+    """
+    Construye el DataFrame de estudiantes desde la exportación .npz de la API sin pasar por JSON:
+    las columnas numéricas se usan tal cual y los textos se arman como Categorical desde sus códigos.
+    :return: (DataFrame, versión del feed de cambios)
+    """
+    with np.load(io.BytesIO(contenido), allow_pickle=False) as archivo:
+        columnas = {}
+        for campo in archivo['__columnas__'].tolist():
+            if f'{campo}__codigos' in archivo:
+                columnas[campo] = pd.Categorical.from_codes(archivo[f'{campo}__codigos'], archivo[f'{campo}__categorias'])
+            else:
+                columnas[campo] = archivo[campo]
+        version = int(archivo['__version__'])
+    return pd.DataFrame(columnas, copy=False), version
+
+
+def obtener_datos_columnares(url_base, endpoint):
+    """
+    Descarga la tabla completa en formato columnar (.npz) y la convierte a DataFrame.
+    :return: (DataFrame, versión) o (None, None) si la consulta falla.
+    """
+    import requests
+
+    url_completa = url_base + endpoint
+    print(f"[{datetime.now().strftime('%d/%m/%Y %H:%M:%S')}] Conectando a la API {url_completa}")
+    try:
+        with medir_etapa("descarga") as etapa:
+            response = obtener_sesion_http().get(url_completa, timeout=TIMEOUT_HTTP)
+            response.raise_for_status()
+            etapa["bytes"] = len(response.content)
+
+        with medir_etapa("dataframe") as etapa:
+            df, version = leer_columnar(response.content)
+            etapa["filas"] = len(df)
+        print(f"[{datetime.now().strftime('%H:%M:%S')}] Datos columnares recibidos ({len(response.content)} bytes). "
+              f"Total de estudiantes: {len(df)}, versión {version}")
+        return df, version
+    except requests.exceptions.ConnectionError:
+        print(f"[{datetime.now().strftime('%H:%M:%S')}] ERROR: No se pudo conectar a la API")
+        return None, None
+    except requests.exceptions.RequestException as e:
+        print(f"[{datetime.now().strftime('%H:%M:%S')}] ERROR al obtener los datos de la API: {e}")
+        return None, None
+
+
+def obtener_pagina_columnar(url_base, endpoint, after_id, limite, version=None):
+    """
+    Descarga una página de la exportación columnar (?after_id=&limit=, acotada a `version` si se entrega).
+    :return: (DataFrame, versión, cursor de la página siguiente o None si es la última)
+    """
+    params = {'after_id': after_id, 'limit': limite}
+    if version is not None:
+        params['version'] = version
+
+    with medir_etapa("descarga") as etapa:
+        response = obtener_sesion_http().get(url_base + endpoint, params=params, timeout=TIMEOUT_HTTP)
+        response.raise_for_status()
+        etapa["bytes"] = len(response.content)
+
+    with medir_etapa("dataframe") as etapa:
+        df, version = leer_columnar(response.content)
+        etapa["filas"] = len(df)
+
+    siguiente = response.headers.get('X-Siguiente-After-Id')
+    return df, version, int(siguiente) if siguiente else None
+
+
+def unir_paginas(paginas):
+    """
+    Concatena páginas columnares. Cada página trae sus propias categorías, así que las columnas de
+    texto se vuelven a convertir a category después de unirlas.
+    """
+    if len(paginas) == 1:
+        return paginas[0]
+    categoricas = [col for col in paginas[0].columns if isinstance(paginas[0][col].dtype, pd.CategoricalDtype)]
+    df = pd.concat(paginas, ignore_index=True)
+    for col in categoricas:
+        df[col] = df[col].astype('category')
+    return df
+
+
+def cargar_y_puntuar_por_paginas(url_base, endpoint, modelo, cache):
+    """
+    Carga completa en etapas concurrentes unidas por colas acotadas: un hilo descarga páginas columnares,
+    otro las puntúa apenas llegan y el hilo que llama las acumula para publicarlas. Así la predicción de
+    la primera página se solapa con la descarga de las siguientes y el ciclo tarda cerca de la etapa más
+    lenta en vez de la suma de todas. Las colas (PAGINAS_EN_COLA) frenan la descarga si la predicción se
+    atrasa, lo que acota la memoria en tránsito.
+    El cache de puntajes se consulta por página y se reemplaza al final por la unión de las páginas.
+    :return: (df_datos, versión, df_riesgo) o (None, None, None) si alguna etapa falla
+    """
+    paginas_descargadas = queue.Queue(maxsize=PAGINAS_EN_COLA)
+    paginas_puntuadas = queue.Queue(maxsize=PAGINAS_EN_COLA)
+    estado = {'version': None, 'error': None}
+
+    def descargar():
+        after_id = 0
+        try:
+            while after_id is not None and estado['error'] is None:
+                df, estado['version'], after_id = obtener_pagina_columnar(
+                    url_base, endpoint, after_id, TAMANO_PAGINA_COLUMNAR, estado['version']
+                )
+                paginas_descargadas.put(df)
+        except Exception as e:
+            estado['error'] = e
+        finally:
+            paginas_descargadas.put(None)
+
+    def puntuar():
+        try:
+            # Se consume hasta el final aunque haya error, para no dejar bloqueada la descarga
+            while (pagina := paginas_descargadas.get()) is not None:
+                if estado['error'] is not None or pagina.empty:
+                    continue
+                cache_pagina = None if cache is None else {'puntajes': cache['puntajes']}
+                df_riesgo = calcular_indice_riesgo(pagina, modelo, cache=cache_pagina)
+                if df_riesgo.empty:
+                    estado['error'] = RuntimeError("falló la predicción de una página")
+                    continue
+                paginas_puntuadas.put((pagina, df_riesgo, cache_pagina))
+        finally:
+            paginas_puntuadas.put(None)
+
+    hilos = [threading.Thread(target=descargar, daemon=True), threading.Thread(target=puntuar, daemon=True)]
+    for hilo in hilos:
+        hilo.start()
+
+    paginas, resultados, puntajes, aciertos, fallos = [], [], [], 0, 0
+    while (item := paginas_puntuadas.get()) is not None:
+        pagina, df_riesgo, cache_pagina = item
+        paginas.append(pagina)
+        resultados.append(df_riesgo)
+        if cache_pagina is not None:
+            puntajes.append(cache_pagina['puntajes'])
+            aciertos += cache_pagina['aciertos']
+            fallos += cache_pagina['fallos']
+    for hilo in hilos:
+        hilo.join()
+
+    if estado['error'] is not None:
+        print(f"[{datetime.now().strftime('%H:%M:%S')}] ERROR en la carga por páginas: {estado['error']}")
+        return None, None, None
+    if not paginas:
+        return pd.DataFrame(), estado['version'], pd.DataFrame()
+
+    if cache is not None:
+        cache['puntajes'] = pd.concat(puntajes)
+        cache['aciertos'], cache['fallos'] = aciertos, fallos
+    df_datos = unir_paginas(paginas)
+    print(f"[{datetime.now().strftime('%H:%M:%S')}] Carga por páginas completa: {len(df_datos)} estudiantes "
+          f"en {len(paginas)} páginas, versión {estado['version']}")
+    return df_datos, estado['version'], pd.concat(resultados, ignore_index=True)
+
+
+def obtener_cambios_de_api(url_base, endpoint, version):
+    """
+    Consulta el feed de cambios de la API (?since=version).
+    Retorna un diccionario con 'estudiantes' (filas nuevas o modificadas), 'eliminados' (ids) y 'version'
+    (nueva marca de agua), {'recargar': True} si la API indica que la versión ya no es válida (la base se
+    regeneró) y hay que hacer una carga completa, o None si la consulta falla.
+    """
+    import requests
+
+    url_completa = url_base + endpoint
+    try:
+        with medir_etapa("descarga") as etapa:
+            response = obtener_sesion_http().get(url_completa, params={'since': version}, timeout=TIMEOUT_HTTP)
+            if response.status_code == 410:
+                print(f"[{datetime.now().strftime('%H:%M:%S')}] La versión {version} ya no es válida en la API "
+                      f"(base regenerada), se hará una carga completa")
+                return {'recargar': True}
+            response.raise_for_status()
+            etapa["bytes"] = len(response.content)
+
+        with medir_etapa("decodificacion") as etapa:
+            cambios = response.json()
+            etapa["filas"] = len(cambios['estudiantes'])
+        print(f"[{datetime.now().strftime('%H:%M:%S')}] Feed de cambios desde versión {version}: "
+              f"{len(cambios['estudiantes'])} modificados, {len(cambios['eliminados'])} eliminados (versión {cambios['version']})")
+        return cambios
+    except requests.exceptions.ConnectionError:
+        print(f"[{datetime.now().strftime('%H:%M:%S')}] ERROR: No se pudo conectar a la API")
+        return None
+    except requests.exceptions.RequestException as e:
+        print(f"[{datetime.now().strftime('%H:%M:%S')}] ERROR al obtener los cambios de la API: {e}")
+        return None
+
+
+def aplicar_cambios(df, cambios):
+    """
+    Aplica un lote del feed de cambios sobre el DataFrame local de estudiantes (indexado por id):
+    reemplaza las filas modificadas, agrega las nuevas y quita las eliminadas.
+    """
+    df_cambios = pd.DataFrame(cambios['estudiantes'])
+    eliminados = set(cambios['eliminados'])
+    if not df_cambios.empty:
+        eliminados.update(df_cambios['id'])
+
+    if eliminados and not df.empty:
+        df = df[~df['id'].isin(eliminados)]
+    if not df_cambios.empty:
+        df = pd.concat([df, df_cambios], ignore_index=True) if not df.empty else df_cambios
+
+    return df.sort_values('id').reset_index(drop=True)
+
+
 def cargar_modelo(path):
     """
     Carga el pipeline de predicción de riesgo guardado.
@@ -52,16 +332,166 @@ def cargar_modelo(path):
         return None
 
     try:
-        modelo = joblib.load(path)
+        import joblib
+        # mmap_mode: los arreglos NumPy del modelo se leen mapeados desde el archivo (páginas compartidas
+        # entre procesos) en vez de copiarse a memoria privada
+        modelo = joblib.load(path, mmap_mode='r')
         print(f"[{datetime.now().strftime('%H:%M:%S')}] Modelo ComoVoy cargado: {modelo}")
         return modelo
     except Exception as e:
         print(f"[{datetime.now().strftime('%H:%M:%S')}] ERROR al cargar modelo: {e}")
         return None
 
-def calcular_indice_riesgo(df, modelo, umbral_riesgo: float = 0.75):
+def calcular_version_modelo(path):
+    """
+    Identifica la versión del modelo con el hash SHA-256 del archivo joblib.
+    Cambia al reentrenar, lo que invalida el cache de puntajes.
+    """
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for bloque in iter(lambda: f.read(1 << 20), b''):
+            sha.update(bloque)
+    return sha.hexdigest()[:16]
+
+
+def cargar_modelo_compilado(path_modelo, path_compilado):
+    """
+    Retorna el modelo compilado si existe y fue exportado desde la misma versión del pipeline; si no, None.
+    """
+    if not os.path.exists(path_compilado):
+        return None
+    try:
+        compilado = ModeloCompilado.cargar(path_compilado)
+    except Exception as e:
+        print(f"[{datetime.now().strftime('%H:%M:%S')}] ERROR al cargar el modelo compilado: {e}")
+        return None
+    if compilado.version_modelo != calcular_version_modelo(path_modelo):
+        print(f"[{datetime.now().strftime('%H:%M:%S')}] Modelo compilado desactualizado, se usa el pipeline")
+        return None
+    print(f"[{datetime.now().strftime('%H:%M:%S')}] Usando modelo compilado '{path_compilado}'")
+    return compilado
+
+
+def cargar_cache_puntajes(path, version_modelo):
+    """
+    Carga el cache persistente de puntajes (id -> hash de features, probabilidad).
+    Si no existe, está dañado o corresponde a otra versión del modelo, retorna un cache vacío.
+    """
+    cache = {
+        'version_modelo': version_modelo,
+        'puntajes': pd.DataFrame({'hash': pd.Series(dtype='uint64'), 'Riesgo_Probabilidad': pd.Series(dtype='float64')}),
+        'aciertos': 0,
+        'fallos': 0
+    }
+    if not os.path.exists(path):
+        return cache
+
+    try:
+        with np.load(path, allow_pickle=False) as guardado:
+            if str(guardado['version_modelo']) == version_modelo:
+                cache['puntajes'] = pd.DataFrame(
+                    {'hash': guardado['hash'], 'Riesgo_Probabilidad': guardado['Riesgo_Probabilidad']},
+                    index=guardado['id']
+                )
+                print(f"[{datetime.now().strftime('%H:%M:%S')}] Cache de puntajes cargado: {len(cache['puntajes'])} estudiantes")
+            else:
+                print(f"[{datetime.now().strftime('%H:%M:%S')}] Cache de puntajes descartado: versión de modelo distinta")
+    except Exception as e:
+        print(f"[{datetime.now().strftime('%H:%M:%S')}] ERROR al cargar el cache de puntajes, se reconstruirá: {e}")
+    return cache
+
+
+def guardar_cache_puntajes(cache, path):
+    """
+    Persiste el cache de puntajes como .npz (id, hash y probabilidad por columna, más la versión del modelo)
+    escribiendo a un archivo temporal y renombrando (escritura atómica).
+    """
+    try:
+        tmp_path = path + '.tmp.npz'
+        puntajes = cache['puntajes']
+        np.savez(
+            tmp_path,
+            version_modelo=np.array(cache['version_modelo']),
+            id=puntajes.index.to_numpy(dtype=np.int64),
+            hash=puntajes['hash'].to_numpy(dtype=np.uint64),
+            Riesgo_Probabilidad=puntajes['Riesgo_Probabilidad'].to_numpy(dtype=np.float64),
+        )
+        os.replace(tmp_path, path)
+    except Exception as e:
+        print(f"[{datetime.now().strftime('%H:%M:%S')}] ERROR al guardar el cache de puntajes: {e}")
+
+
+def predecir_con_cache(df_features, ids, modelo, cache):
+    """
+    Calcula la probabilidad de reprobación usando el cache: solo los estudiantes nuevos o cuyas
+    features cambiaron (hash distinto) pasan por el modelo; el resto reutiliza el puntaje guardado.
+    Actualiza el cache en su lugar (incluye quitar estudiantes que ya no están) y registra aciertos/fallos.
+    """
+    hashes = pd.Series(pd.util.hash_pandas_object(df_features, index=False).to_numpy(), index=ids.to_numpy())
+    puntajes = cache['puntajes'].reindex(hashes.index)
+
+    vigentes = (puntajes['hash'] == hashes).to_numpy()
+    fallos = ~vigentes
+    probabilidades = puntajes['Riesgo_Probabilidad'].to_numpy(dtype=float, na_value=np.nan, copy=True)
+
+    if fallos.any():
+        probabilidades[fallos] = modelo.predict_proba(df_features[fallos])[:, 0]
+
+    cache['puntajes'] = pd.DataFrame({'hash': hashes.to_numpy(), 'Riesgo_Probabilidad': probabilidades}, index=hashes.index)
+    cache['aciertos'] = int(vigentes.sum())
+    cache['fallos'] = int(fallos.sum())
+    print(f"[{datetime.now().strftime('%H:%M:%S')}] Cache de puntajes: {cache['aciertos']} aciertos, {cache['fallos']} recalculados")
+    return probabilidades
+
+
+def columnas_numericas(modelo):
+    """
+    Features numéricas del modelo: el compilado las guarda; en el Pipeline vienen del ColumnTransformer.
+    ModeloParalelo se resuelve a través del modelo local que envuelve.
+    """
+    modelo = getattr(modelo, 'modelo', modelo)
+    if hasattr(modelo, 'columnas_numericas'):
+        return set(modelo.columnas_numericas)
+    if hasattr(modelo, 'named_steps'):
+        preprocesador = modelo.named_steps['preprocesador']
+        return {c for nombre, _, columnas in preprocesador.transformers_ if nombre == 'num' for c in columnas}
+    return set()
+
+
+def completar_features(df, columnas_esperadas, numericas=()):
+    """
+    Retorna una copia de df con las columnas que espera el modelo; las faltantes se agregan como "Desconocido".
+    Las columnas de `numericas` presentes se convierten a float64, así una misma fila tiene los mismos tipos
+    (y el mismo hash en el cache de puntajes) venga de JSON o de la exportación columnar, con o sin nulos.
+    :return: (DataFrame completo, conjunto de columnas faltantes)
+    """
+    df_original = df.copy()
+    faltantes = set(columnas_esperadas) - set(df.columns)
+    for col in columnas_esperadas:
+        if col not in df.columns:
+            df_original[col] = "Desconocido"
+        elif col in numericas and df_original[col].dtype != np.float64:
+            df_original[col] = pd.to_numeric(df_original[col], errors='coerce').astype(np.float64)
+    return df_original, faltantes
+
+
+def clasificar_riesgo(probabilidades, umbral_riesgo: float = 0.75):
     """
-    Procesa los datos, realiza predicciones (probabilidad de reprobación) y calcula el indice de riesgo para cada estudiante.    :return:
+    Reglas de negocio sobre la probabilidad de reprobación: índice 0-100 y nivel ALTO/MEDIO/BAJO.
+    :return: (arreglo de Indice_Riesgo, arreglo de Nivel_Alerta)
+    """
+    probabilidades = np.asarray(probabilidades, dtype=float)
+    indice = np.round(probabilidades * 100).astype(int)
+    nivel = np.where(probabilidades >= umbral_riesgo, 'ALTO',
+                     np.where(probabilidades >= UMBRAL_RIESGO_MEDIO, 'MEDIO', 'BAJO')).astype(object)
+    return indice, nivel
+
+
+def calcular_indice_riesgo(df, modelo, umbral_riesgo: float = 0.75, cache=None):
+    """
+    Procesa los datos, realiza predicciones (probabilidad de reprobación) y calcula el indice de riesgo para cada estudiante.
+    Si se entrega `cache` (ver cargar_cache_puntajes), solo se predicen los estudiantes nuevos o modificados.
+    :return:
     """
     if df.empty or modelo is None:
         print(
@@ -74,28 +504,24 @@ def calcular_indice_riesgo(df, modelo, umbral_riesgo: float = 0.75):
         columnas_esperadas = list(modelo.feature_names_in_)
 
         # Mantener copia original para no perder el ID
-        df_original = df.copy()
-
-        # Detectar columnas faltantes
-        faltantes = set(columnas_esperadas) - set(df.columns)
+        df_original, faltantes = completar_features(df, columnas_esperadas, columnas_numericas(modelo))
         if faltantes:
             print(f"[{datetime.now().strftime('%H:%M:%S')}] Columnas faltantes detectadas y agregadas: {faltantes}")
 
-        for col in columnas_esperadas:
-            if col not in df.columns:
-                df_original[col] = "Desconocido"
-
-
         df_features = df_original[columnas_esperadas]
 
         # Predicción
-        probabilidades = modelo.predict_proba(df_features)
+        with medir_etapa("prediccion") as etapa:
+            if cache is None:
+                probabilidades = modelo.predict_proba(df_features)[:, 0]
+            else:
+                probabilidades = predecir_con_cache(df_features, df_original['id'], modelo, cache)
+            etapa["filas"] = len(df_features)
 
         # Añadir columnas de riesgo a DF original
-        df_original.loc[:, 'Riesgo_Probabilidad'] = probabilidades[:, 0]
-        df_original.loc[:, 'Indice_Riesgo'] = (df_original['Riesgo_Probabilidad'] * 100).round().astype(int)
-        df_original.loc[:, 'Nivel_Alerta'] = df_original['Riesgo_Probabilidad'].apply(
-            lambda p: 'ALTO' if p >= umbral_riesgo else ('MEDIO' if p >= 0.40 else 'BAJO')
+        df_original.loc[:, 'Riesgo_Probabilidad'] = probabilidades
+        df_original.loc[:, 'Indice_Riesgo'], df_original.loc[:, 'Nivel_Alerta'] = clasificar_riesgo(
+            probabilidades, umbral_riesgo
         )
 
         print(f"[{datetime.now().strftime('%H:%M:%S')}] Cálculo de IR finalizado.")
@@ -106,29 +532,120 @@ def calcular_indice_riesgo(df, modelo, umbral_riesgo: float = 0.75):
         return pd.DataFrame()
 
 
-def generar_alertas_reportes(df_riesgo):
+COLUMNAS_ESTADO_ALERTA = ['Carrera', 'Nivel_Alerta', 'Indice_Riesgo', 'Riesgo_Probabilidad', 'Ultima_Notificacion']
+
+
+def cargar_estado_alertas(path):
+    """
+    Carga el estado persistente de alertas (id -> Carrera, nivel, IR y probabilidad de la última
+    notificación, y su fecha). Si no existe o está dañado, retorna un estado vacío.
+    """
+    estado = {'alertas': pd.DataFrame(columns=COLUMNAS_ESTADO_ALERTA, index=pd.Index([], name='id'))}
+    if path is None or not os.path.exists(path):
+        return estado
+
+    try:
+        estado['alertas'] = pd.read_pickle(path)
+        print(f"[{datetime.now().strftime('%H:%M:%S')}] Estado de alertas cargado: {len(estado['alertas'])} alertas vigentes")
+    except Exception as e:
+        print(f"[{datetime.now().strftime('%H:%M:%S')}] ERROR al cargar el estado de alertas, se reconstruirá: {e}")
+    return estado
+
+
+def guardar_estado_alertas(estado, path):
+    """
+    Persiste el estado de alertas escribiendo a un archivo temporal y renombrando (escritura atómica).
+    """
+    try:
+        tmp_path = path + '.tmp'
+        estado['alertas'].to_pickle(tmp_path)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        print(f"[{datetime.now().strftime('%H:%M:%S')}] ERROR al guardar el estado de alertas: {e}")
+
+
+def calcular_eventos_alerta(df_riesgo, df_alertas, estado):
+    """
+    Compara las alertas del ciclo con las ya notificadas y actualiza estado['alertas'].
+    NUEVA: el estudiante no tenía alerta vigente. ESCALADA: su IR subió DELTA_ESCALAMIENTO_IR puntos
+    o más desde la última notificación. RESUELTA: tenía alerta y ya no supera el umbral (o dejó de estar).
+    Las alertas vigentes sin cambios relevantes no se vuelven a anunciar.
+    :return: DataFrame de eventos con la columna 'Evento'
+    """
+    anteriores = estado['alertas']
+    actuales = df_alertas.set_index('id')[COLUMNAS_ESTADO_ALERTA[:-1]]
+    ir_anterior = anteriores['Indice_Riesgo'].reindex(actuales.index).astype(float).to_numpy()
+
+    evento = np.where(np.isnan(ir_anterior), 'NUEVA',
+                      np.where(actuales['Indice_Riesgo'].to_numpy() >= ir_anterior + DELTA_ESCALAMIENTO_IR, 'ESCALADA', ''))
+    notificadas = actuales[evento != ''].assign(Evento=evento[evento != ''])
+
+    resueltas = anteriores.loc[anteriores.index.difference(actuales.index), COLUMNAS_ESTADO_ALERTA[:-1]]
+    if not resueltas.empty:
+        # Nivel e IR actuales si el estudiante sigue en los datos; si fue eliminado, los de su última alerta
+        vigentes = df_riesgo.set_index('id')[['Nivel_Alerta', 'Indice_Riesgo', 'Riesgo_Probabilidad']]
+        resueltas = resueltas.copy()
+        resueltas.update(vigentes.reindex(resueltas.index))
+    resueltas = resueltas.assign(Evento='RESUELTA')
+
+    # Las alertas que siguen vigentes conservan los valores de su última notificación
+    sin_cambios = anteriores.loc[actuales.index.difference(notificadas.index).intersection(anteriores.index)]
+    nuevo_estado = notificadas[COLUMNAS_ESTADO_ALERTA[:-1]].assign(Ultima_Notificacion=datetime.now().isoformat(timespec='seconds'))
+    estado['alertas'] = pd.concat([sin_cambios, nuevo_estado]) if not sin_cambios.empty else nuevo_estado
+
+    return pd.concat([notificadas, resueltas]).rename_axis('id').reset_index()
+
+
+def formatear_eventos_alerta(eventos):
+    """
+    Una línea de consola por evento, construida con operaciones de texto sobre columnas completas.
     """
-    Genera mensajes de alerta, genera un reporte en csv y prepara los datos JSON para el dashboard HTML del docente
+    hora = f"[{datetime.now().strftime('%H:%M:%S')}] "
+    return (
+        hora + eventos['Evento'].str.ljust(8) + ' Estudiante ID ' + eventos['id'].astype(str)
+        + ' (' + eventos['Carrera'].astype(str) + ') -> Nivel: ' + eventos['Nivel_Alerta'].astype(str)
+        + ' (IR: ' + eventos['Indice_Riesgo'].astype(str) + '%)'
+    )
+
+
+def generar_alertas_reportes(df_riesgo, estado_alertas=None):
+    """
+    Genera mensajes de alerta, genera un reporte en csv y prepara los datos JSON para el dashboard HTML del docente.
+    Con estado_alertas (cargar_estado_alertas) solo se anuncian y registran las alertas nuevas, escaladas
+    o resueltas desde el ciclo anterior; sin él, todas las vigentes se consideran nuevas.
     :param df_riesgo:
+    :param estado_alertas:
     :return:
     """
-    umbral_alerta = 0.75
     if df_riesgo.empty:
         return
-    df_alertas = df_riesgo[df_riesgo['Riesgo_Probabilidad'] >= umbral_alerta].sort_values(
+    if estado_alertas is None:
+        estado_alertas = cargar_estado_alertas(None)
+    df_alertas = df_riesgo[df_riesgo['Riesgo_Probabilidad'] >= UMBRAL_ALERTA].sort_values(
         by='Indice_Riesgo', ascending=False
     )
 
-    if not df_alertas.empty:
-        print("\n*** ALERTA DE RIESGO ACADÉMICO DETECTADA ***")
-        for index, estudiante in df_alertas.iterrows():
+    with medir_etapa("alertas") as etapa:
+        eventos = calcular_eventos_alerta(df_riesgo, df_alertas, estado_alertas)
+        etapa["filas"] = len(eventos)
+        fijar("comovoy_agente_alertas_vigentes", len(df_alertas), ayuda="Estudiantes sobre el umbral de alerta")
+        if not eventos.empty:
+            conteo = eventos['Evento'].value_counts()
+            for tipo, cantidad in conteo.items():
+                incrementar("comovoy_agente_alertas_eventos_total", int(cantidad), {"evento": tipo},
+                            "Eventos de alerta notificados")
+            resumen = ", ".join(f"{tipo}: {cantidad}" for tipo, cantidad in conteo.items())
+            # Todo el bloque en una sola escritura a la consola
+            sys.stdout.write(
+                f"\n*** ALERTA DE RIESGO ACADÉMICO: {resumen} ({len(df_alertas)} vigentes) ***\n"
+                + "\n".join(formatear_eventos_alerta(eventos)) + "\n"
+            )
+            log_notificacion_riesgo(CORREO_DESTINATARIO, eventos)
+        elif not df_alertas.empty:
+            print(f"[{datetime.now().strftime('%H:%M:%S')}] {len(df_alertas)} alertas vigentes ya notificadas, sin cambios en este ciclo.")
+        else:
             print(
-                f"[{datetime.now().strftime('%H:%M:%S')}] Estudiante ID {estudiante['id']} ({estudiante['Carrera']}):")
-            print(f"  -> Nivel: {estudiante['Nivel_Alerta']} (IR: {estudiante['Indice_Riesgo']}%)")
-        log_notificacion_riesgo(CORREO_DESTINATARIO, df_alertas)
-    else:
-        print(
-            f"[{datetime.now().strftime('%H:%M:%S')}] No se detectaron estudiantes que superen el umbral de ALERTA ({umbral_alerta * 100:.0f}%) en este ciclo.")
+                f"[{datetime.now().strftime('%H:%M:%S')}] No se detectaron estudiantes que superen el umbral de ALERTA ({UMBRAL_ALERTA * 100:.0f}%) en este ciclo.")
 
     df_carrera_riesgo = df_riesgo.groupby('Carrera').agg(
         Riesgo_Acumulado=('Indice_Riesgo', 'mean'),
@@ -143,13 +660,79 @@ def generar_alertas_reportes(df_riesgo):
     }
 
     try:
-        with open(REPORTE_DASHBOARD_PATH, 'w') as f:
-            json.dump(dashboard_data, f, indent=4)
-        print(
-            f"[{datetime.now().strftime('%H:%M:%S')}] Datos de Dashboard JSON generados: '{REPORTE_DASHBOARD_PATH}'")
+        if escribir_snapshot_dashboard(dashboard_data, REPORTE_DASHBOARD_PATH):
+            print(
+                f"[{datetime.now().strftime('%H:%M:%S')}] Datos de Dashboard JSON generados: '{REPORTE_DASHBOARD_PATH}'")
+        else:
+            print(f"[{datetime.now().strftime('%H:%M:%S')}] Resultados idénticos al ciclo anterior, se conserva '{REPORTE_DASHBOARD_PATH}'")
     except Exception as e:
         print(f"[{datetime.now().strftime('%H:%M:%S')}] ERROR al guardar el JSON del dashboard: {e}")
 
+
+def escribir_atomico(path, contenido):
+    """
+    Escribe bytes en un archivo temporal del mismo directorio y lo renombra sobre `path`,
+    así los lectores ven el archivo anterior o el nuevo completo, nunca uno a medio escribir.
+    """
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(contenido)
+    os.replace(tmp_path, path)
+
+
+def escribir_snapshot_dashboard(dashboard_data, path):
+    """
+    Guarda el snapshot del dashboard en JSON compacto con un hash de contenido ('hash', calculado sin el
+    timestamp) y un hermano pre-comprimido '<path>.gz'. Si el hash coincide con el del snapshot vigente,
+    no reescribe nada (el dashboard sigue respondiendo 304 a sus clientes).
+    :return: True si se escribió un snapshot nuevo
+    """
+    with medir_etapa("snapshot") as etapa:
+        etapa["filas"] = len(dashboard_data.get('estudiantes', []))
+        etapa["bytes"] = 0
+        resultados = {k: v for k, v in dashboard_data.items() if k != 'timestamp'}
+        hash_contenido = hashlib.sha256(json.dumps(resultados, separators=(',', ':')).encode('utf-8')).hexdigest()[:32]
+
+        try:
+            with open(path, 'rb') as f:
+                # El hash va al inicio del archivo, basta leer un prefijo para compararlo
+                if f'"hash":"{hash_contenido}"'.encode('utf-8') in f.read(256):
+                    return False
+        except OSError:
+            pass
+
+        contenido = json.dumps({'hash': hash_contenido, **dashboard_data}, separators=(',', ':')).encode('utf-8')
+        comprimido = gzip.compress(contenido, compresslevel=6)
+        # Primero el .gz: cuando el dashboard ve el JSON nuevo, su versión comprimida ya está lista
+        escribir_atomico(path + '.gz', comprimido)
+        escribir_atomico(path, contenido)
+        etapa["bytes"] = len(contenido) + len(comprimido)
+        return True
+
+def registrar_historial(conexion, df_riesgo, version_modelo):
+    """
+    Guarda en el historial de riesgo los puntajes que cambiaron en este ciclo y compacta los puntos antiguos.
+    df_riesgo trae a todos los estudiantes vigentes: los que tienen historial y ya no están en él fueron
+    eliminados (por el feed o mientras el agente no corría) y se borran del historial al compactar.
+    Un error aquí no detiene el ciclo: el dashboard y las alertas no dependen del historial.
+    """
+    if conexion is None:
+        return
+    with medir_etapa("historial") as etapa:
+        try:
+            etapa["filas"] = 0
+            if not df_riesgo.empty:
+                etapa["filas"] = historial_riesgo.registrar_puntajes(conexion, df_riesgo, version_modelo)
+            vigentes = set(df_riesgo['id'].astype(int).tolist()) if not df_riesgo.empty else set()
+            eliminados = historial_riesgo.ids_registrados(conexion) - vigentes
+            puntos, horas, estudiantes = historial_riesgo.compactar_historial(conexion, eliminados=eliminados)
+            print(f"[{datetime.now().strftime('%H:%M:%S')}] Historial de riesgo: {etapa['filas']} puntajes nuevos o cambiados"
+                  + (f", {puntos} puntos y {horas} horas compactados" if puntos or horas else "")
+                  + (f", {estudiantes} estudiantes eliminados" if estudiantes else ""))
+        except sqlite3.Error as e:
+            print(f"[{datetime.now().strftime('%H:%M:%S')}] ERROR al registrar el historial de riesgo: {e}")
+
+
 def monitorear_datos_institucionales():
     """
     Monitorea continuamente el riesgo de reprobación de los estudiantes.
@@ -160,53 +743,137 @@ def monitorear_datos_institucionales():
     if modelo_riesgo is None:
         return
 
+    if PROCESOS_PUNTUACION > 1:
+        from puntuacion_paralela import ModeloParalelo
+        # Los workers cargan el modelo compilado (arreglos mapeados del .npz) si está vigente; si no, el Pipeline
+        compilado = cargar_modelo_compilado(MODELO_PATH, MODELO_COMPILADO_PATH)
+        if compilado is not None:
+            modelo_riesgo = ModeloParalelo(MODELO_COMPILADO_PATH, PROCESOS_PUNTUACION, compilado)
+        else:
+            modelo_riesgo = ModeloParalelo(MODELO_PATH, PROCESOS_PUNTUACION, modelo_riesgo)
+        print(f"[{datetime.now().strftime('%H:%M:%S')}] Puntuación repartida en {PROCESOS_PUNTUACION} procesos")
+
+    version_modelo = calcular_version_modelo(MODELO_PATH)
+    cache_puntajes = cargar_cache_puntajes(CACHE_PUNTAJES_PATH, version_modelo)
+    estado_alertas = cargar_estado_alertas(ESTADO_ALERTAS_PATH)
+    try:
+        conexion_historial = historial_riesgo.conectar()
+    except sqlite3.Error as e:
+        print(f"[{datetime.now().strftime('%H:%M:%S')}] ERROR al abrir el historial de riesgo, no se registrará: {e}")
+        conexion_historial = None
+
+    try:
+        servir_metricas(HOST_METRICAS, PUERTO_METRICAS)
+        print(f"[{datetime.now().strftime('%H:%M:%S')}] Métricas disponibles en http://{HOST_METRICAS}:{PUERTO_METRICAS}/metrics")
+    except OSError as e:
+        print(f"[{datetime.now().strftime('%H:%M:%S')}] ERROR al iniciar el servidor de métricas: {e}")
+
+    # Copia local de la tabla de estudiantes, mantenida con el feed de cambios de la API. La carga completa
+    # se decide con una bandera y no con df_datos.empty: una tabla vacía es un estado válido que sigue el feed
+    df_datos = pd.DataFrame()
+    version = 0
+    requiere_carga_completa = True
+    inicio_anterior = None
+
     while True:
-        print("\n" + "=" * 80)
-        print(f"[{datetime.now().strftime('%H:%M:%S')}] INICIO DEL CICLO DE MONITOREO DE RIESGO ACADÉMICO")
-        print("\n" + "=" * 80)
-
-        datos_raw = obtener_datos_de_api(API_URL, ENDPOINT_ESTUDIANTES)
-        if datos_raw:
-            df_datos = pd.DataFrame(datos_raw)
-            df_riesgo = calcular_indice_riesgo(df_datos, modelo_riesgo)
-            if not df_riesgo.empty:
-                generar_alertas_reportes(df_riesgo)
-        print(f"\n[{datetime.now().strftime('%H:%M:%S')}] Esperando 60 segundos para el siguiente ciclo...")
-        time.sleep(60)
+        inicio_ciclo = time.time()
+        if inicio_anterior is not None:
+            # Atraso respecto del calendario de un ciclo cada INTERVALO_CICLO_SEGUNDOS
+            fijar("comovoy_agente_ciclo_retraso_segundos", inicio_ciclo - inicio_anterior - INTERVALO_CICLO_SEGUNDOS,
+                  ayuda="Atraso del inicio del ciclo respecto de su hora programada")
+        inicio_anterior = inicio_ciclo
+        with medir_etapa("ciclo"):
+            print("\n" + "=" * 80)
+            print(f"[{datetime.now().strftime('%H:%M:%S')}] INICIO DEL CICLO DE MONITOREO DE RIESGO ACADÉMICO")
+            print("\n" + "=" * 80)
+
+            df_riesgo = None
+            cambios = None
+            if not requiere_carga_completa:
+                cambios = obtener_cambios_de_api(API_URL, ENDPOINT_ESTUDIANTES, version)
+                if cambios is not None and cambios.get('recargar'):
+                    # La base se regeneró: se descarta la copia local y se recarga en este mismo ciclo
+                    df_datos, version, cambios = pd.DataFrame(), 0, None
+                    requiere_carga_completa = True
+
+            if requiere_carga_completa:
+                # Carga inicial completa por páginas columnares, puntuando cada página mientras se descargan
+                # las siguientes; luego solo se consulta el feed de cambios
+                df_nuevo, version_nueva, df_riesgo = cargar_y_puntuar_por_paginas(
+                    API_URL, ENDPOINT_ESTUDIANTES_COLUMNAR, modelo_riesgo, cache_puntajes
+                )
+                respuesta_ok = df_nuevo is not None
+                hay_cambios = respuesta_ok and not df_nuevo.empty
+                if respuesta_ok:
+                    df_datos, version = df_nuevo, version_nueva
+                    requiere_carga_completa = False
+            else:
+                respuesta_ok = cambios is not None
+                hay_cambios = respuesta_ok and bool(cambios['estudiantes'] or cambios['eliminados'])
+                if respuesta_ok:
+                    version = cambios['version']
+                if hay_cambios:
+                    with medir_etapa("dataframe") as etapa:
+                        df_datos = aplicar_cambios(df_datos, cambios)
+                        etapa["filas"] = len(df_datos)
+
+            if hay_cambios:
+                if df_riesgo is None:
+                    df_riesgo = calcular_indice_riesgo(df_datos, modelo_riesgo, cache=cache_puntajes)
+                guardar_cache_puntajes(cache_puntajes, CACHE_PUNTAJES_PATH)
+                # También con df_riesgo vacío: si se eliminaron todos los estudiantes hay que limpiar el historial
+                registrar_historial(conexion_historial, df_riesgo, version_modelo)
+                if not df_riesgo.empty:
+                    generar_alertas_reportes(df_riesgo, estado_alertas)
+                    guardar_estado_alertas(estado_alertas, ESTADO_ALERTAS_PATH)
+            elif respuesta_ok:
+                print(f"[{datetime.now().strftime('%H:%M:%S')}] Sin cambios en los datos institucionales, se omite el recálculo.")
+        incrementar("comovoy_agente_ciclos_total", ayuda="Ciclos de monitoreo ejecutados")
+        # Se descuenta la duración del ciclo para mantener el calendario (un ciclo cada INTERVALO_CICLO_SEGUNDOS)
+        espera = max(0.0, inicio_ciclo + INTERVALO_CICLO_SEGUNDOS - time.time())
+        print(f"\n[{datetime.now().strftime('%H:%M:%S')}] Esperando {espera:.0f} segundos para el siguiente ciclo...")
+        time.sleep(espera)
+
+def rotar_log(path, bytes_nuevos, tamano_maximo=TAMANO_MAXIMO_LOG_ALERTAS, respaldos=ARCHIVOS_LOG_ALERTAS):
+    """
+    Si agregar bytes_nuevos haría superar tamano_maximo, renombra path -> path.1 -> path.2 ... y descarta
+    el respaldo más antiguo (path.<respaldos>).
+    """
+    try:
+        tamano = os.path.getsize(path)
+    except OSError:
+        return
+    if tamano == 0 or tamano + bytes_nuevos <= tamano_maximo:
+        return
+    for i in range(respaldos - 1, 0, -1):
+        if os.path.exists(f"{path}.{i}"):
+            os.replace(f"{path}.{i}", f"{path}.{i + 1}")
+    os.replace(path, f"{path}.1")
 
-def log_notificacion_riesgo(destinatario, estudiantes_en_riesgo):
+
+def log_notificacion_riesgo(destinatario, eventos):
     """
-    Simula el envío de un correo y registra la alerta en un archivo de log
+    Simula el envío de un correo y registra cada evento de alerta como una línea JSON en el log
+    rotado LOGS_ALERTAS_PATH (solo se agrega al final, en una única escritura).
     :param destinatario:
-    :param estudiantes_en_riesgo:
+    :param eventos: DataFrame de calcular_eventos_alerta
     :return:
     """
-
-    fecha_log = datetime.now().strftime('%d/%m/%Y %H:%M:%S')
-    asunto = f"ALERTA SIMULADA: Estudiantes en Riesgo Académico, {len(estudiantes_en_riesgo)}: {fecha_log}"
-
-    log_content = [
-        "=" * 50,
-        f"FECHA/HORA: {fecha_log}",
-        f"DESTINATARIO: {destinatario}",
-        f"ASUNTO: {asunto}",
-        f"ESTUDIANTES EN ALERTA ({len(estudiantes_en_riesgo)}):"
-    ]
-
-    for index, estudiante in estudiantes_en_riesgo.iterrows():
-        log_content.append(
-            f"  - ID: {estudiante['id']}, Carrera: {estudiante['Carrera']}, Nivel: {estudiante['Nivel_Alerta']}, IR: {estudiante['Indice_Riesgo']}%"
-        )
-    log_content.append("=" * 50 + "\n")
-
-    log_message = "\n".join(log_content)
+    fecha_log = datetime.now().isoformat(timespec='seconds')
+    registros = eventos[['Evento', 'id', 'Carrera', 'Nivel_Alerta', 'Indice_Riesgo', 'Riesgo_Probabilidad']].assign(
+        fecha=fecha_log, destinatario=destinatario
+    )
+    contenido = registros.to_json(orient='records', lines=True, force_ascii=False)
+    contenido = (contenido if contenido.endswith('\n') else contenido + '\n').encode('utf-8')
 
     try:
-        with open(LOGS_CORREOS_PATH, 'a') as f:
-            f.write(log_message)
+        os.makedirs(os.path.dirname(LOGS_ALERTAS_PATH) or '.', exist_ok=True)
+        rotar_log(LOGS_ALERTAS_PATH, len(contenido), TAMANO_MAXIMO_LOG_ALERTAS, ARCHIVOS_LOG_ALERTAS)
+        with open(LOGS_ALERTAS_PATH, 'ab') as f:
+            f.write(contenido)
 
         print(
-            f"[{datetime.now().strftime('%H:%M:%S')}] LOG: Correo de alerta simulado guardado en '{LOGS_CORREOS_PATH}'. Casos: {len(estudiantes_en_riesgo)}")
+            f"[{datetime.now().strftime('%H:%M:%S')}] LOG: Correo de alerta simulado guardado en '{LOGS_ALERTAS_PATH}'. Eventos: {len(eventos)}")
     except Exception as e:
         print(f"[{datetime.now().strftime('%H:%M:%S')}] ERROR al escribir el log de correo simulado: {e}")
 
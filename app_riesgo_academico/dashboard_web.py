@@ -1,8 +1,40 @@
 import os
+import asyncio
+import math
+import gzip
 import json
-from flask import Flask, render_template, abort, jsonify
+import hashlib
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from flask import Flask, Response, render_template, abort, jsonify, request
+
+from metricas import fijar, instrumentar_flask, servir_metricas_worker
+import historial_riesgo
 
 app = Flask(__name__)
+# Latencia por ruta y GET /metrics en formato Prometheus
+instrumentar_flask(app, "comovoy_dashboard")
+
+# Campos que necesita cada tarjeta del dashboard; el registro completo solo se usa en /detalle/<id>
+CAMPOS_TARJETA = ("id", "Carrera", "Nivel_Alerta", "Indice_Riesgo")
+NIVELES_ALERTA = ("ALTO", "MEDIO", "BAJO")
+LIMITE_PAGINA = 50
+LIMITE_PAGINA_MAXIMO = 500
+
+# Servidor de eventos en vivo (SSE). Corre en un solo hilo con asyncio, así cientos de dashboards
+# abiertos son solo sockets en espera y no ocupan un hilo cada uno.
+HOST_EVENTOS = "127.0.0.1"
+PUERTO_EVENTOS = 5002
+INTERVALO_REVISION_EVENTOS = 1.0
+INTERVALO_LATIDO_EVENTOS = 15.0
+
+# Historial de riesgo que escribe el agente: tendencia en /detalle y estudiantes que empeoraron
+HISTORIAL_PATH = historial_riesgo.HISTORIAL_RIESGO_PATH
+DIAS_TENDENCIA = 90
+ANCHO_GRAFICO_TENDENCIA = 600
+ALTO_GRAFICO_TENDENCIA = 160
 
 # Define la ruta absoluta al archivo JSON (usando app.root_path para robustez)
 DATA_PATH = os.path.join(
@@ -12,58 +44,464 @@ DATA_PATH = os.path.join(
 )
 
 
-# Función auxiliar para cargar los datos del JSON
-def load_data():
+# Snapshot del JSON en memoria con índices por id y por carrera. Se reemplaza completo (nunca se
+# modifica en su lugar), así los lectores siempre ven una versión consistente sin tomar el lock.
+_snapshot = {"firma": None, "datos": {}, "crudo": b"", "gzip": None, "etag": None, "modificado": None,
+             "estudiantes": [], "por_id": {}, "por_carrera": {},
+             "tarjetas": [], "tarjetas_por_carrera": {}, "resumen": []}
+_snapshot_lock = threading.Lock()
+
+
+def obtener_snapshot():
+    """
+    Retorna el snapshot vigente del archivo de datos, recargándolo solo si cambió su mtime o tamaño.
+    La recarga se hace con un lock para que varias peticiones simultáneas no parseen el archivo a la vez.
+    """
+    global _snapshot
     try:
-        with open(DATA_PATH, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        return data.get("estudiantes", [])
-    except Exception as e:
-        # En caso de error, retornar una lista vacía y registrar el error
+        estado = os.stat(DATA_PATH)
+        firma = (estado.st_mtime_ns, estado.st_size)
+    except OSError as e:
         print(f"Error al cargar el archivo JSON: {e}")
-        return []
+        return _snapshot
+
+    if _snapshot["firma"] == firma:
+        return _snapshot
+
+    with _snapshot_lock:
+        if _snapshot["firma"] == firma:
+            return _snapshot
+        try:
+            with open(DATA_PATH, "rb") as f:
+                crudo = f.read()
+            datos = json.loads(crudo)
+        except Exception as e:
+            # Si el archivo no se puede leer, se mantiene el snapshot anterior
+            print(f"Error al cargar el archivo JSON: {e}")
+            return _snapshot
+
+        estudiantes = datos.get("estudiantes", [])
+        por_carrera = {}
+        for estudiante in estudiantes:
+            por_carrera.setdefault(estudiante.get("Carrera"), []).append(estudiante)
+
+        # Tarjetas ordenadas por riesgo descendente, calculadas una vez por recarga
+        tarjetas = sorted(
+            ({campo: estudiante.get(campo) for campo in CAMPOS_TARJETA} for estudiante in estudiantes),
+            key=lambda t: (-(t["Indice_Riesgo"] or 0), t["id"])
+        )
+        tarjetas_por_carrera = {}
+        for tarjeta in tarjetas:
+            tarjetas_por_carrera.setdefault(tarjeta["Carrera"], []).append(tarjeta)
+
+        _snapshot = {
+            "firma": firma,
+            "datos": datos,
+            "crudo": crudo,
+            "gzip": cargar_gzip(crudo),
+            # El agente incluye un hash de contenido; para archivos antiguos se calcula aquí
+            "etag": datos.get("hash") or hashlib.sha256(crudo).hexdigest()[:32],
+            "modificado": estado.st_mtime,
+            "estudiantes": estudiantes,
+            "por_id": {estudiante.get("id"): estudiante for estudiante in estudiantes},
+            "por_carrera": por_carrera,
+            "tarjetas": tarjetas,
+            "tarjetas_por_carrera": tarjetas_por_carrera,
+            "resumen": resumir_carreras(tarjetas_por_carrera),
+        }
+        return _snapshot
+
+
+def cargar_gzip(crudo):
+    """
+    Retorna la versión gzip del snapshot: usa el hermano .gz que escribe el agente si corresponde
+    exactamente al JSON leído; si no existe o quedó desfasado, lo comprime aquí una sola vez.
+    """
+    try:
+        with open(DATA_PATH + ".gz", "rb") as f:
+            comprimido = f.read()
+        if gzip.decompress(comprimido) == crudo:
+            return comprimido
+    except (OSError, EOFError):
+        pass
+    return gzip.compress(crudo, compresslevel=6)
+
+
+def resumir_carreras(tarjetas_por_carrera):
+    """
+    Resumen por carrera para el encabezado de cada sección: total, riesgo promedio y conteo por nivel.
+    """
+    resumen = []
+    for carrera, tarjetas in sorted(tarjetas_por_carrera.items(), key=lambda item: str(item[0])):
+        niveles = {nivel: 0 for nivel in NIVELES_ALERTA}
+        for tarjeta in tarjetas:
+            nivel = str(tarjeta["Nivel_Alerta"]).upper()
+            niveles[nivel] = niveles.get(nivel, 0) + 1
+        resumen.append({
+            "Carrera": carrera,
+            "Total_Estudiantes": len(tarjetas),
+            "Riesgo_Promedio": sum(t["Indice_Riesgo"] or 0 for t in tarjetas) / len(tarjetas),
+            "Niveles": niveles,
+        })
+    return resumen
+
+
+# Función auxiliar para cargar los datos del JSON
+def load_data():
+    return obtener_snapshot()["estudiantes"]
 
 
 # --- Rutas existentes ---
 
 @app.route("/dashboard_data")
 def dashboard_data():
-    # Usamos jsonify aquí para devolver la data completa al cliente (aunque
-    # en la versión final de la solución anterior usamos send_from_directory,
-    # usar jsonify es más idiomático si no se quiere exponer la carpeta static)
-    data = load_data()
-    # Si quieres enviar el objeto completo con timestamp y alertas:
-    # return jsonify({"estudiantes": data, "timestamp": "...", "alertas_count": len(data)})
-    # Pero para mantener la compatibilidad con el front-end anterior,
-    # usaremos la ruta de la versión robusta que busca en static
-    from flask import send_from_directory
-    STATIC_FOLDER = os.path.join(app.root_path, "static")
-    return send_from_directory(STATIC_FOLDER, "dashboard_data.json")
+    """
+    Snapshot completo del agente. Responde 304 si el cliente ya tiene la versión vigente
+    (If-None-Match / If-Modified-Since) y entrega el cuerpo pre-comprimido si acepta gzip.
+    """
+    snapshot = obtener_snapshot()
+    if snapshot["firma"] is None:
+        abort(404, description="Aún no hay datos generados por el agente.")
+
+    usar_gzip = "gzip" in request.accept_encodings
+    respuesta = Response(snapshot["gzip"] if usar_gzip else snapshot["crudo"], mimetype="application/json")
+    if usar_gzip:
+        respuesta.headers["Content-Encoding"] = "gzip"
+    respuesta.vary.add("Accept-Encoding")
+    respuesta.set_etag(snapshot["etag"])
+    respuesta.last_modified = datetime.fromtimestamp(snapshot["modificado"], tz=timezone.utc)
+    respuesta.cache_control.no_cache = True
+    return respuesta.make_conditional(request)
+
+
+# --- API del dashboard (filtrado, orden y paginación en el servidor) ---
+
+def parsear_numero(nombre, defecto, tipo=int):
+    """
+    Lee un parámetro numérico de la query string. A diferencia de request.args.get(type=...), un valor que
+    no se puede convertir (o que no es finito) es un error y no se reemplaza en silencio por el valor por defecto.
+    :return: (valor o `defecto` si el parámetro no viene, mensaje de error o None)
+    """
+    texto = request.args.get(nombre)
+    if texto is None:
+        return defecto, None
+    try:
+        valor = tipo(texto)
+    except ValueError:
+        valor = None
+    if valor is None or not math.isfinite(valor):
+        return None, f"{nombre} debe ser un número{' entero' if tipo is int else ''}"
+    return valor, None
+
+
+@app.route("/api/estudiantes")
+def api_estudiantes():
+    """
+    Tarjetas de estudiantes (id, Carrera, Nivel_Alerta, Indice_Riesgo) filtradas y paginadas.
+    Parámetros: carrera, nivel (ALTO/MEDIO/BAJO), orden (riesgo, riesgo_asc, id), page (desde 1) y limit.
+    sin_carrera=1 filtra los estudiantes sin Carrera (null en el snapshot), que no se pueden pedir por ?carrera=.
+    """
+    snapshot = obtener_snapshot()
+    carrera = request.args.get("carrera")
+    sin_carrera = request.args.get("sin_carrera") == "1"
+    nivel = request.args.get("nivel", "").upper()
+    orden = request.args.get("orden", "riesgo")
+    page, error = parsear_numero("page", 1)
+    if error is None:
+        limit, error = parsear_numero("limit", LIMITE_PAGINA)
+    if error:
+        return jsonify({"error": error}), 400
+
+    if nivel and nivel not in NIVELES_ALERTA:
+        return jsonify({"error": f"nivel debe ser uno de {', '.join(NIVELES_ALERTA)}"}), 400
+    if orden not in ("riesgo", "riesgo_asc", "id"):
+        return jsonify({"error": "orden debe ser riesgo, riesgo_asc o id"}), 400
+    if page < 1 or not 0 < limit <= LIMITE_PAGINA_MAXIMO:
+        return jsonify({"error": f"page debe ser >= 1 y limit entre 1 y {LIMITE_PAGINA_MAXIMO}"}), 400
+
+    if sin_carrera:
+        tarjetas = snapshot["tarjetas_por_carrera"].get(None, [])
+    elif carrera:
+        tarjetas = snapshot["tarjetas_por_carrera"].get(carrera, [])
+    else:
+        tarjetas = snapshot["tarjetas"]
+    if nivel:
+        tarjetas = [t for t in tarjetas if str(t["Nivel_Alerta"]).upper() == nivel]
+    if orden == "riesgo_asc":
+        tarjetas = tarjetas[::-1]
+    elif orden == "id":
+        tarjetas = sorted(tarjetas, key=lambda t: t["id"])
+
+    inicio = (page - 1) * limit
+    return jsonify({
+        "total": len(tarjetas),
+        "page": page,
+        "limit": limit,
+        "estudiantes": tarjetas[inicio:inicio + limit],
+    })
+
+
+@app.route("/api/resumen")
+def api_resumen():
+    """
+    Resumen precalculado por carrera más los metadatos del ciclo del agente.
+    """
+    snapshot = obtener_snapshot()
+    datos = snapshot["datos"]
+    return jsonify({
+        "timestamp": datos.get("timestamp"),
+        "alertas_count": datos.get("alertas_count", 0),
+        "total_estudiantes": len(snapshot["tarjetas"]),
+        "carreras": snapshot["resumen"],
+    })
+
+
+@app.route("/health")
+def health():
+    """
+    Sonda de disponibilidad para el supervisor (app.py en la raíz).
+    """
+    return jsonify({"estado": "ok", "pid": os.getpid(), "snapshot": os.path.exists(DATA_PATH)})
 
 
 @app.route("/")
 def dashboard():
-    return render_template("dashboard_docente.html")
+    return render_template("dashboard_docente.html", url_eventos=f"http://{HOST_EVENTOS}:{PUERTO_EVENTOS}/eventos")
 
 
 # --- NUEVA VISTA DE DETALLE ---
 
+def consultar_historial(consulta, *args):
+    """
+    Ejecuta una consulta de historial_riesgo con una conexión de solo lectura. Si el agente aún no
+    creó el historial o la consulta falla, retorna una lista vacía (la vista se muestra sin tendencia).
+    """
+    try:
+        conexion = historial_riesgo.conectar(HISTORIAL_PATH, solo_lectura=True)
+        if conexion is None:
+            return []
+        try:
+            return consulta(conexion, *args)
+        finally:
+            conexion.close()
+    except sqlite3.Error as e:
+        print(f"Error al consultar el historial de riesgo: {e}")
+        return []
+
+
+def puntos_grafico(tendencia, ancho=ANCHO_GRAFICO_TENDENCIA, alto=ALTO_GRAFICO_TENDENCIA):
+    """
+    Coordenadas SVG "x,y" de la tendencia: el tiempo en el eje x y la probabilidad (0 a 1) en el eje y.
+    """
+    if not tendencia:
+        return ""
+    inicio = tendencia[0]["tiempo"]
+    rango = max(tendencia[-1]["tiempo"] - inicio, 1)
+    return " ".join(
+        f"{(punto['tiempo'] - inicio) / rango * ancho:.1f},{(1 - punto['Riesgo_Probabilidad']) * alto:.1f}"
+        for punto in tendencia
+    )
+
+
 @app.route("/detalle/<int:student_id>")
 def detalle_estudiante(student_id):
-    # 1. Cargar la lista de estudiantes
-    estudiantes = load_data()
-
-    # 2. Buscar al estudiante por ID
-    student = next((item for item in estudiantes if item.get('id') == student_id), None)
+    # 1. Buscar al estudiante por ID en el índice del snapshot (O(1))
+    student = obtener_snapshot()["por_id"].get(student_id)
 
-    # 3. Manejar el caso de estudiante no encontrado
+    # 2. Manejar el caso de estudiante no encontrado
     if student is None:
         # Flask tiene una función abort para generar un error 404
         abort(404, description=f"Estudiante con ID {student_id} no encontrado.")
 
+    # 3. Tendencia desde el historial (consulta por rango sobre la clave id + tiempo)
+    tendencia = consultar_historial(
+        historial_riesgo.tendencia_estudiante, student_id, time.time() - DIAS_TENDENCIA * 86400
+    )
+    for punto in tendencia:
+        punto["fecha"] = datetime.fromtimestamp(punto["tiempo"]).strftime("%d/%m/%Y %H:%M")
+
     # 4. Renderizar la nueva plantilla con los datos del estudiante
-    return render_template("detalle_estudiante.html", student=student)
+    return render_template(
+        "detalle_estudiante.html", student=student, tendencia=tendencia, puntos_tendencia=puntos_grafico(tendencia),
+        ancho_grafico=ANCHO_GRAFICO_TENDENCIA, alto_grafico=ALTO_GRAFICO_TENDENCIA,
+    )
+
+
+@app.route("/api/empeorados")
+def api_empeorados():
+    """
+    Estudiantes cuya probabilidad de riesgo subió al menos `delta` (por defecto 0.10) en los últimos `dias`
+    (por defecto 7), según el historial. Parámetros: dias, delta y limit.
+    """
+    dias, error = parsear_numero("dias", 7, float)
+    if error is None:
+        delta, error = parsear_numero("delta", 0.10, float)
+    if error is None:
+        limit, error = parsear_numero("limit", LIMITE_PAGINA)
+    if error:
+        return jsonify({"error": error}), 400
+    if dias <= 0 or not 0 < limit <= LIMITE_PAGINA_MAXIMO:
+        return jsonify({"error": f"dias debe ser positivo y limit entre 1 y {LIMITE_PAGINA_MAXIMO}"}), 400
+
+    desde = time.time() - dias * 86400
+    estudiantes = consultar_historial(historial_riesgo.estudiantes_empeorados, desde, delta, limit)
+    por_id = obtener_snapshot()["por_id"]
+    for estudiante in estudiantes:
+        estudiante["Carrera"] = por_id.get(estudiante["id"], {}).get("Carrera")
+    return jsonify({
+        "desde": datetime.fromtimestamp(desde, tz=timezone.utc).isoformat(),
+        "estudiantes": estudiantes,
+    })
+
+
+# --- EVENTOS EN VIVO (SSE) ---
+
+def calcular_deltas(anterior, actual):
+    """
+    Compara dos snapshots y retorna solo lo que cambió para las tarjetas: estudiantes con otro
+    Indice_Riesgo/Nivel_Alerta (o nuevos), ids eliminados, ids que pasan a ALTO y el resumen por carrera.
+    Se calcula una vez por ciclo del agente, no una vez por cliente.
+    """
+    tarjetas_anteriores = {t["id"]: t for t in anterior["tarjetas"]}
+    cambios, nuevas_alertas = [], []
+    for tarjeta in actual["tarjetas"]:
+        previa = tarjetas_anteriores.pop(tarjeta["id"], None)
+        if previa is None or previa["Indice_Riesgo"] != tarjeta["Indice_Riesgo"] \
+                or previa["Nivel_Alerta"] != tarjeta["Nivel_Alerta"]:
+            cambios.append(tarjeta)
+            if tarjeta["Nivel_Alerta"] == "ALTO" and (previa is None or previa["Nivel_Alerta"] != "ALTO"):
+                nuevas_alertas.append(tarjeta["id"])
+
+    return {
+        "etag": actual["etag"],
+        "timestamp": actual["datos"].get("timestamp"),
+        "cambios": cambios,
+        "eliminados": list(tarjetas_anteriores),
+        "nuevas_alertas": nuevas_alertas,
+        "resumen": actual["resumen"],
+    }
+
+
+def formatear_evento(evento, datos, id_evento=None):
+    """
+    Serializa un evento en el formato text/event-stream.
+    """
+    lineas = [f"id: {id_evento}"] if id_evento else []
+    lineas += [f"event: {evento}", f"data: {json.dumps(datos, separators=(',', ':'))}", "", ""]
+    return "\n".join(lineas).encode("utf-8")
+
+
+_clientes_eventos = set()
+
+
+async def atender_cliente_eventos(reader, writer):
+    """
+    Atiende una conexión HTTP al servidor de eventos: valida GET /eventos, envía los encabezados SSE
+    y deja el socket registrado hasta que el cliente se desconecta.
+    """
+    try:
+        solicitud = (await reader.readline()).decode("latin-1").split()
+        encabezados = {}
+        while True:
+            linea = (await reader.readline()).decode("latin-1").strip()
+            if not linea:
+                break
+            nombre, _, valor = linea.partition(":")
+            encabezados[nombre.strip().lower()] = valor.strip()
+
+        if len(solicitud) < 2 or solicitud[0] != "GET" or solicitud[1].split("?")[0] != "/eventos":
+            writer.write(b"HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+            await writer.drain()
+            return
+
+        writer.write(
+            b"HTTP/1.1 200 OK\r\n"
+            b"Content-Type: text/event-stream\r\n"
+            b"Cache-Control: no-cache\r\n"
+            b"Connection: keep-alive\r\n"
+            b"Access-Control-Allow-Origin: *\r\n\r\n"
+            b"retry: 5000\n\n"
+        )
+        # Si el cliente se reconecta y se perdió un ciclo, se le pide recargar en vez de reenviar historia
+        etag = _snapshot["etag"]
+        ultimo = encabezados.get("last-event-id")
+        if ultimo and etag and ultimo != etag:
+            writer.write(formatear_evento("recargar", {"etag": etag}, etag))
+        await writer.drain()
+
+        _clientes_eventos.add(writer)
+        fijar("comovoy_dashboard_clientes_eventos", len(_clientes_eventos), ayuda="Clientes conectados al stream de eventos")
+        while await reader.read(1024):
+            pass
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        _clientes_eventos.discard(writer)
+        fijar("comovoy_dashboard_clientes_eventos", len(_clientes_eventos), ayuda="Clientes conectados al stream de eventos")
+        writer.close()
+
+
+async def enviar_a_clientes(mensaje):
+    """
+    Envía el mismo mensaje a todos los clientes; los que no alcanzan a recibirlo a tiempo se desconectan.
+    """
+    async def enviar(writer):
+        try:
+            writer.write(mensaje)
+            await asyncio.wait_for(writer.drain(), timeout=INTERVALO_LATIDO_EVENTOS)
+        except (ConnectionError, asyncio.TimeoutError):
+            _clientes_eventos.discard(writer)
+            writer.close()
+
+    await asyncio.gather(*(enviar(writer) for writer in list(_clientes_eventos)))
+
+
+async def difundir_cambios():
+    """
+    Revisa periódicamente si el agente publicó un snapshot nuevo y difunde los deltas a todos los clientes.
+    Entre ciclos envía un comentario de latido para detectar conexiones muertas.
+    """
+    loop = asyncio.get_running_loop()
+    anterior = await loop.run_in_executor(None, obtener_snapshot)
+    ultimo_envio = loop.time()
+
+    while True:
+        await asyncio.sleep(INTERVALO_REVISION_EVENTOS)
+        # La recarga del JSON es bloqueante, se hace fuera del loop de eventos
+        actual = await loop.run_in_executor(None, obtener_snapshot)
+
+        if actual["etag"] != anterior["etag"]:
+            deltas = calcular_deltas(anterior, actual)
+            anterior = actual
+            await enviar_a_clientes(formatear_evento("cambios", deltas, actual["etag"]))
+            ultimo_envio = loop.time()
+        elif loop.time() - ultimo_envio >= INTERVALO_LATIDO_EVENTOS:
+            await enviar_a_clientes(b": latido\n\n")
+            ultimo_envio = loop.time()
+
+
+async def servir_eventos(host, puerto):
+    servidor = await asyncio.start_server(atender_cliente_eventos, host, puerto)
+    async with servidor:
+        await asyncio.gather(servidor.serve_forever(), difundir_cambios())
+
+
+def iniciar_servidor_eventos(host=HOST_EVENTOS, puerto=PUERTO_EVENTOS):
+    """
+    Inicia el servidor SSE en un hilo daemon con su propio loop de asyncio.
+    """
+    hilo = threading.Thread(target=asyncio.run, args=(servir_eventos(host, puerto),), daemon=True)
+    hilo.start()
+    return hilo
 
 
 if __name__ == "__main__":
-    app.run(host="127.0.0.1", port=5001, debug=True)
\ No newline at end of file
+    from werkzeug.serving import make_server
+
+    # Con varios workers (app.py en la raíz) comparten el socket COMOVOY_SOCKET_FD; el servidor SSE
+    # tiene su propio puerto y corre solo en el primero (COMOVOY_WORKER=0)
+    if os.environ.get("COMOVOY_WORKER", "0") == "0":
+        iniciar_servidor_eventos()
+    servir_metricas_worker()
+    fd = os.environ.get("COMOVOY_SOCKET_FD")
+    make_server("127.0.0.1", 5001, app, threaded=True, fd=int(fd) if fd else None).serve_forever()
\ No newline at end of file
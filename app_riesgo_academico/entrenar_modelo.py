@@ -1,17 +1,23 @@
+import argparse
+import csv
+import hashlib
+import shutil
+import sqlite3
+import tempfile
+import time
 import numpy as np
 import pandas as pd
 import os
 from joblib import dump
-import matplotlib.pyplot as plt
-import seaborn as sns
 
 from scipy.stats import uniform, randint
-from sklearn.ensemble import GradientBoostingClassifier
-from sklearn.model_selection import train_test_split, RandomizedSearchCV, StratifiedKFold
+from sklearn.ensemble import GradientBoostingClassifier, HistGradientBoostingClassifier
+from sklearn.experimental import enable_halving_search_cv  # noqa: F401 (habilita HalvingRandomSearchCV)
+from sklearn.model_selection import train_test_split, RandomizedSearchCV, HalvingRandomSearchCV, StratifiedKFold
 from sklearn.metrics import accuracy_score, confusion_matrix, roc_curve, auc, classification_report
 from sklearn.pipeline import Pipeline
 from sklearn.compose import ColumnTransformer
-from sklearn.preprocessing import StandardScaler, OneHotEncoder
+from sklearn.preprocessing import StandardScaler, OneHotEncoder, OrdinalEncoder
 from sklearn.impute import SimpleImputer
 
 # --- Configuración General ---
@@ -22,7 +28,28 @@ DATA_FILE_PATH = "data/dataset.csv"
 TARGET_COLUMN = "Aprobado"
 TEST_SIZE_RATIO = 0.20
 VAL_SIZE_RATIO = 0.25
-N_ITER = 60
+
+# Carga del dataset: el delimitador se detecta con una muestra del inicio del archivo y el frame limpio
+# se guarda como .npz columnar en CACHE_DATOS_DIR, identificado por el hash del CSV de origen
+CACHE_DATOS_DIR = "data/cache"
+BYTES_MUESTRA_DELIMITADOR = 64 * 1024
+DELIMITADORES_CANDIDATOS = ";,\t|"
+
+# Fuente alternativa: la tabla estudiantes de la base de la API, leída por bloques
+DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api", "comovoy.db")
+TABLA_ESTUDIANTES = "estudiantes"
+TAMANO_BLOQUE_DB = 50000
+# Nombres de columna de la base que difieren de los usados en el entrenamiento
+COLUMNAS_DB = {'Género': 'Genero', 'Región': 'Region'}
+
+# Estrategias de búsqueda de hiperparámetros:
+# - aleatoria: RandomizedSearchCV sobre GradientBoostingClassifier (comportamiento original)
+# - halving: HalvingRandomSearchCV, descarta candidatos con pocas muestras/árboles antes de los ajustes completos
+# - hist: HistGradientBoostingClassifier con categóricas nativas y early stopping, con búsqueda halving
+ESTRATEGIAS_BUSQUEDA = ("aleatoria", "halving", "hist")
+N_ITER_BUSQUEDA = 70
+# Con presupuesto de tiempo, la búsqueda aleatoria se divide en rondas de este tamaño
+CANDIDATOS_POR_RONDA = 10
 
 NUMERIC_FEATURES = [
     'C1', 'C2', 'CR',
@@ -45,29 +72,129 @@ CATEGORICAL_FEATURES = [
 ALL_FEATURES = NUMERIC_FEATURES + CATEGORICAL_FEATURES
 
 
-def cargar_preprocesar_datos(file_path: str, feature_cols: list, target_col: str):
+def normalizar_columna(nombre: str) -> str:
+    return nombre.strip().replace(' ', '_').replace('.', '')
+
+
+def detectar_delimitador(file_path: str) -> str:
+    """
+    Detecta el delimitador del CSV leyendo solo una muestra del inicio del archivo (';' si no se puede decidir).
+    """
+    with open(file_path, newline='', encoding='utf-8', errors='replace') as f:
+        muestra = f.read(BYTES_MUESTRA_DELIMITADOR)
+    if '\n' in muestra:
+        muestra = muestra[:muestra.rindex('\n')]
     try:
-        try:
-            df = pd.read_csv(file_path, delimiter=';')
-        except Exception:
-            df = pd.read_csv(file_path, delimiter=',')
+        return csv.Sniffer().sniff(muestra, delimiters=DELIMITADORES_CANDIDATOS).delimiter
+    except csv.Error:
+        return ';'
 
-        print(f"Datos cargados: {df.shape[0]} registros, {df.shape[1]} columnas.")
 
-        df.columns = df.columns.str.strip().str.replace(' ', '_').str.replace('.', '', regex=False)
+def hash_archivo(file_path: str) -> str:
+    sha = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for bloque in iter(lambda: f.read(1 << 20), b''):
+            sha.update(bloque)
+    return sha.hexdigest()[:16]
 
-        if target_col not in df.columns:
-            raise KeyError(target_col)
 
-        df[target_col] = df[target_col].fillna(0).astype(int)
+def tipos_columnas(feature_cols: list, target_col: str) -> dict:
+    """
+    dtypes explícitos para la lectura: category para las categóricas y float32 para el resto
+    (float y no int para admitir vacíos en notas, puntajes y año de egreso).
+    """
+    tipos = {col: ('category' if col in CATEGORICAL_FEATURES else 'float32') for col in feature_cols}
+    tipos[target_col] = 'float32'
+    return tipos
+
+
+def ruta_cache_datos(file_path: str, feature_cols: list, target_col: str) -> str:
+    """
+    Ruta del .npz del frame limpio: depende del contenido del CSV y de las columnas pedidas.
+    """
+    clave = hashlib.sha256(f"{hash_archivo(file_path)}|{target_col}|{','.join(feature_cols)}".encode()).hexdigest()[:16]
+    return os.path.join(CACHE_DATOS_DIR, f"{os.path.splitext(os.path.basename(file_path))[0]}_{clave}.npz")
+
+
+def guardar_cache_datos(X: pd.DataFrame, y: pd.Series, path: str):
+    """
+    Guarda X e y como .npz columnar (códigos + categorías para las categóricas), con escritura atómica.
+    """
+    arrays = {'__columnas__': np.array(list(X.columns)), '__objetivo__': y.to_numpy()}
+    for col in X.columns:
+        if isinstance(X[col].dtype, pd.CategoricalDtype):
+            arrays[f'{col}__codigos'] = X[col].cat.codes.to_numpy(dtype=np.int32)
+            arrays[f'{col}__categorias'] = X[col].cat.categories.to_numpy(dtype=str)
+        else:
+            arrays[col] = X[col].to_numpy()
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    try:
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, path)
+        print(f"Cache de datos guardado en: {path}")
+    except OSError as e:
+        print(f"No se pudo guardar el cache de datos: {e}")
 
-        missing_feats = [f for f in feature_cols if f not in df.columns]
+
+def cargar_cache_datos(path: str):
+    """
+    :return: (X, y) desde el .npz columnar
+    """
+    with np.load(path, allow_pickle=False) as archivo:
+        columnas = {}
+        for col in archivo['__columnas__'].tolist():
+            if f'{col}__codigos' in archivo:
+                columnas[col] = pd.Categorical.from_codes(archivo[f'{col}__codigos'], archivo[f'{col}__categorias'])
+            else:
+                columnas[col] = archivo[col]
+        y = archivo['__objetivo__']
+    return pd.DataFrame(columnas, copy=False), pd.Series(y, name=TARGET_COLUMN)
+
+
+def cargar_preprocesar_datos(file_path: str, feature_cols: list, target_col: str, usar_cache: bool = True):
+    """
+    Lee solo las columnas necesarias del CSV con dtypes explícitos y retorna (X, y).
+    Si existe un cache del mismo archivo (mismo hash) lo usa en vez de parsear el CSV.
+    """
+    try:
+        path_cache = ruta_cache_datos(file_path, feature_cols, target_col) if usar_cache else None
+        if path_cache and os.path.exists(path_cache):
+            X, y = cargar_cache_datos(path_cache)
+            print(f"Datos cargados desde cache ({path_cache}): {X.shape[0]} registros, {X.shape[1]} columnas.")
+            return X, y
+
+        delimitador = detectar_delimitador(file_path)
+        encabezado = pd.read_csv(file_path, delimiter=delimitador, nrows=0).columns
+        # Los nombres del archivo se normalizan igual que antes; usecols y dtype usan los nombres originales
+        originales = {normalizar_columna(col): col for col in encabezado}
+
+        if target_col not in originales:
+            raise KeyError(target_col)
+
+        missing_feats = [f for f in feature_cols if f not in originales]
         if missing_feats:
             print(f"Atención: faltan columnas esperadas: {missing_feats}")
             raise KeyError(f"Faltan features: {missing_feats}")
 
-        X = df[feature_cols].copy()
-        y = df[target_col].copy()
+        tipos = tipos_columnas(feature_cols, target_col)
+        df = pd.read_csv(
+            file_path,
+            delimiter=delimitador,
+            usecols=[originales[col] for col in tipos],
+            dtype={originales[col]: tipo for col, tipo in tipos.items()}
+        )
+        df.columns = [normalizar_columna(col) for col in df.columns]
+
+        print(f"Datos cargados: {df.shape[0]} registros, {len(tipos)} columnas (delimitador '{delimitador}').")
+
+        y = df.pop(target_col).fillna(0).astype(np.int8)
+        X = df[feature_cols]
+
+        if path_cache:
+            guardar_cache_datos(X, y, path_cache)
         return X, y
 
     except FileNotFoundError:
@@ -77,18 +204,96 @@ def cargar_preprocesar_datos(file_path: str, feature_cols: list, target_col: str
         print(f"Error al cargar datos: {e}")
         raise
 
-def entrenar_modelo(X_train: pd.DataFrame, y_train: pd.Series):
+def cargar_datos_db(db_path: str, feature_cols: list, target_col: str, tamano_bloque: int = TAMANO_BLOQUE_DB):
+    """
+    Lee el dataset de entrenamiento directamente desde la base de la API, por bloques y en una sola
+    transacción de lectura. Las numéricas se escriben en arrays float32 preasignados y las categóricas
+    como códigos int32, guardando cada texto distinto una sola vez.
+    :return: (X, y) con los mismos dtypes que cargar_preprocesar_datos
+    """
+    if not os.path.exists(db_path):
+        print(f"No se encuentra la base de datos: {db_path}")
+        raise FileNotFoundError(db_path)
+
+    numericas = [col for col in feature_cols if col not in CATEGORICAL_FEATURES]
+    categoricas = [col for col in feature_cols if col in CATEGORICAL_FEATURES]
+    columnas_db = ', '.join(f'"{COLUMNAS_DB.get(col, col)}"' for col in numericas + categoricas + [target_col])
 
+    conexion = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, isolation_level=None)
+    try:
+        conexion.execute("BEGIN")
+        n = conexion.execute(f"SELECT COUNT(*) FROM {TABLA_ESTUDIANTES}").fetchone()[0]
+        cursor = conexion.execute(f"SELECT {columnas_db} FROM {TABLA_ESTUDIANTES} ORDER BY id")
+
+        matriz = np.empty((len(numericas), n), dtype=np.float32)
+        codigos = np.empty((len(categoricas), n), dtype=np.int32)
+        categorias = [{} for _ in categoricas]
+        objetivo = np.empty(n, dtype=np.float32)
+
+        inicio = 0
+        while inicio < n:
+            filas = cursor.fetchmany(min(tamano_bloque, n - inicio))
+            if not filas:
+                break
+            fin = inicio + len(filas)
+            columnas = list(zip(*filas))
+            matriz[:, inicio:fin] = np.array(columnas[:len(numericas)], dtype=np.float32)
+            for j, valores in enumerate(columnas[len(numericas):-1]):
+                vistas = categorias[j]
+                codigos[j, inicio:fin] = np.fromiter(
+                    (-1 if v is None else vistas.setdefault(v, len(vistas)) for v in valores),
+                    dtype=np.int32, count=len(filas)
+                )
+            objetivo[inicio:fin] = np.array(columnas[-1], dtype=np.float32)
+            inicio = fin
+            print(f"Leídos {fin}/{n} registros de la base...")
+        conexion.execute("COMMIT")
+    finally:
+        conexion.close()
+
+    columnas_x = {col: matriz[i, :inicio] for i, col in enumerate(numericas)}
+    columnas_x.update({
+        col: pd.Categorical.from_codes(codigos[j, :inicio], list(categorias[j]))
+        for j, col in enumerate(categoricas)
+    })
+    X = pd.DataFrame(columnas_x, copy=False)[feature_cols]
+    y = pd.Series(np.nan_to_num(objetivo[:inicio], nan=0).astype(np.int8), name=target_col)
+    print(f"Datos cargados desde la base: {X.shape[0]} registros, {X.shape[1]} columnas.")
+    return X, y
+
+
+def construir_pipeline(estrategia: str = "aleatoria", memory=None):
+    """
+    Pipeline preprocesador + clasificador. Para 'hist' las categóricas se codifican como ordinales y el
+    HistGradientBoostingClassifier las trata de forma nativa; el resto usa OneHotEncoder + GradientBoosting.
+    memory es el directorio donde el Pipeline cachea el preprocesador ajustado (None = sin caché).
+    """
     numeric_transformer = Pipeline(steps=[
         ('imputer', SimpleImputer(strategy='median')),
         ('scaler', StandardScaler())
     ])
 
-    categorical_transformer = OneHotEncoder(
-        handle_unknown='ignore',
-        sparse_output=False,
-        max_categories=10
-    )
+    if estrategia == "hist":
+        categorical_transformer = OrdinalEncoder(
+            handle_unknown='use_encoded_value',
+            unknown_value=np.nan,
+            encoded_missing_value=np.nan
+        )
+        clasificador = HistGradientBoostingClassifier(
+            categorical_features=[False] * len(NUMERIC_FEATURES) + [True] * len(CATEGORICAL_FEATURES),
+            early_stopping=True,
+            validation_fraction=0.1,
+            n_iter_no_change=15,
+            scoring='roc_auc',
+            random_state=RANDOM_STATE
+        )
+    else:
+        categorical_transformer = OneHotEncoder(
+            handle_unknown='ignore',
+            sparse_output=False,
+            max_categories=10
+        )
+        clasificador = GradientBoostingClassifier(random_state=RANDOM_STATE)
 
     preprocesador = ColumnTransformer(
         transformers=[
@@ -97,10 +302,26 @@ def entrenar_modelo(X_train: pd.DataFrame, y_train: pd.Series):
         ]
     )
 
-    full_pipeline = Pipeline(steps=[
+    return Pipeline(steps=[
         ('preprocesador', preprocesador),
-        ('clasificador', GradientBoostingClassifier(random_state=RANDOM_STATE))
-    ])
+        ('clasificador', clasificador)
+    ], memory=memory)
+
+
+def espacio_parametros(estrategia: str = "aleatoria", recurso: str = "n_samples"):
+    """
+    Distribuciones de hiperparámetros del clasificador según la estrategia. Si el recurso del halving es
+    n_estimators, ese parámetro lo controla la búsqueda y se quita de la distribución.
+    """
+    if estrategia == "hist":
+        return {
+            'clasificador__learning_rate': uniform(0.03, 0.12),
+            'clasificador__max_iter': [200, 400, 600],
+            'clasificador__max_depth': [2, 3, 4, None],
+            'clasificador__max_leaf_nodes': [7, 15, 31],
+            'clasificador__min_samples_leaf': [20, 50, 100],
+            'clasificador__l2_regularization': uniform(0.0, 1.0),
+        }
 
     param_dist = {
         'clasificador__n_estimators': randint(80, 200),
@@ -111,27 +332,124 @@ def entrenar_modelo(X_train: pd.DataFrame, y_train: pd.Series):
         'clasificador__subsample': uniform(0.5, 0.2),
         'clasificador__max_features': ['sqrt', 'log2'],
     }
+    if estrategia == "halving" and recurso == "n_estimators":
+        del param_dist['clasificador__n_estimators']
+    return param_dist
 
-    cv_strategy = StratifiedKFold(n_splits=5, shuffle=True, random_state=RANDOM_STATE)
 
-    random_search = RandomizedSearchCV(
-        estimator=full_pipeline,
+def crear_busqueda(estrategia, pipeline, param_dist, cv_strategy, n_iter, semilla, recurso="n_samples"):
+    """
+    Construye el objeto de búsqueda de sklearn para una estrategia (una ronda de búsqueda).
+    """
+    if estrategia == "aleatoria":
+        return RandomizedSearchCV(
+            estimator=pipeline,
+            param_distributions=param_dist,
+            n_iter=n_iter,
+            cv=cv_strategy,
+            scoring="roc_auc",
+            random_state=semilla,
+            n_jobs=-1,
+            verbose=1
+        )
+
+    parametros_recurso = {}
+    if estrategia == "halving" and recurso == "n_estimators":
+        parametros_recurso = {'resource': 'clasificador__n_estimators', 'min_resources': 20, 'max_resources': 200}
+    return HalvingRandomSearchCV(
+        estimator=pipeline,
         param_distributions=param_dist,
-        n_iter=70,
+        n_candidates=n_iter,
+        factor=3,
         cv=cv_strategy,
         scoring="roc_auc",
-        random_state=RANDOM_STATE,
+        random_state=semilla,
         n_jobs=-1,
-        verbose=1
+        verbose=1,
+        **parametros_recurso
     )
 
-    print("\nIniciando RandomizedSearchCV (modelo regularizado)...")
-    random_search.fit(X_train, y_train)
 
-    print("\nMejores parámetros encontrados:")
-    print(random_search.best_params_)
+def entrenar_modelo(X_train: pd.DataFrame, y_train: pd.Series, estrategia: str = "aleatoria",
+                    presupuesto_segundos: float = None, recurso: str = "n_samples",
+                    cachear_preprocesamiento: bool = False):
+    """
+    Busca hiperparámetros con la estrategia indicada y retorna el mejor pipeline reentrenado.
+    Con presupuesto_segundos la búsqueda se hace por rondas de CANDIDATOS_POR_RONDA candidatos y no se
+    inicia una ronda nueva una vez agotado el presupuesto (la ronda en curso siempre termina).
+    Con cachear_preprocesamiento el ColumnTransformer se ajusta una sola vez por fold y todos los
+    candidatos reutilizan las matrices transformadas desde un directorio temporal compartido por los
+    procesos de la búsqueda; el pipeline retornado no conserva la caché.
+    """
+    if estrategia not in ESTRATEGIAS_BUSQUEDA:
+        raise ValueError(f"Estrategia desconocida: {estrategia}. Opciones: {ESTRATEGIAS_BUSQUEDA}")
+
+    directorio_cache = tempfile.mkdtemp(prefix='comovoy_preproc_') if cachear_preprocesamiento else None
+    try:
+        mejor_pipeline = buscar_hiperparametros(
+            X_train, y_train, construir_pipeline(estrategia, memory=directorio_cache),
+            estrategia, presupuesto_segundos, recurso
+        )
+    finally:
+        if directorio_cache:
+            shutil.rmtree(directorio_cache, ignore_errors=True)
+
+    # El modelo exportado debe ser el mismo Pipeline de siempre, sin referencia al directorio temporal
+    mejor_pipeline.set_params(memory=None)
+    return mejor_pipeline
+
+
+def buscar_hiperparametros(X_train, y_train, full_pipeline, estrategia, presupuesto_segundos, recurso):
+    """
+    Ejecuta las rondas de búsqueda sobre full_pipeline y retorna el mejor estimador reentrenado.
+    """
+    param_dist = espacio_parametros(estrategia, recurso)
+    cv_strategy = StratifiedKFold(n_splits=5, shuffle=True, random_state=RANDOM_STATE)
+
+    candidatos_ronda = N_ITER_BUSQUEDA if presupuesto_segundos is None else CANDIDATOS_POR_RONDA
+    n_rondas = -(-N_ITER_BUSQUEDA // candidatos_ronda)
+
+    print(f"\nIniciando búsqueda '{estrategia}' ({N_ITER_BUSQUEDA} candidatos"
+          f"{'' if presupuesto_segundos is None else f', presupuesto {presupuesto_segundos:.0f}s'})...")
+    inicio = time.perf_counter()
+    mejor_busqueda = None
+    for ronda in range(n_rondas):
+        if presupuesto_segundos is not None and time.perf_counter() - inicio >= presupuesto_segundos:
+            print(f"Presupuesto agotado tras {ronda} rondas.")
+            break
+        busqueda = crear_busqueda(estrategia, full_pipeline, param_dist, cv_strategy,
+                                  candidatos_ronda, RANDOM_STATE + ronda, recurso)
+        busqueda.fit(X_train, y_train)
+        if mejor_busqueda is None or busqueda.best_score_ > mejor_busqueda.best_score_:
+            mejor_busqueda = busqueda
+
+    duracion = time.perf_counter() - inicio
+    print(f"\nBúsqueda '{estrategia}' finalizada en {duracion:.1f}s. Mejor AUC CV: {mejor_busqueda.best_score_:.4f}")
+    print("Mejores parámetros encontrados:")
+    print(mejor_busqueda.best_params_)
+
+    return mejor_busqueda.best_estimator_
+
+
+def comparar_estrategias(X_train, y_train, X_val, y_val, estrategias, presupuesto_segundos=None, recurso="n_samples",
+                         cachear_preprocesamiento=False):
+    """
+    Entrena con cada estrategia y reporta el AUC en validación y el tiempo, para compararlas con la búsqueda actual.
+    :return: DataFrame con estrategia, AUC y segundos
+    """
+    filas = []
+    for estrategia in estrategias:
+        inicio = time.perf_counter()
+        modelo = entrenar_modelo(X_train, y_train, estrategia, presupuesto_segundos, recurso, cachear_preprocesamiento)
+        duracion = time.perf_counter() - inicio
+        fpr, tpr, _ = roc_curve(y_val, modelo.predict_proba(X_val)[:, 0], pos_label=0)
+        filas.append({'Estrategia': estrategia, 'AUC_Validacion': auc(fpr, tpr), 'Segundos': duracion})
+
+    resultado = pd.DataFrame(filas)
+    print("\n--- Comparación de estrategias de búsqueda ---")
+    print(resultado.to_string(index=False))
+    return resultado
 
-    return random_search.best_estimator_
 
 def evaluar_modelo(model: Pipeline, X_data: pd.DataFrame, y_true: pd.Series, subset_name: str, umbral: float = 0.5):
     print(f"\n--- Evaluación: {subset_name}") #(Umbral: {umbral:.2f}---
@@ -153,6 +471,10 @@ def evaluar_modelo(model: Pipeline, X_data: pd.DataFrame, y_true: pd.Series, sub
     return y_pred, y_proba_riesgo, cm, roc_auc
 
 def plot_metricas(cm, y_test, y_proba_riesgo, roc_auc):
+    # Importaciones diferidas: matplotlib/seaborn solo se necesitan para los gráficos, no para cargar datos
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
     fig, axes = plt.subplots(1, 2, figsize=(16, 6))
 
     sns.heatmap(cm, annot=True, fmt='d', cmap='Blues', ax=axes[0],
@@ -173,9 +495,14 @@ def plot_metricas(cm, y_test, y_proba_riesgo, roc_auc):
     plt.show()
     print(f"Gráficos guardados en: {plt_path}")
 
-def main():
+def main(estrategia: str = "aleatoria", presupuesto_segundos: float = None, recurso: str = "n_samples",
+         comparar: bool = False, cachear_preprocesamiento: bool = False, usar_cache_datos: bool = True,
+         fuente: str = "csv", db_path: str = DB_PATH):
     UMBRAL = 0.75
-    X, y = cargar_preprocesar_datos(DATA_FILE_PATH, ALL_FEATURES, TARGET_COLUMN)
+    if fuente == "db":
+        X, y = cargar_datos_db(db_path, ALL_FEATURES, TARGET_COLUMN)
+    else:
+        X, y = cargar_preprocesar_datos(DATA_FILE_PATH, ALL_FEATURES, TARGET_COLUMN, usar_cache_datos)
 
     X_train_val, X_test, y_train_val, y_test = train_test_split(
         X, y, test_size=TEST_SIZE_RATIO, random_state=RANDOM_STATE, stratify=y
@@ -188,7 +515,14 @@ def main():
     print("\n--- División de datos ---")
     print(f"Total: {X.shape[0]}  Train: {X_train.shape[0]}  Val: {X_val.shape[0]}  Test: {X_test.shape[0]}")
 
-    best_pipeline = entrenar_modelo(X_train, y_train)
+    if comparar:
+        estrategias = ["aleatoria"] + ([estrategia] if estrategia != "aleatoria" else [])
+        comparar_estrategias(X_train, y_train, X_val, y_val, estrategias, presupuesto_segundos, recurso,
+                             cachear_preprocesamiento)
+        return
+
+    best_pipeline = entrenar_modelo(X_train, y_train, estrategia, presupuesto_segundos, recurso,
+                                    cachear_preprocesamiento)
 
     evaluar_modelo(best_pipeline, X_val, y_val, "Validación")
     y_pred_test, y_proba_riesgo_test, cm_test, roc_auc_test = evaluar_modelo(
@@ -197,18 +531,25 @@ def main():
     )
 
     plot_metricas(cm_test, y_test, y_proba_riesgo_test, roc_auc_test)
-    importance_df = get_feature_importances(
-        best_pipeline,
-        NUMERIC_FEATURES,
-        CATEGORICAL_FEATURES
-    )
-
-    print(importance_df.head(10))
-    plot_feature_importances(importance_df, top_n=15)
+    if hasattr(best_pipeline.named_steps['clasificador'], 'feature_importances_'):
+        importance_df = get_feature_importances(
+            best_pipeline,
+            NUMERIC_FEATURES,
+            CATEGORICAL_FEATURES
+        )
+
+        print(importance_df.head(10))
+        plot_feature_importances(importance_df, top_n=15)
     os.makedirs(MODEL_DIR, exist_ok=True)
     dump(best_pipeline, os.path.join(MODEL_DIR, MODEL_FILE))
     print(f"Pipeline guardado en: {os.path.join(MODEL_DIR, MODEL_FILE)}")
 
+    # Exportación para la ruta de inferencia compilada, verificando paridad sobre el conjunto de prueba
+    # (solo soportada para GradientBoostingClassifier)
+    if isinstance(best_pipeline.named_steps['clasificador'], GradientBoostingClassifier):
+        from modelo_compilado import exportar, MODELO_COMPILADO_PATH
+        exportar(os.path.join(MODEL_DIR, MODEL_FILE), MODELO_COMPILADO_PATH, X_test)
+
 
 def get_feature_importances(pipeline, num_features: list, cat_features: list):
     """
@@ -248,6 +589,8 @@ def get_feature_importances(pipeline, num_features: list, cat_features: list):
 
 def plot_feature_importances(importance_df, top_n=15):
     """Grafica la importancia de las Top N características."""
+    import matplotlib.pyplot as plt
+    import seaborn as sns
 
     top_features = importance_df.head(top_n).copy()
     top_features['Feature_Short'] = top_features['Feature'].str.replace('^num__|^cat__', '', regex=True)
@@ -269,5 +612,24 @@ def plot_feature_importances(importance_df, top_n=15):
     plt.show()
     print(f"Gráfico de importancia de características guardado en: {plot_path}")
 if __name__ == '__main__':
-    main()
+    parser = argparse.ArgumentParser(description='Entrena el modelo de riesgo académico ComoVoy.')
+    parser.add_argument('--estrategia', choices=ESTRATEGIAS_BUSQUEDA, default='aleatoria',
+                        help='Estrategia de búsqueda de hiperparámetros')
+    parser.add_argument('--presupuesto', type=float, default=None,
+                        help='Presupuesto de tiempo de la búsqueda en segundos')
+    parser.add_argument('--recurso', choices=('n_samples', 'n_estimators'), default='n_samples',
+                        help='Recurso que asigna el successive halving')
+    parser.add_argument('--comparar', action='store_true',
+                        help='Compara la estrategia con la búsqueda aleatoria actual (AUC y tiempo) sin guardar el modelo')
+    parser.add_argument('--cache-preprocesamiento', action='store_true',
+                        help='Ajusta el preprocesamiento una vez por fold y lo reutiliza en todos los candidatos')
+    parser.add_argument('--sin-cache-datos', action='store_true',
+                        help='Parsea el CSV aunque exista un cache del mismo archivo')
+    parser.add_argument('--fuente', choices=('csv', 'db'), default='csv',
+                        help=f'Origen de los datos: {DATA_FILE_PATH} o la base de la API')
+    parser.add_argument('--db', default=DB_PATH, help='Ruta de la base SQLite cuando --fuente db')
+    args = parser.parse_args()
+
+    main(args.estrategia, args.presupuesto, args.recurso, args.comparar, args.cache_preprocesamiento,
+         not args.sin_cache_datos, args.fuente, args.db)
 
@@ -0,0 +1,266 @@
+"""
+Historial de puntajes de riesgo en SQLite.
+
+El agente registra en cada ciclo solo los puntajes que cambiaron respecto del último conocido
+(riesgo_actual), con una carga masiva a una tabla temporal y dos sentencias SQL (inserción en el
+historial y upsert del último puntaje). Los puntos crudos más antiguos que RETENCION_PUNTOS_SEGUNDOS se
+compactan en agregados por hora y estos, pasado RETENCION_HORAS_SEGUNDOS, en agregados por día. Al compactar
+también se borran el puntaje actual, los puntos y los agregados de los estudiantes eliminados de la base.
+El historial y los agregados usan como clave primaria el id seguido del tiempo (tablas sin rowid), así la
+tendencia de un estudiante es una lectura por rango de esa clave y no un recorrido del historial.
+"""
+import os
+import sqlite3
+import time
+
+HISTORIAL_RIESGO_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "historial_riesgo.db")
+
+# Cambios menores a esta diferencia de probabilidad no se registran como un punto nuevo
+CAMBIO_MINIMO_PROBABILIDAD = 1e-4
+# Puntos crudos: 7 días; agregados por hora: 90 días; los agregados por día se conservan
+RETENCION_PUNTOS_SEGUNDOS = 7 * 86400
+RETENCION_HORAS_SEGUNDOS = 90 * 86400
+SEGUNDOS_HORA = 3600
+SEGUNDOS_DIA = 86400
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS riesgo_actual (
+    id INTEGER PRIMARY KEY,
+    version_modelo TEXT NOT NULL,
+    Riesgo_Probabilidad REAL NOT NULL,
+    Nivel_Alerta TEXT NOT NULL,
+    tiempo INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS riesgo_historial (
+    id INTEGER NOT NULL,
+    tiempo INTEGER NOT NULL,
+    version_modelo TEXT NOT NULL,
+    Riesgo_Probabilidad REAL NOT NULL,
+    Nivel_Alerta TEXT NOT NULL,
+    PRIMARY KEY (id, tiempo)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS ix_riesgo_historial_tiempo ON riesgo_historial (tiempo);
+CREATE TABLE IF NOT EXISTS riesgo_agregado (
+    resolucion INTEGER NOT NULL,  -- SEGUNDOS_HORA o SEGUNDOS_DIA
+    id INTEGER NOT NULL,
+    inicio INTEGER NOT NULL,
+    puntos INTEGER NOT NULL,
+    minimo REAL NOT NULL,
+    maximo REAL NOT NULL,
+    promedio REAL NOT NULL,
+    ultimo REAL NOT NULL,
+    Nivel_Alerta TEXT NOT NULL,
+    PRIMARY KEY (resolucion, id, inicio)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS ix_riesgo_agregado_inicio ON riesgo_agregado (resolucion, inicio);
+"""
+
+# Agrega las filas de `origen` (con columnas id, tiempo, puntos, minimo, maximo, promedio, ultimo, Nivel_Alerta)
+# en intervalos de :resolucion; el último valor es el de la fila más reciente de cada intervalo
+AGREGAR_INTERVALOS = """
+INSERT INTO riesgo_agregado (resolucion, id, inicio, puntos, minimo, maximo, promedio, ultimo, Nivel_Alerta)
+SELECT :resolucion, id, inicio, SUM(puntos), MIN(minimo), MAX(maximo), SUM(promedio * puntos) / SUM(puntos),
+       MAX(CASE WHEN orden = 1 THEN ultimo END), MAX(CASE WHEN orden = 1 THEN Nivel_Alerta END)
+FROM (
+    SELECT *, tiempo - tiempo % :resolucion AS inicio,
+           ROW_NUMBER() OVER (PARTITION BY id, tiempo - tiempo % :resolucion ORDER BY tiempo DESC) AS orden
+    FROM ({origen})
+)
+WHERE true
+GROUP BY id, inicio
+ON CONFLICT (resolucion, id, inicio) DO UPDATE SET
+    promedio = (promedio * puntos + excluded.promedio * excluded.puntos) / (puntos + excluded.puntos),
+    puntos = puntos + excluded.puntos,
+    minimo = MIN(minimo, excluded.minimo),
+    maximo = MAX(maximo, excluded.maximo),
+    ultimo = excluded.ultimo,
+    Nivel_Alerta = excluded.Nivel_Alerta
+"""
+
+
+def conectar(path=HISTORIAL_RIESGO_PATH, solo_lectura=False):
+    """
+    Abre la base del historial (WAL: el dashboard lee mientras el agente escribe).
+    En modo escritura crea el directorio y el esquema si no existen.
+    :return: conexión sqlite3, o None si es de solo lectura y la base aún no existe
+    """
+    if solo_lectura:
+        if not os.path.exists(path):
+            return None
+        return sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conexion = sqlite3.connect(path, isolation_level=None)
+    conexion.execute("PRAGMA journal_mode=WAL")
+    conexion.execute("PRAGMA synchronous=NORMAL")
+    conexion.execute("PRAGMA busy_timeout=5000")
+    conexion.executescript(ESQUEMA)
+    return conexion
+
+
+def registrar_puntajes(conexion, df_riesgo, version_modelo, tiempo=None):
+    """
+    Registra los puntajes del ciclo que son nuevos, cambiaron más de CAMBIO_MINIMO_PROBABILIDAD o
+    vienen de otra versión del modelo, y actualiza riesgo_actual. Todo en una transacción.
+    :return: cantidad de puntos escritos en el historial
+    """
+    tiempo = int(time.time()) if tiempo is None else int(tiempo)
+    filas = zip(
+        df_riesgo['id'].astype(int).tolist(),
+        df_riesgo['Riesgo_Probabilidad'].astype(float).tolist(),
+        df_riesgo['Nivel_Alerta'].astype(str).tolist(),
+    )
+
+    conexion.execute("BEGIN")
+    try:
+        conexion.execute(
+            "CREATE TEMP TABLE IF NOT EXISTS ciclo (id INTEGER PRIMARY KEY, Riesgo_Probabilidad REAL, Nivel_Alerta TEXT)"
+        )
+        conexion.execute("DELETE FROM ciclo")
+        conexion.executemany("INSERT INTO ciclo VALUES (?, ?, ?)", filas)
+
+        cursor = conexion.execute(
+            """
+            INSERT INTO riesgo_historial (id, tiempo, version_modelo, Riesgo_Probabilidad, Nivel_Alerta)
+            SELECT c.id, :tiempo, :version, c.Riesgo_Probabilidad, c.Nivel_Alerta
+            FROM ciclo c LEFT JOIN riesgo_actual a ON a.id = c.id
+            WHERE a.id IS NULL OR a.version_modelo != :version
+               OR ABS(a.Riesgo_Probabilidad - c.Riesgo_Probabilidad) > :minimo
+            ON CONFLICT (id, tiempo) DO UPDATE SET
+                version_modelo = excluded.version_modelo,
+                Riesgo_Probabilidad = excluded.Riesgo_Probabilidad,
+                Nivel_Alerta = excluded.Nivel_Alerta
+            """,
+            {"tiempo": tiempo, "version": version_modelo, "minimo": CAMBIO_MINIMO_PROBABILIDAD},
+        )
+        escritos = cursor.rowcount
+
+        conexion.execute(
+            """
+            INSERT INTO riesgo_actual (id, version_modelo, Riesgo_Probabilidad, Nivel_Alerta, tiempo)
+            SELECT id, :version, Riesgo_Probabilidad, Nivel_Alerta, :tiempo FROM ciclo WHERE true
+            ON CONFLICT (id) DO UPDATE SET
+                version_modelo = excluded.version_modelo,
+                Riesgo_Probabilidad = excluded.Riesgo_Probabilidad,
+                Nivel_Alerta = excluded.Nivel_Alerta,
+                tiempo = excluded.tiempo
+            WHERE riesgo_actual.version_modelo != excluded.version_modelo
+               OR ABS(riesgo_actual.Riesgo_Probabilidad - excluded.Riesgo_Probabilidad) > :minimo
+            """,
+            {"tiempo": tiempo, "version": version_modelo, "minimo": CAMBIO_MINIMO_PROBABILIDAD},
+        )
+        conexion.execute("COMMIT")
+    except Exception:
+        conexion.execute("ROLLBACK")
+        raise
+    return escritos
+
+
+def ids_registrados(conexion):
+    """
+    :return: conjunto de ids con puntaje en riesgo_actual
+    """
+    return {fila[0] for fila in conexion.execute("SELECT id FROM riesgo_actual")}
+
+
+def compactar_historial(conexion, ahora=None, eliminados=()):
+    """
+    Mueve los puntos crudos de horas completas anteriores a RETENCION_PUNTOS_SEGUNDOS a agregados por hora,
+    y los agregados por hora de días completos anteriores a RETENCION_HORAS_SEGUNDOS a agregados por día.
+    Antes borra de riesgo_actual, del historial y de los agregados a los estudiantes en `eliminados`, así
+    no siguen apareciendo en estudiantes_empeorados ni ocupan espacio en los agregados.
+    Con los índices por tiempo, revisar si hay algo que compactar es una lectura corta: se puede llamar
+    en cada ciclo.
+    :return: (puntos compactados, horas compactadas, estudiantes eliminados del historial)
+    """
+    ahora = int(time.time()) if ahora is None else int(ahora)
+    corte_puntos = (ahora - RETENCION_PUNTOS_SEGUNDOS) // SEGUNDOS_HORA * SEGUNDOS_HORA
+    corte_horas = (ahora - RETENCION_HORAS_SEGUNDOS) // SEGUNDOS_DIA * SEGUNDOS_DIA
+
+    conexion.execute("BEGIN")
+    try:
+        conexion.execute("CREATE TEMP TABLE IF NOT EXISTS eliminados (id INTEGER PRIMARY KEY)")
+        conexion.execute("DELETE FROM eliminados")
+        conexion.executemany("INSERT OR IGNORE INTO eliminados VALUES (?)", ((int(i),) for i in eliminados))
+        estudiantes = conexion.execute(
+            "DELETE FROM riesgo_actual WHERE id IN (SELECT id FROM eliminados)"
+        ).rowcount
+        conexion.execute("DELETE FROM riesgo_historial WHERE id IN (SELECT id FROM eliminados)")
+        conexion.execute("DELETE FROM riesgo_agregado WHERE id IN (SELECT id FROM eliminados)")
+
+        conexion.execute(
+            AGREGAR_INTERVALOS.format(origen="""
+                SELECT id, tiempo, 1 AS puntos, Riesgo_Probabilidad AS minimo, Riesgo_Probabilidad AS maximo,
+                       Riesgo_Probabilidad AS promedio, Riesgo_Probabilidad AS ultimo, Nivel_Alerta
+                FROM riesgo_historial WHERE tiempo < :corte"""),
+            {"resolucion": SEGUNDOS_HORA, "corte": corte_puntos},
+        )
+        puntos = conexion.execute("DELETE FROM riesgo_historial WHERE tiempo < ?", (corte_puntos,)).rowcount
+
+        conexion.execute(
+            AGREGAR_INTERVALOS.format(origen="""
+                SELECT id, inicio AS tiempo, puntos, minimo, maximo, promedio, ultimo, Nivel_Alerta
+                FROM riesgo_agregado WHERE resolucion = :hora AND inicio < :corte"""),
+            {"resolucion": SEGUNDOS_DIA, "hora": SEGUNDOS_HORA, "corte": corte_horas},
+        )
+        horas = conexion.execute(
+            "DELETE FROM riesgo_agregado WHERE resolucion = ? AND inicio < ?", (SEGUNDOS_HORA, corte_horas)
+        ).rowcount
+        conexion.execute("COMMIT")
+    except Exception:
+        conexion.execute("ROLLBACK")
+        raise
+    return puntos, horas, estudiantes
+
+
+def tendencia_estudiante(conexion, id_estudiante, desde=0):
+    """
+    Serie de riesgo de un estudiante desde `desde` (epoch): agregados por día, por hora y puntos crudos,
+    en orden cronológico. Cada consulta es un rango sobre la clave primaria (id, tiempo).
+    :return: lista de diccionarios con tiempo, Riesgo_Probabilidad (promedio en los agregados), minimo,
+             maximo, Nivel_Alerta y resolucion ('dia', 'hora' o 'punto')
+    """
+    filas = conexion.execute(
+        """
+        SELECT inicio, promedio, minimo, maximo, Nivel_Alerta,
+               CASE resolucion WHEN :dia THEN 'dia' ELSE 'hora' END
+        FROM riesgo_agregado WHERE resolucion IN (:dia, :hora) AND id = :id AND inicio >= :desde
+        UNION ALL
+        SELECT tiempo, Riesgo_Probabilidad, Riesgo_Probabilidad, Riesgo_Probabilidad, Nivel_Alerta, 'punto'
+        FROM riesgo_historial WHERE id = :id AND tiempo >= :desde
+        ORDER BY 1
+        """,
+        {"id": id_estudiante, "desde": int(desde), "dia": SEGUNDOS_DIA, "hora": SEGUNDOS_HORA},
+    ).fetchall()
+    campos = ("tiempo", "Riesgo_Probabilidad", "minimo", "maximo", "Nivel_Alerta", "resolucion")
+    return [dict(zip(campos, fila)) for fila in filas]
+
+
+def estudiantes_empeorados(conexion, desde, delta_minimo=0.10, limite=100):
+    """
+    Estudiantes cuya probabilidad actual supera en al menos `delta_minimo` a la que tenían en `desde`
+    (último punto registrado hasta esa fecha, crudo o agregado). Los que no tenían puntaje entonces no se incluyen.
+    :return: lista de diccionarios (id, anterior, actual, delta, Nivel_Alerta), de mayor a menor delta
+    """
+    filas = conexion.execute(
+        """
+        SELECT id, anterior, Riesgo_Probabilidad, Riesgo_Probabilidad - anterior AS delta, Nivel_Alerta
+        FROM (
+            SELECT a.id, a.Riesgo_Probabilidad, a.Nivel_Alerta, COALESCE(
+                (SELECT h.Riesgo_Probabilidad FROM riesgo_historial h
+                 WHERE h.id = a.id AND h.tiempo <= :desde ORDER BY h.tiempo DESC LIMIT 1),
+                (SELECT g.ultimo FROM riesgo_agregado g
+                 WHERE g.resolucion = :hora AND g.id = a.id AND g.inicio <= :desde ORDER BY g.inicio DESC LIMIT 1),
+                (SELECT g.ultimo FROM riesgo_agregado g
+                 WHERE g.resolucion = :dia AND g.id = a.id AND g.inicio <= :desde ORDER BY g.inicio DESC LIMIT 1)
+            ) AS anterior
+            FROM riesgo_actual a
+        )
+        WHERE Riesgo_Probabilidad - anterior >= :delta
+        ORDER BY delta DESC
+        LIMIT :limite
+        """,
+        {"desde": int(desde), "delta": delta_minimo, "limite": limite, "hora": SEGUNDOS_HORA, "dia": SEGUNDOS_DIA},
+    ).fetchall()
+    campos = ("id", "anterior", "actual", "delta", "Nivel_Alerta")
+    return [dict(zip(campos, fila)) for fila in filas]
@@ -0,0 +1,204 @@
+"""
+Métricas en formato de texto de Prometheus para el agente y el dashboard.
+
+Registro en memoria de contadores, gauges e histogramas con etiquetas, un context manager para medir
+las etapas del ciclo del agente (duración, filas y bytes), hooks de Flask que miden la latencia por ruta
+y un servidor HTTP mínimo para exponer /metrics desde procesos que no son Flask (el agente).
+
+Cada proceso tiene su propio registro. Con varios workers detrás de un mismo socket, el /metrics de la
+aplicación lo responde el worker que tome la conexión, así que Prometheus debe leer el puerto propio de
+cada worker (COMOVOY_METRICAS_PUERTO, asignado por el supervisor; ver servir_metricas_worker y app.py).
+"""
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+try:
+    import resource
+except ImportError:  # Windows: sin getrusage no se reporta el pico de memoria
+    resource = None
+
+CONTENT_TYPE_METRICAS = "text/plain; version=0.0.4; charset=utf-8"
+# Límites superiores (segundos) de los buckets de los histogramas de duración
+BUCKETS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# nombre -> {'tipo', 'ayuda', 'series': {etiquetas ordenadas (tuple) -> valor o histograma}}
+_metricas = {}
+_lock = threading.Lock()
+
+
+def _serie(nombre, tipo, ayuda, etiquetas):
+    metrica = _metricas.setdefault(nombre, {"tipo": tipo, "ayuda": ayuda, "series": {}})
+    return metrica["series"], tuple(sorted((etiquetas or {}).items()))
+
+
+def incrementar(nombre, valor=1, etiquetas=None, ayuda=""):
+    with _lock:
+        series, clave = _serie(nombre, "counter", ayuda, etiquetas)
+        series[clave] = series.get(clave, 0) + valor
+
+
+def fijar(nombre, valor, etiquetas=None, ayuda=""):
+    with _lock:
+        series, clave = _serie(nombre, "gauge", ayuda, etiquetas)
+        series[clave] = valor
+
+
+def observar(nombre, valor, etiquetas=None, ayuda=""):
+    """
+    Registra una observación en un histograma (BUCKETS_SEGUNDOS). Los conteos por bucket se guardan
+    sin acumular y se acumulan al exportar.
+    """
+    with _lock:
+        series, clave = _serie(nombre, "histogram", ayuda, etiquetas)
+        histograma = series.get(clave)
+        if histograma is None:
+            histograma = series[clave] = {"buckets": [0] * len(BUCKETS_SEGUNDOS), "suma": 0.0, "total": 0}
+        for i, limite in enumerate(BUCKETS_SEGUNDOS):
+            if valor <= limite:
+                histograma["buckets"][i] += 1
+                break
+        histograma["suma"] += valor
+        histograma["total"] += 1
+
+
+def actualizar_memoria():
+    """
+    Pico de memoria residente del proceso (ru_maxrss viene en KB en Linux y en bytes en macOS).
+    """
+    if resource is None:
+        return
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    fijar("process_peak_rss_bytes", pico if sys.platform == "darwin" else pico * 1024,
+          ayuda="Pico de memoria residente del proceso")
+
+
+def _etiquetas(clave, extra=()):
+    pares = list(clave) + list(extra)
+    if not pares:
+        return ""
+    valores = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pares)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pares, valores)) + "}"
+
+
+def exportar_texto():
+    """
+    :return: todas las métricas en el formato de exposición de texto de Prometheus
+    """
+    actualizar_memoria()
+    lineas = []
+    with _lock:
+        for nombre, metrica in sorted(_metricas.items()):
+            if metrica["ayuda"]:
+                lineas.append(f"# HELP {nombre} {metrica['ayuda']}")
+            lineas.append(f"# TYPE {nombre} {metrica['tipo']}")
+            for clave, valor in sorted(metrica["series"].items()):
+                if metrica["tipo"] != "histogram":
+                    lineas.append(f"{nombre}{_etiquetas(clave)} {valor}")
+                    continue
+                acumulado = 0
+                for limite, conteo in zip(BUCKETS_SEGUNDOS, valor["buckets"]):
+                    acumulado += conteo
+                    lineas.append(f"{nombre}_bucket{_etiquetas(clave, [('le', f'{limite:g}')])} {acumulado}")
+                lineas.append(f"{nombre}_bucket{_etiquetas(clave, [('le', '+Inf')])} {valor['total']}")
+                lineas.append(f"{nombre}_sum{_etiquetas(clave)} {valor['suma']}")
+                lineas.append(f"{nombre}_count{_etiquetas(clave)} {valor['total']}")
+    return "\n".join(lineas) + "\n"
+
+
+@contextmanager
+def medir_etapa(etapa, prefijo="comovoy_agente"):
+    """
+    Mide una etapa del ciclo: registra su duración y, si el bloque los completa en el diccionario
+    entregado, las filas procesadas y los bytes leídos o escritos.
+
+        with medir_etapa("descarga") as etapa:
+            ...
+            etapa["bytes"] = len(response.content)
+    """
+    datos = {"filas": None, "bytes": None}
+    inicio = time.perf_counter()
+    try:
+        yield datos
+    finally:
+        etiquetas = {"etapa": etapa}
+        observar(f"{prefijo}_etapa_duracion_segundos", time.perf_counter() - inicio, etiquetas,
+                 "Duración de cada etapa del ciclo")
+        if datos["filas"] is not None:
+            fijar(f"{prefijo}_etapa_filas", datos["filas"], etiquetas, "Filas procesadas en la última ejecución de la etapa")
+            incrementar(f"{prefijo}_etapa_filas_total", datos["filas"], etiquetas, "Filas procesadas por la etapa")
+        if datos["bytes"] is not None:
+            fijar(f"{prefijo}_etapa_bytes", datos["bytes"], etiquetas, "Bytes de la última ejecución de la etapa")
+            incrementar(f"{prefijo}_etapa_bytes_total", datos["bytes"], etiquetas, "Bytes leídos o escritos por la etapa")
+
+
+def instrumentar_flask(app, prefijo):
+    """
+    Mide la latencia de cada petición por ruta (la regla, no la URL, para no crear una serie por id),
+    método y código de estado, y agrega la ruta GET /metrics a la aplicación. La medición termina al
+    cerrar la respuesta, así las respuestas en streaming cuentan completas.
+    """
+    from flask import Response, g, request
+
+    @app.before_request
+    def iniciar_medicion():
+        g.inicio_metricas = time.perf_counter()
+
+    @app.after_request
+    def registrar_medicion(response):
+        inicio = g.pop("inicio_metricas", None)
+        if inicio is not None:
+            etiquetas = {
+                "ruta": request.url_rule.rule if request.url_rule else "sin_ruta",
+                "metodo": request.method,
+                "estado": str(response.status_code),
+            }
+            response.call_on_close(lambda: observar(
+                f"{prefijo}_http_duracion_segundos", time.perf_counter() - inicio, etiquetas,
+                "Latencia de las peticiones HTTP por ruta"
+            ))
+        return response
+
+    @app.route("/metrics")
+    def metrics():
+        return Response(exportar_texto(), content_type=CONTENT_TYPE_METRICAS)
+
+
+def servir_metricas(host, puerto):
+    """
+    Expone GET /metrics en un hilo aparte, para procesos sin servidor web propio.
+    :return: el servidor (ya atendiendo)
+    """
+    class ManejadorMetricas(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            cuerpo = exportar_texto().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE_METRICAS)
+            self.send_header("Content-Length", str(len(cuerpo)))
+            self.end_headers()
+            self.wfile.write(cuerpo)
+
+        def log_message(self, *args):
+            pass
+
+    servidor = ThreadingHTTPServer((host, puerto), ManejadorMetricas)
+    servidor.daemon_threads = True
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor
+
+
+def servir_metricas_worker(host="127.0.0.1"):
+    """
+    Expone las métricas de este worker en el puerto COMOVOY_METRICAS_PUERTO, si el supervisor lo asignó.
+    :return: el servidor, o None si no hay puerto asignado (un solo proceso: basta el /metrics de la aplicación)
+    """
+    puerto = os.environ.get("COMOVOY_METRICAS_PUERTO")
+    if not puerto:
+        return None
+    return servir_metricas(host, int(puerto))
@@ -0,0 +1,353 @@
+"""
+Ruta de inferencia compilada para el pipeline de riesgo (ColumnTransformer + GradientBoostingClassifier).
+
+exportar desde el Pipeline entrenado una representación plana en arreglos NumPy (medianas del imputer,
+parámetros del scaler, mapas categoría -> columna del OneHotEncoder y los árboles empaquetados) y
+evaluarla de forma vectorizada, sin la validación de pandas ni el recorrido por estimador de sklearn.
+
+Uso: python modelo_compilado.py  (exporta modelo/comovoy.joblib y verifica paridad con el pipeline)
+"""
+import os
+import struct
+import sys
+import time
+import zipfile
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+MODELO_COMPILADO_PATH = 'modelo/comovoy_compilado.npz'
+TOLERANCIA_PARIDAD = 1e-9
+# Filas por bloque en la evaluación de los árboles: mantiene los arreglos (filas x árboles) dentro del cache
+FILAS_POR_BLOQUE = 256
+
+
+class ModeloCompilado:
+    """
+    Modelo exportado. Expone feature_names_in_ y predict_proba igual que el Pipeline, así puede
+    reemplazarlo en calcular_indice_riesgo y en el servicio de predicción.
+    """
+
+    def __init__(self, arreglos):
+        self.arreglos = arreglos
+        self.feature_names_in_ = arreglos['feature_names_in'].astype(object)
+        self.columnas_numericas = arreglos['num_columnas'].tolist()
+        self.columnas_categoricas = arreglos['cat_columnas'].tolist()
+        self.version_modelo = str(arreglos['version_modelo'])
+        # Categoría -> índice de columna de salida; las desconocidas quedan fuera (todo ceros, como handle_unknown='ignore')
+        self.mapas_categoricos = [
+            dict(zip(arreglos[f'cat_{j}_valores'].tolist(), arreglos[f'cat_{j}_indices'].tolist()))
+            for j in range(len(self.columnas_categoricas))
+        ]
+        self.indices_nan = [int(arreglos[f'cat_{j}_indice_nan']) for j in range(len(self.columnas_categoricas))]
+
+        # Las estructuras de evaluación vienen precalculadas en los archivos nuevos: si el archivo está mapeado
+        # en memoria se usan sin copiar; los exportados antes de agregarlas se completan aquí
+        if 'eval_hijos' not in arreglos:
+            arreglos = {**arreglos, **_estructuras_evaluacion(arreglos)}
+        self._umbral_32 = arreglos['eval_umbral_32']
+        self._hijos = np.asarray(arreglos['eval_hijos'], dtype=np.intp)
+        self._feature = np.asarray(arreglos['eval_feature'], dtype=np.intp)
+        self._raices = np.asarray(arreglos['eval_raices'], dtype=np.intp)
+
+    @classmethod
+    def desde_pipeline(cls, pipeline, version_modelo=''):
+        """
+        Extrae del Pipeline entrenado todos los parámetros necesarios para la inferencia.
+        """
+        preprocesador = pipeline.named_steps['preprocesador']
+        clasificador = pipeline.named_steps['clasificador']
+        if clasificador.loss != 'log_loss' or len(clasificador.classes_) != 2:
+            raise ValueError('Solo se soporta GradientBoostingClassifier binario con log_loss')
+
+        transformadores = {nombre: (t, cols) for nombre, t, cols in preprocesador.transformers_}
+        numerico, columnas_num = transformadores['num']
+        ohe, columnas_cat = transformadores['cat']
+        imputer = numerico.named_steps['imputer']
+        scaler = numerico.named_steps['scaler']
+
+        arreglos = {
+            'version_modelo': np.array(version_modelo),
+            'feature_names_in': np.array(list(pipeline.feature_names_in_), dtype=str),
+            'num_columnas': np.array(columnas_num, dtype=str),
+            'num_mediana': imputer.statistics_.astype(np.float64),
+            'num_media': scaler.mean_.astype(np.float64),
+            'num_escala': scaler.scale_.astype(np.float64),
+            'cat_columnas': np.array(columnas_cat, dtype=str),
+        }
+
+        # Cada columna categórica ocupa un bloque contiguo de salida: primero las categorías frecuentes
+        # en el orden de categories_ y, si existe, una última columna para las infrecuentes
+        inicio = len(columnas_num)
+        infrecuentes = getattr(ohe, 'infrequent_categories_', [None] * len(columnas_cat))
+        for j, (categorias, raras) in enumerate(zip(ohe.categories_, infrecuentes)):
+            raras = set() if raras is None else {_clave(c) for c in raras}
+            valores, indices, indice_nan = [], [], -1
+            posicion = 0
+            frecuentes = [c for c in categorias if _clave(c) not in raras]
+            indice_infrecuente = inicio + len(frecuentes) if raras else -1
+            for categoria in categorias:
+                if _clave(categoria) in raras:
+                    indice = indice_infrecuente
+                else:
+                    indice = inicio + posicion
+                    posicion += 1
+                if _es_nulo(categoria):
+                    indice_nan = indice
+                else:
+                    valores.append(str(categoria))
+                    indices.append(indice)
+            arreglos[f'cat_{j}_valores'] = np.array(valores, dtype=str)
+            arreglos[f'cat_{j}_indices'] = np.array(indices, dtype=np.int32)
+            arreglos[f'cat_{j}_indice_nan'] = np.array(indice_nan, dtype=np.int32)
+            inicio += len(frecuentes) + (1 if raras else 0)
+        arreglos['n_salidas'] = np.array(inicio)
+
+        # Árboles empaquetados: todos los nodos concatenados con índices absolutos. Las hojas apuntan a sí
+        # mismas con umbral infinito, así todas las filas pueden avanzar profundidad_maxima niveles sin ramas
+        features, umbrales, izquierdos, derechos, valores, raices = [], [], [], [], [], []
+        desplazamiento = 0
+        for estimador in clasificador.estimators_[:, 0]:
+            arbol = estimador.tree_
+            hoja = arbol.children_left == -1
+            propios = np.arange(arbol.node_count) + desplazamiento
+            raices.append(desplazamiento)
+            features.append(np.where(hoja, 0, arbol.feature))
+            umbrales.append(np.where(hoja, np.inf, arbol.threshold))
+            izquierdos.append(np.where(hoja, propios, arbol.children_left + desplazamiento))
+            derechos.append(np.where(hoja, propios, arbol.children_right + desplazamiento))
+            valores.append(arbol.value[:, 0, 0])
+            desplazamiento += arbol.node_count
+
+        arreglos.update({
+            'arbol_feature': np.concatenate(features).astype(np.int32),
+            'arbol_umbral': np.concatenate(umbrales).astype(np.float64),
+            'arbol_izquierdo': np.concatenate(izquierdos).astype(np.int32),
+            'arbol_derecho': np.concatenate(derechos).astype(np.int32),
+            'arbol_valor': np.concatenate(valores).astype(np.float64),
+            'arbol_raices': np.array(raices, dtype=np.int32),
+            'profundidad_maxima': np.array(max(e.tree_.max_depth for e in clasificador.estimators_[:, 0])),
+            'learning_rate': np.array(float(clasificador.learning_rate)),
+            'raw_inicial': np.array(_raw_inicial(clasificador)),
+        })
+        arreglos.update(_estructuras_evaluacion(arreglos))
+        return cls(arreglos)
+
+    @classmethod
+    def cargar(cls, path=MODELO_COMPILADO_PATH, mapear=True):
+        """
+        Con mapear=True los arreglos se leen como vistas de solo lectura mapeadas sobre el archivo: varios
+        procesos que cargan el mismo modelo comparten las páginas del cache del sistema operativo.
+        """
+        if mapear:
+            return cls(_mapear_npz(path))
+        with np.load(path, allow_pickle=False) as archivo:
+            return cls({nombre: archivo[nombre] for nombre in archivo.files})
+
+    def guardar(self, path=MODELO_COMPILADO_PATH):
+        tmp_path = path + '.tmp.npz'
+        np.savez(tmp_path, **self.arreglos)
+        os.replace(tmp_path, path)
+
+    def transformar(self, df):
+        """
+        Equivalente a preprocesador.transform: imputación por mediana, escalado y one-hot.
+        """
+        a = self.arreglos
+        n = len(df)
+        matriz = np.zeros((n, int(a['n_salidas'])), dtype=np.float64)
+
+        numericas = np.column_stack([df[c].to_numpy(dtype=np.float64, na_value=np.nan) for c in self.columnas_numericas])
+        numericas = np.where(np.isnan(numericas), a['num_mediana'], numericas)
+        matriz[:, :len(self.columnas_numericas)] = (numericas - a['num_media']) / a['num_escala']
+
+        for columna, mapa, indice_nan in zip(self.columnas_categoricas, self.mapas_categoricos, self.indices_nan):
+            indices = np.fromiter(
+                (indice_nan if v is None or v != v else mapa.get(v, -1) for v in df[columna].tolist()),
+                dtype=np.intp, count=n
+            )
+            validos = np.flatnonzero(indices >= 0)
+            matriz[validos, indices[validos]] = 1.0
+        return matriz
+
+    def raw_predict(self, matriz):
+        """
+        Suma de todos los árboles (log-odds de la clase 1), evaluada por bloques de FILAS_POR_BLOQUE filas.
+        """
+        if len(matriz) <= FILAS_POR_BLOQUE:
+            return self._raw_predict_bloque(matriz)
+        return np.concatenate([
+            self._raw_predict_bloque(matriz[inicio:inicio + FILAS_POR_BLOQUE])
+            for inicio in range(0, len(matriz), FILAS_POR_BLOQUE)
+        ])
+
+    def _raw_predict_bloque(self, matriz):
+        """
+        Evaluación vectorizada: cada fila avanza por todos los árboles a la vez, un nivel por iteración.
+        Las hojas se apuntan a sí mismas, así no hay ramas por fila.
+        """
+        a = self.arreglos
+        n = len(matriz)
+        # Matriz por columnas y aplanada: el valor de la feature f en la fila i está en f * n + i
+        columnas = np.ascontiguousarray(matriz.T, dtype=np.float32).ravel()
+        filas = np.arange(n, dtype=np.intp)[:, None]
+        nodos = np.broadcast_to(self._raices, (n, len(self._raices)))
+
+        for _ in range(int(a['profundidad_maxima'])):
+            valores = columnas[self._feature[nodos] * n + filas]
+            nodos = self._hijos[2 * nodos + (valores > self._umbral_32[nodos])]
+
+        return float(a['raw_inicial']) + float(a['learning_rate']) * a['arbol_valor'][nodos].sum(axis=1)
+
+    def predict_proba(self, df):
+        """
+        Probabilidades [clase 0, clase 1] como en Pipeline.predict_proba.
+        """
+        proba_1 = 1.0 / (1.0 + np.exp(-self.raw_predict(self.transformar(df))))
+        return np.column_stack([1.0 - proba_1, proba_1])
+
+
+def _estructuras_evaluacion(arreglos):
+    """
+    Arreglos derivados que usa raw_predict. sklearn compara x (float32) <= umbral (float64); con el mayor
+    float32 <= umbral la comparación es idéntica y se puede hacer completa en float32.
+    """
+    umbral = arreglos['arbol_umbral']
+    umbral_32 = umbral.astype(np.float32)
+    return {
+        'eval_umbral_32': np.where(umbral_32 > umbral, np.nextafter(umbral_32, np.float32(-np.inf)), umbral_32),
+        'eval_hijos': np.column_stack([arreglos['arbol_izquierdo'], arreglos['arbol_derecho']]).ravel().astype(np.intp),
+        'eval_feature': arreglos['arbol_feature'].astype(np.intp),
+        'eval_raices': arreglos['arbol_raices'].astype(np.intp),
+    }
+
+
+def _mapear_npz(path):
+    """
+    Abre cada arreglo de un .npz sin comprimir (np.savez) como np.memmap de solo lectura sobre el propio
+    archivo: np.load ignora mmap_mode en los .npz. Los escalares y arreglos vacíos se leen normalmente.
+    """
+    arreglos = {}
+    with zipfile.ZipFile(path) as archivo, open(path, 'rb') as f:
+        for miembro in archivo.infolist():
+            nombre = miembro.filename[:-len('.npy')]
+            if miembro.compress_type != zipfile.ZIP_STORED:
+                arreglos[nombre] = np.lib.format.read_array(archivo.open(miembro), allow_pickle=False)
+                continue
+            # Cabecera local del zip (30 bytes + nombre + campo extra) y luego la cabecera .npy
+            f.seek(miembro.header_offset)
+            largo_nombre, largo_extra = struct.unpack('<HH', f.read(30)[26:30])
+            f.seek(miembro.header_offset + 30 + largo_nombre + largo_extra)
+            version = np.lib.format.read_magic(f)
+            leer_cabecera = np.lib.format.read_array_header_1_0 if version == (1, 0) else np.lib.format.read_array_header_2_0
+            forma, fortran, dtype = leer_cabecera(f)
+            if dtype.hasobject:
+                raise ValueError(f"'{nombre}' contiene objetos y no se puede mapear")
+            if not forma or 0 in forma:
+                arreglos[nombre] = np.lib.format.read_array(archivo.open(miembro), allow_pickle=False)
+                continue
+            arreglos[nombre] = np.memmap(path, dtype=dtype, mode='r', offset=f.tell(), shape=forma,
+                                         order='F' if fortran else 'C')
+    return arreglos
+
+
+def _raw_inicial(clasificador):
+    """
+    Predicción inicial (log-odds) del GradientBoosting: el prior de la clase 1 o cero si init='zero'.
+    """
+    if clasificador.init_ == 'zero':
+        return 0.0
+    p = float(clasificador.init_.class_prior_[1])
+    return float(np.log(p / (1 - p)))
+
+
+def _es_nulo(valor):
+    return valor is None or (isinstance(valor, float) and np.isnan(valor))
+
+
+def _clave(valor):
+    return None if _es_nulo(valor) else valor
+
+
+def verificar_paridad(pipeline, compilado, df, tolerancia=TOLERANCIA_PARIDAD):
+    """
+    Compara predict_proba del Pipeline y del modelo compilado sobre df.
+    :return: (diferencia máxima absoluta, True si está dentro de la tolerancia)
+    """
+    columnas = list(pipeline.feature_names_in_)
+    esperado = pipeline.predict_proba(df[columnas])
+    obtenido = compilado.predict_proba(df[columnas])
+    diferencia = float(np.max(np.abs(esperado - obtenido))) if len(df) else 0.0
+    return diferencia, diferencia <= tolerancia
+
+
+def exportar(path_modelo, path_compilado=MODELO_COMPILADO_PATH, df_paridad=None):
+    """
+    Exporta el pipeline guardado en path_modelo y, si se entrega df_paridad, verifica la paridad antes de guardar.
+    :return: ModeloCompilado o None si la paridad falla
+    """
+    import joblib
+    from agente_prediccion import calcular_version_modelo
+
+    pipeline = joblib.load(path_modelo)
+    compilado = ModeloCompilado.desde_pipeline(pipeline, calcular_version_modelo(path_modelo))
+
+    if df_paridad is not None:
+        diferencia, ok = verificar_paridad(pipeline, compilado, df_paridad)
+        print(f"[{datetime.now().strftime('%H:%M:%S')}] Paridad con el pipeline: diferencia máxima {diferencia:.2e}")
+        if not ok:
+            print(f"[{datetime.now().strftime('%H:%M:%S')}] ERROR: el modelo compilado no coincide con el pipeline, no se guarda")
+            return None
+
+    compilado.guardar(path_compilado)
+    print(f"[{datetime.now().strftime('%H:%M:%S')}] Modelo compilado guardado en '{path_compilado}'")
+    return compilado
+
+
+def datos_de_paridad(columnas, n=2000, semilla=0):
+    """
+    Frame sintético para verificar paridad: estudiantes del snapshot del dashboard, remuestreados con
+    ruido en las columnas numéricas, nulos y categorías desconocidas.
+    """
+    import json
+    from agente_prediccion import REPORTE_DASHBOARD_PATH, completar_features
+
+    with open(REPORTE_DASHBOARD_PATH, encoding='utf-8') as f:
+        base = pd.DataFrame(json.load(f)['estudiantes'])
+    base, _ = completar_features(base, columnas)
+    rng = np.random.default_rng(semilla)
+    df = base.sample(n, replace=True, random_state=semilla).reset_index(drop=True)[columnas]
+
+    for columna in columnas:
+        if pd.api.types.is_numeric_dtype(df[columna]):
+            df[columna] = df[columna].astype(float) + rng.normal(0, 5, n)
+            df.loc[rng.random(n) < 0.05, columna] = np.nan
+        else:
+            df.loc[rng.random(n) < 0.05, columna] = None
+    return df
+
+
+if __name__ == '__main__':
+    from agente_prediccion import MODELO_PATH
+    import joblib
+
+    pipeline = joblib.load(MODELO_PATH)
+    df_paridad = datos_de_paridad(list(pipeline.feature_names_in_))
+    compilado = exportar(MODELO_PATH, MODELO_COMPILADO_PATH, df_paridad)
+    if compilado is None:
+        sys.exit(1)
+
+    for n in (1, 10, 100, 2000):
+        muestra = df_paridad.head(n)
+        repeticiones = max(1, 2000 // n)
+        inicio = time.perf_counter()
+        for _ in range(repeticiones):
+            pipeline.predict_proba(muestra)
+        t_pipeline = (time.perf_counter() - inicio) / repeticiones
+        inicio = time.perf_counter()
+        for _ in range(repeticiones):
+            compilado.predict_proba(muestra)
+        t_compilado = (time.perf_counter() - inicio) / repeticiones
+        print(f"Lote {n:5d}: pipeline {t_pipeline * 1000:8.3f} ms  compilado {t_compilado * 1000:8.3f} ms  "
+              f"aceleración {t_pipeline / t_compilado:6.1f}x")
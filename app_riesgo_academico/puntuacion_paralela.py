@@ -0,0 +1,194 @@
+"""
+Puntuación multinúcleo para cohortes grandes.
+
+La predicción de GradientBoosting usa un solo núcleo. ModeloParalelo divide las filas en fragmentos y
+los puntúa en un pool de procesos: cada worker carga el modelo una sola vez al iniciar y recibe los datos
+por memoria compartida (columnas numéricas como una matriz float64 y categóricas como códigos int32),
+de modo que por cada fragmento solo viaja el rango de filas. Las probabilidades se escriben en otro
+bloque compartido. Expone feature_names_in_ y predict_proba igual que el Pipeline, así puede
+reemplazarlo en calcular_indice_riesgo.
+
+Uso: python puntuacion_paralela.py --filas 200000 --procesos 1 2 4 8  (reporte de escalamiento)
+"""
+import argparse
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+# Por debajo de este tamaño el costo de repartir supera al de predecir en el proceso actual
+FILAS_MINIMAS_PARALELO = 10000
+# Fragmentos por proceso: más de uno reparte mejor la carga si algún worker se atrasa
+FRAGMENTOS_POR_PROCESO = 2
+
+# Estado de cada worker: el modelo se carga una vez en el inicializador del pool
+_modelo_worker = None
+
+
+def cargar_modelo_worker(path_modelo):
+    """
+    Carga el Pipeline (.joblib) o el modelo compilado (.npz) desde disco. Los arreglos grandes se mapean en
+    memoria, así los workers del pool comparten las páginas del archivo en lugar de tener una copia cada uno.
+    """
+    if path_modelo.endswith('.npz'):
+        from modelo_compilado import ModeloCompilado
+        return ModeloCompilado.cargar(path_modelo)
+    import joblib
+    return joblib.load(path_modelo, mmap_mode='r')
+
+
+def _inicializar_worker(path_modelo):
+    global _modelo_worker
+    _modelo_worker = cargar_modelo_worker(path_modelo)
+
+
+def _puntuar_fragmento(descriptor, inicio, fin):
+    """
+    Reconstruye en el worker las filas [inicio, fin) desde la memoria compartida (sin copiar las
+    numéricas) y escribe sus probabilidades en el bloque de salida.
+    """
+    bloques = {nombre: shared_memory.SharedMemory(name=nombre) for nombre in descriptor['bloques']}
+    try:
+        numericas = np.ndarray(descriptor['forma_numericas'], dtype=np.float64, buffer=bloques[descriptor['numericas']].buf)
+        codigos = np.ndarray(descriptor['forma_codigos'], dtype=np.int32, buffer=bloques[descriptor['codigos']].buf)
+        salida = np.ndarray(descriptor['forma_salida'], dtype=np.float64, buffer=bloques[descriptor['salida']].buf)
+
+        columnas = {col: numericas[inicio:fin, j] for j, col in enumerate(descriptor['columnas_numericas'])}
+        columnas.update({
+            col: pd.Categorical.from_codes(codigos[inicio:fin, j], categorias)
+            for j, (col, categorias) in enumerate(zip(descriptor['columnas_categoricas'], descriptor['categorias']))
+        })
+        df = pd.DataFrame(columnas, copy=False)[descriptor['orden']]
+        salida[inicio:fin] = _modelo_worker.predict_proba(df)
+        # Se sueltan las vistas antes de cerrar los bloques
+        del numericas, codigos, salida, columnas, df
+    finally:
+        for bloque in bloques.values():
+            bloque.close()
+    return fin - inicio
+
+
+def _crear_bloque(arreglo, bloques):
+    bloque = shared_memory.SharedMemory(create=True, size=max(1, arreglo.nbytes))
+    bloques.append(bloque)
+    np.ndarray(arreglo.shape, dtype=arreglo.dtype, buffer=bloque.buf)[...] = arreglo
+    return bloque.name
+
+
+class ModeloParalelo:
+    """
+    Envoltorio de un modelo guardado que reparte predict_proba entre `procesos` workers.
+    El pool se crea una vez y se reutiliza en todas las llamadas; cerrar() lo termina.
+    """
+
+    def __init__(self, path_modelo, procesos=None, modelo=None):
+        self.path_modelo = path_modelo
+        self.procesos = procesos or os.cpu_count() or 1
+        # Copia local para feature_names_in_ y para las entradas pequeñas
+        self.modelo = modelo if modelo is not None else cargar_modelo_worker(path_modelo)
+        self.feature_names_in_ = self.modelo.feature_names_in_
+        # spawn: el agente tiene hilos activos (métricas, descarga por páginas) y fork no es seguro con hilos
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.procesos,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_inicializar_worker,
+            initargs=(path_modelo,),
+        )
+
+    def predict_proba(self, X):
+        n = len(X)
+        if self.procesos == 1 or n < FILAS_MINIMAS_PARALELO:
+            return self.modelo.predict_proba(X)
+
+        categoricas = [col for col in X.columns if not pd.api.types.is_numeric_dtype(X[col])]
+        numericas = [col for col in X.columns if col not in categoricas]
+        cat_codigos = [pd.Categorical(X[col]) for col in categoricas]
+
+        bloques = []
+        try:
+            descriptor = {
+                'orden': list(X.columns),
+                'columnas_numericas': numericas,
+                'columnas_categoricas': categoricas,
+                'categorias': [c.categories.to_numpy() for c in cat_codigos],
+                'forma_numericas': (n, len(numericas)),
+                'forma_codigos': (n, len(categoricas)),
+                'forma_salida': (n, len(self.modelo.classes_) if hasattr(self.modelo, 'classes_') else 2),
+            }
+            descriptor['numericas'] = _crear_bloque(
+                X[numericas].to_numpy(dtype=np.float64, na_value=np.nan) if numericas else np.empty((n, 0)), bloques
+            )
+            descriptor['codigos'] = _crear_bloque(
+                np.column_stack([c.codes for c in cat_codigos]).astype(np.int32) if categoricas
+                else np.empty((n, 0), dtype=np.int32), bloques
+            )
+            descriptor['salida'] = _crear_bloque(np.zeros(descriptor['forma_salida']), bloques)
+            descriptor['bloques'] = [bloque.name for bloque in bloques]
+
+            limites = np.linspace(0, n, self.procesos * FRAGMENTOS_POR_PROCESO + 1, dtype=int)
+            futuros = [
+                self._pool.submit(_puntuar_fragmento, descriptor, int(inicio), int(fin))
+                for inicio, fin in zip(limites[:-1], limites[1:]) if fin > inicio
+            ]
+            for futuro in futuros:
+                futuro.result()
+
+            salida = bloques[-1]
+            return np.ndarray(descriptor['forma_salida'], dtype=np.float64, buffer=salida.buf).copy()
+        finally:
+            for bloque in bloques:
+                bloque.close()
+                bloque.unlink()
+
+    def cerrar(self):
+        self._pool.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.cerrar()
+
+
+def reporte_escalamiento(path_modelo, filas, lista_procesos, semilla=0):
+    """
+    Tiempo de predict_proba sobre `filas` filas con cada cantidad de procesos, frente a la predicción
+    serial del Pipeline: aceleración, eficiencia (aceleración / procesos) y diferencia máxima.
+    """
+    from modelo_compilado import datos_de_paridad
+
+    modelo = cargar_modelo_worker(path_modelo)
+    base = datos_de_paridad(list(modelo.feature_names_in_), min(filas, 20000), semilla)
+    X = base.sample(filas, replace=True, random_state=semilla).reset_index(drop=True)
+
+    inicio = time.perf_counter()
+    referencia = modelo.predict_proba(X)
+    t_serial = time.perf_counter() - inicio
+    print(f"Filas: {filas}  CPUs: {os.cpu_count()}  serial: {t_serial:.2f}s")
+    print(f"{'procesos':>9}{'segundos':>10}{'aceleración':>13}{'eficiencia':>12}{'dif. máx':>11}")
+
+    for procesos in lista_procesos:
+        with ModeloParalelo(path_modelo, procesos, modelo) as paralelo:
+            # Primera llamada para levantar los workers y cargar el modelo (no se mide)
+            paralelo.predict_proba(X.head(FILAS_MINIMAS_PARALELO))
+            inicio = time.perf_counter()
+            probabilidades = paralelo.predict_proba(X)
+            t = time.perf_counter() - inicio
+        diferencia = float(np.abs(probabilidades - referencia).max())
+        print(f"{procesos:>9}{t:>10.2f}{t_serial / t:>12.2f}x{t_serial / t / procesos:>12.0%}{diferencia:>11.1e}")
+
+
+if __name__ == '__main__':
+    from agente_prediccion import MODELO_PATH
+
+    parser = argparse.ArgumentParser(description='Escalamiento de la puntuación en paralelo.')
+    parser.add_argument('--modelo', default=MODELO_PATH)
+    parser.add_argument('--filas', type=int, default=200000)
+    parser.add_argument('--procesos', type=int, nargs='+', default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    reporte_escalamiento(args.modelo, args.filas, args.procesos)
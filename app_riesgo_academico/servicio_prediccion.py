@@ -0,0 +1,194 @@
+import os
+import threading
+import queue
+import time
+from collections import deque
+from concurrent.futures import Future
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from flask import Flask, jsonify, request
+
+from agente_prediccion import (MODELO_PATH, MODELO_COMPILADO_PATH, cargar_modelo, cargar_modelo_compilado,
+                               completar_features, clasificar_riesgo, columnas_numericas)
+
+app = Flask(__name__)
+
+# Micro-lotes: las peticiones que llegan dentro de VENTANA_LOTE_MS se agrupan en un solo predict_proba
+VENTANA_LOTE_MS = 5
+MAX_FILAS_LOTE = 2048
+MAX_REGISTROS_PETICION = 10000
+UMBRAL_RIESGO = 0.75
+TIMEOUT_PREDICCION = 30
+
+# Latencias de las últimas peticiones (segundos) y tamaños de los últimos lotes, para /predict/estadisticas
+MUESTRAS_ESTADISTICAS = 10000
+
+modelo = None
+_cola_predicciones = queue.Queue()
+_latencias = deque(maxlen=MUESTRAS_ESTADISTICAS)
+_tamanos_lote = deque(maxlen=MUESTRAS_ESTADISTICAS)
+# Protege ambos deques: /predict/estadisticas los copia mientras los hilos de las peticiones agregan muestras
+_estadisticas_lock = threading.Lock()
+
+
+def normalizar_registros(registros):
+    """
+    Arma el DataFrame de features de una petición por sí sola, antes de juntarla con otras en el micro-lote,
+    para que el resultado de un registro no dependa de con qué peticiones comparte lote. Cada registro se
+    completa por separado: una feature numérica ausente queda como NaN (la imputa el modelo) y una categórica
+    como "Desconocido", igual que en completar_features.
+    :raise ValueError: si una feature numérica trae un valor que no es número
+    """
+    numericas = columnas_numericas(modelo)
+    faltantes = {c: np.nan if c in numericas else "Desconocido" for c in modelo.feature_names_in_}
+    df = pd.DataFrame([{c: r.get(c, faltante) for c, faltante in faltantes.items()} for r in registros])
+    for columna in df.columns:
+        if columna in numericas:
+            valores = df[columna]
+            if any(isinstance(v, (str, bool)) for v in valores.tolist()):
+                raise ValueError(f'la feature "{columna}" debe ser numérica')
+            df[columna] = pd.to_numeric(valores).astype(float)
+        else:
+            df[columna] = df[columna].astype(object)
+    return df
+
+
+def puntuar_lote(df):
+    """
+    Aplica el modelo y las mismas reglas de calcular_indice_riesgo a un DataFrame de features.
+    :return: lista de diccionarios con Riesgo_Probabilidad, Indice_Riesgo y Nivel_Alerta
+    """
+    df_features, _ = completar_features(df, list(modelo.feature_names_in_))
+    probabilidades = modelo.predict_proba(df_features[list(modelo.feature_names_in_)])[:, 0]
+    indice, nivel = clasificar_riesgo(probabilidades, UMBRAL_RIESGO)
+    return [
+        {'Riesgo_Probabilidad': float(p), 'Indice_Riesgo': int(i), 'Nivel_Alerta': str(n)}
+        for p, i, n in zip(probabilidades, indice, nivel)
+    ]
+
+
+def procesar_lotes():
+    """
+    Hilo consumidor: toma la primera petición de la cola, espera hasta VENTANA_LOTE_MS por más
+    (o hasta MAX_FILAS_LOTE filas), puntúa todo en una sola llamada y reparte los resultados.
+    """
+    while True:
+        pendientes = [_cola_predicciones.get()]
+        filas = len(pendientes[0][0])
+        limite = time.perf_counter() + VENTANA_LOTE_MS / 1000
+
+        while filas < MAX_FILAS_LOTE:
+            restante = limite - time.perf_counter()
+            if restante <= 0:
+                break
+            try:
+                pendiente = _cola_predicciones.get(timeout=restante)
+            except queue.Empty:
+                break
+            pendientes.append(pendiente)
+            filas += len(pendiente[0])
+
+        try:
+            resultados = puntuar_lote(pd.concat([df for df, _ in pendientes], ignore_index=True))
+        except Exception:
+            # Un registro inválido no debe hacer fallar a las demás peticiones del lote
+            for df, futuro in pendientes:
+                try:
+                    futuro.set_result(puntuar_lote(df))
+                except Exception as e:
+                    futuro.set_exception(e)
+            continue
+
+        with _estadisticas_lock:
+            _tamanos_lote.append(filas)
+        inicio = 0
+        for df, futuro in pendientes:
+            futuro.set_result(resultados[inicio:inicio + len(df)])
+            inicio += len(df)
+
+
+def predecir(df):
+    """
+    Encola el DataFrame normalizado de una petición para el próximo micro-lote y espera su resultado.
+    """
+    futuro = Future()
+    _cola_predicciones.put((df, futuro))
+    return futuro.result(timeout=TIMEOUT_PREDICCION)
+
+
+def iniciar_servicio(path=MODELO_PATH, path_compilado=MODELO_COMPILADO_PATH):
+    """
+    Carga el modelo una sola vez (el compilado si está vigente) e inicia el hilo de micro-lotes.
+    :return: True si el modelo quedó cargado
+    """
+    global modelo
+    if modelo is None:
+        if not os.path.exists(path):
+            print(f"[{datetime.now().strftime('%H:%M:%S')}] Error: Modelo no encontrado")
+            return False
+        modelo = cargar_modelo_compilado(path, path_compilado) or cargar_modelo(path)
+        if modelo is None:
+            return False
+        threading.Thread(target=procesar_lotes, daemon=True).start()
+    return True
+
+
+@app.route('/predict', methods=['POST'])
+def predict():
+    """
+    Puntúa uno o varios estudiantes. Recibe un objeto de features o una lista de ellos y retorna,
+    en el mismo orden, Riesgo_Probabilidad, Indice_Riesgo y Nivel_Alerta (más el id si venía).
+    """
+    inicio = time.perf_counter()
+    datos = request.get_json(silent=True)
+    es_lista = isinstance(datos, list)
+    registros = datos if es_lista else [datos]
+
+    if not registros or not all(isinstance(r, dict) and r for r in registros):
+        return jsonify({'error': 'Se esperaba un objeto de features o una lista no vacía de ellos'}), 400
+    if len(registros) > MAX_REGISTROS_PETICION:
+        return jsonify({'error': f'Máximo {MAX_REGISTROS_PETICION} registros por petición'}), 400
+
+    try:
+        df = normalizar_registros(registros)
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': f'Registro no válido: {e}'}), 400
+
+    try:
+        resultados = predecir(df)
+    except Exception as e:
+        return jsonify({'error': f'Error durante la predicción de riesgo: {e}'}), 500
+
+    for registro, resultado in zip(registros, resultados):
+        if 'id' in registro:
+            resultado['id'] = registro['id']
+
+    with _estadisticas_lock:
+        _latencias.append(time.perf_counter() - inicio)
+    return jsonify(resultados if es_lista else resultados[0])
+
+
+@app.route('/predict/estadisticas', methods=['GET'])
+def estadisticas():
+    """
+    Latencia p50/p99 de las últimas peticiones y tamaño promedio de los micro-lotes.
+    """
+    with _estadisticas_lock:
+        latencias = np.array(list(_latencias)) * 1000
+        lotes = np.array(list(_tamanos_lote))
+    return jsonify({
+        'peticiones': len(latencias),
+        'latencia_p50_ms': float(np.percentile(latencias, 50)) if len(latencias) else None,
+        'latencia_p99_ms': float(np.percentile(latencias, 99)) if len(latencias) else None,
+        'lotes': len(lotes),
+        'filas_promedio_por_lote': float(lotes.mean()) if len(lotes) else None,
+    })
+
+
+if __name__ == '__main__':
+    if not iniciar_servicio():
+        raise SystemExit(1)
+    print(f"[{datetime.now().strftime('%H:%M:%S')}] Servicio de predicción listo en el puerto 5003")
+    app.run(host='127.0.0.1', port=5003, threaded=True)
@@ -0,0 +1,65 @@
+"""
+Benchmark: exportación JSON (/estudiantes) vs columnar (/estudiantes.npz) hasta el DataFrame del agente.
+
+Uso: python benchmarks/exportacion_columnar.py --registros 100000
+Genera una cohorte sintética en un directorio temporal, así no toca api/comovoy.db.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def medir(funcion, repeticiones):
+    """
+    Ejecuta la función `repeticiones` veces y retorna (mejor tiempo en segundos, último resultado).
+    """
+    mejor, resultado = float('inf'), None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor, resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compara la exportación JSON y columnar de estudiantes.')
+    parser.add_argument('--registros', type=int, default=100000)
+    parser.add_argument('--repeticiones', type=int, default=3)
+    args = parser.parse_args()
+
+    directorio = tempfile.mkdtemp(prefix='comovoy_bench_')
+    os.environ['COMOVOY_DATABASE_URI'] = 'sqlite:///' + os.path.join(directorio, 'comovoy.db')
+    sys.path[:0] = [os.path.join(RAIZ, 'api'), os.path.join(RAIZ, 'app_riesgo_academico')]
+
+    import json
+    import pandas as pd
+    from app import app
+    from generar_datos import poblar_db
+    from agente_prediccion import leer_columnar
+
+    poblar_db(args.registros, semilla=42, vectorizado=True)
+    cliente = app.test_client()
+
+    def via_json():
+        respuesta = cliente.get('/estudiantes')
+        return len(respuesta.data), pd.DataFrame(json.loads(respuesta.data))
+
+    def via_columnar():
+        respuesta = cliente.get('/estudiantes.npz')
+        return len(respuesta.data), leer_columnar(respuesta.data)[0]
+
+    t_json, (bytes_json, df_json) = medir(via_json, args.repeticiones)
+    t_npz, (bytes_npz, df_npz) = medir(via_columnar, args.repeticiones)
+
+    print(f"\nRegistros: {args.registros}")
+    print(f"JSON:     {t_json:8.3f}s  {bytes_json / 1e6:8.2f} MB  memoria DataFrame {df_json.memory_usage(deep=True).sum() / 1e6:8.2f} MB")
+    print(f"Columnar: {t_npz:8.3f}s  {bytes_npz / 1e6:8.2f} MB  memoria DataFrame {df_npz.memory_usage(deep=True).sum() / 1e6:8.2f} MB")
+    print(f"Aceleración: {t_json / t_npz:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
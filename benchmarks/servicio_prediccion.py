@@ -0,0 +1,81 @@
+"""
+Benchmark: latencia p50/p99 de POST /predict bajo carga concurrente, con y sin micro-lotes.
+
+Uso: python benchmarks/servicio_prediccion.py --clientes 32 --peticiones 50
+Usa el cliente de pruebas de Flask (sin red) y los estudiantes de static/dashboard_data.json.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DIR_AGENTE = os.path.join(RAIZ, 'app_riesgo_academico')
+
+
+def cargar_registros():
+    with open(os.path.join(DIR_AGENTE, 'static', 'dashboard_data.json'), encoding='utf-8') as f:
+        estudiantes = json.load(f)['estudiantes']
+    excluir = {'Riesgo_Probabilidad', 'Indice_Riesgo', 'Nivel_Alerta'}
+    return [{k: v for k, v in e.items() if k not in excluir} for e in estudiantes]
+
+
+def ejecutar_carga(servicio, registros, clientes, peticiones):
+    """
+    Lanza `clientes` hilos que envían `peticiones` POST /predict de un registro cada uno.
+    :return: (latencias en ms, duración total en segundos)
+    """
+    latencias = []
+    lock = threading.Lock()
+
+    def cliente(indice):
+        http = servicio.app.test_client()
+        propias = []
+        for i in range(peticiones):
+            registro = registros[(indice * peticiones + i) % len(registros)]
+            inicio = time.perf_counter()
+            respuesta = http.post('/predict', json=registro)
+            propias.append((time.perf_counter() - inicio) * 1000)
+            assert respuesta.status_code == 200, respuesta.data
+        with lock:
+            latencias.extend(propias)
+
+    hilos = [threading.Thread(target=cliente, args=(i,)) for i in range(clientes)]
+    inicio = time.perf_counter()
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    return np.array(latencias), time.perf_counter() - inicio
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Carga concurrente sobre el servicio de predicción.')
+    parser.add_argument('--clientes', type=int, default=32)
+    parser.add_argument('--peticiones', type=int, default=50)
+    args = parser.parse_args()
+
+    os.chdir(DIR_AGENTE)
+    sys.path.insert(0, DIR_AGENTE)
+    import servicio_prediccion as servicio
+
+    if not servicio.iniciar_servicio():
+        raise SystemExit(1)
+    registros = cargar_registros()
+
+    for ventana in (0, servicio.VENTANA_LOTE_MS):
+        servicio.VENTANA_LOTE_MS = ventana
+        servicio._tamanos_lote.clear()
+        latencias, duracion = ejecutar_carga(servicio, registros, args.clientes, args.peticiones)
+        lotes = np.array(servicio._tamanos_lote)
+        print(f"Ventana {ventana} ms: p50 {np.percentile(latencias, 50):7.2f} ms  "
+              f"p99 {np.percentile(latencias, 99):7.2f} ms  {len(latencias) / duracion:8.1f} pet/s  "
+              f"filas por lote {lotes.mean():.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,415 @@
+"""
+Suite de benchmarks de las rutas críticas: API, agente, dashboard y carga de datos de entrenamiento.
+
+Uso:
+    python benchmarks/suite.py                              # 1k, 100k y 1M estudiantes, compara con baseline.json
+    python benchmarks/suite.py --tamanos 1000 100000        # solo algunos tamaños
+    python benchmarks/suite.py --guardar-baseline           # guarda los resultados como nueva línea base
+    python benchmarks/suite.py --sin-arranque               # omite el reporte de arranque en frío
+
+Cada tamaño se ejecuta en un proceso aparte con su propia base sintética (api/generar_datos.py, semilla fija)
+en un directorio temporal: no toca api/comovoy.db ni los archivos del agente y no necesita red (las
+consultas HTTP del agente van a un servidor local en 127.0.0.1). Los resultados se escriben en JSON
+(--salida) y el proceso termina con código 1 si algún caso es más lento que la línea base más allá
+de la tolerancia.
+
+El reporte de arranque (casos arranque_*, filas=0) mide en intérpretes nuevos el tiempo de importar cada
+módulo de servicio y la latencia hasta la primera predicción (importar, cargar el modelo y puntuar), para
+que una importación pesada agregada al inicio de un módulo aparezca como regresión.
+"""
+import argparse
+import contextlib
+import json
+import logging
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DIR_API = os.path.join(RAIZ, 'api')
+DIR_AGENTE = os.path.join(RAIZ, 'app_riesgo_academico')
+
+TAMANOS = (1000, 100000, 1000000)
+SEMILLA = 42
+LOOKUPS_DETALLE = 1000
+BASELINE_PATH = os.path.join(RAIZ, 'benchmarks', 'baseline.json')
+SALIDA_PATH = os.path.join(RAIZ, 'benchmarks', 'resultados.json')
+# Un caso es regresión si tarda más de (1 + TOLERANCIA) veces lo registrado en la línea base y al menos
+# MARGEN_MINIMO_S más en términos absolutos (los casos de milisegundos varían mucho entre corridas)
+TOLERANCIA = 0.25
+MARGEN_MINIMO_S = 0.05
+
+# Módulos cuyo tiempo de importación se mide en frío: (caso, directorio de trabajo, módulo)
+MODULOS_ARRANQUE = (
+    ('arranque_import_api', DIR_API, 'app'),
+    ('arranque_import_agente', DIR_AGENTE, 'agente_prediccion'),
+    ('arranque_import_dashboard', DIR_AGENTE, 'dashboard_web'),
+    ('arranque_import_servicio_prediccion', DIR_AGENTE, 'servicio_prediccion'),
+    ('arranque_import_entrenamiento', DIR_AGENTE, 'entrenar_modelo'),
+)
+FILAS_PRIMERA_PREDICCION = 100
+
+# Programas de los intérpretes nuevos; imprimen una línea JSON con sus tiempos
+CODIGO_IMPORTACION = """
+import json, sys, time
+inicio = time.perf_counter()
+import {modulo}
+print(json.dumps({{'segundos': time.perf_counter() - inicio, 'modulos': len(sys.modules)}}))
+"""
+
+CODIGO_PRIMERA_PREDICCION = """
+import json, resource, time
+inicio = time.perf_counter()
+import agente_prediccion as agente
+t_import = time.perf_counter()
+if {compilado!r}:
+    from modelo_compilado import ModeloCompilado
+    modelo = ModeloCompilado.cargar({path!r})
+else:
+    modelo = agente.cargar_modelo({path!r})
+t_carga = time.perf_counter()
+from modelo_compilado import datos_de_paridad
+X = datos_de_paridad(list(modelo.feature_names_in_), {filas}, 0)
+t_datos = time.perf_counter()
+modelo.predict_proba(X)
+t_prediccion = time.perf_counter()
+print(json.dumps({{
+    'segundos': (t_carga - inicio) + (t_prediccion - t_datos),
+    'import_s': t_import - inicio, 'carga_s': t_carga - t_import, 'prediccion_s': t_prediccion - t_datos,
+    'rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+}}))
+"""
+
+
+def medir(funcion, repeticiones):
+    """
+    Ejecuta la función una vez sin medir (calentamiento: caché de SQLite, primeras peticiones de Flask)
+    y luego `repeticiones` veces. Retorna (mejor tiempo en segundos, último resultado).
+    """
+    funcion()
+    mejor, resultado = float('inf'), None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor, resultado
+
+
+def memoria_pico(funcion):
+    """
+    Pico de memoria asignada por Python durante una ejecución de la función, en MB.
+    Se mide en una ejecución aparte porque tracemalloc distorsiona los tiempos.
+    """
+    tracemalloc.start()
+    try:
+        funcion()
+        return tracemalloc.get_traced_memory()[1] / 1e6
+    finally:
+        tracemalloc.stop()
+
+
+@contextlib.contextmanager
+def silenciar():
+    """
+    Descarta los mensajes del agente y la API durante las mediciones.
+    """
+    with open(os.devnull, 'w') as nulo, contextlib.redirect_stdout(nulo):
+        yield
+
+
+def iniciar_servidor_local(app):
+    """
+    Sirve la API en 127.0.0.1 con un puerto libre, para medir al agente con requests real sin salir a la red.
+    :return: URL base
+    """
+    from werkzeug.serving import make_server
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    servidor = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{servidor.server_port}"
+
+
+def ejecutar_tamano(filas, repeticiones):
+    """
+    Genera una cohorte de `filas` estudiantes y mide todos los casos sobre ella.
+    :return: lista de resultados {'caso', 'filas', 'segundos', ...}
+    """
+    directorio = tempfile.mkdtemp(prefix=f'comovoy_bench_{filas}_')
+    db_path = os.path.join(directorio, 'comovoy.db')
+    os.environ['COMOVOY_DATABASE_URI'] = 'sqlite:///' + db_path
+    sys.path[:0] = [DIR_API, DIR_AGENTE]
+
+    import numpy as np
+    import pandas as pd
+    from app import app as app_api
+    from generar_datos import poblar_db
+    import agente_prediccion as agente
+    import dashboard_web
+
+    resultados = []
+
+    def registrar(caso, segundos, **extra):
+        resultados.append({'caso': caso, 'filas': filas, 'segundos': segundos, **extra})
+        detalles = '  '.join(f"{k}={v:.2f}" if isinstance(v, float) else f"{k}={v}" for k, v in extra.items())
+        print(f"[{filas:>8}] {caso:<38} {segundos:9.4f}s  {detalles}", flush=True)
+
+    try:
+        with silenciar():
+            poblar_db(filas, semilla=SEMILLA, vectorizado=True)
+
+        # API: GET /estudiantes completo (streaming JSON) con el cliente de pruebas de Flask
+        cliente_api = app_api.test_client()
+        t, cuerpo = medir(lambda: cliente_api.get('/estudiantes').data, repeticiones)
+        registrar('api_get_estudiantes', t, mb_respuesta=len(cuerpo) / 1e6,
+                  memoria_pico_mb=memoria_pico(lambda: cliente_api.get('/estudiantes').data))
+        del cuerpo
+
+        # Agente: descarga por HTTP local y construcción del DataFrame (JSON y columnar)
+        url_api = iniciar_servidor_local(app_api)
+
+        def json_a_dataframe():
+            with silenciar():
+                return pd.DataFrame(agente.obtener_datos_de_api(url_api, agente.ENDPOINT_ESTUDIANTES))
+
+        def columnar_a_dataframe():
+            with silenciar():
+                return agente.obtener_datos_columnares(url_api, agente.ENDPOINT_ESTUDIANTES_COLUMNAR)[0]
+
+        t, df = medir(json_a_dataframe, repeticiones)
+        registrar('agente_json_dataframe', t, memoria_pico_mb=memoria_pico(json_a_dataframe))
+        del df
+        t, df = medir(columnar_a_dataframe, repeticiones)
+        registrar('agente_columnar_dataframe', t, memoria_pico_mb=memoria_pico(columnar_a_dataframe))
+
+        # Agente: predicción y reglas de riesgo sobre toda la cohorte
+        with silenciar():
+            modelo = agente.cargar_modelo(os.path.join(DIR_AGENTE, agente.MODELO_PATH))
+
+        def puntuar():
+            with silenciar():
+                return agente.calcular_indice_riesgo(df, modelo)
+
+        t, df_riesgo = medir(puntuar, repeticiones)
+        registrar('agente_calcular_indice_riesgo', t, filas_por_segundo=filas / t)
+
+        # Agente: alertas y snapshot del dashboard, escritos en el directorio temporal
+        trabajo = os.path.join(directorio, 'agente')
+        os.makedirs(os.path.join(trabajo, 'static'))
+        os.makedirs(os.path.join(trabajo, 'logs'))
+        os.chdir(trabajo)
+        snapshot_path = os.path.join(trabajo, agente.REPORTE_DASHBOARD_PATH)
+
+        def escribir_snapshot():
+            # Sin el snapshot anterior, para medir siempre una escritura completa
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(snapshot_path)
+            with silenciar():
+                agente.generar_alertas_reportes(df_riesgo)
+
+        t, _ = medir(escribir_snapshot, repeticiones)
+        registrar('agente_snapshot_dashboard', t, mb_snapshot=os.path.getsize(snapshot_path) / 1e6)
+
+        # Dashboard: primera consulta (carga e indexa el snapshot) y consultas /detalle/<id> con el índice listo
+        dashboard_web.DATA_PATH = snapshot_path
+        cliente_dashboard = dashboard_web.app.test_client()
+        ids = np.random.default_rng(SEMILLA).choice(df_riesgo['id'].to_numpy(), LOOKUPS_DETALLE)
+
+        inicio = time.perf_counter()
+        assert cliente_dashboard.get(f'/detalle/{ids[0]}').status_code == 200
+        carga_snapshot = time.perf_counter() - inicio
+
+        latencias = []
+        for id_estudiante in ids:
+            inicio = time.perf_counter()
+            respuesta = cliente_dashboard.get(f'/detalle/{id_estudiante}')
+            latencias.append(time.perf_counter() - inicio)
+            assert respuesta.status_code == 200
+        latencias = np.array(latencias) * 1000
+        registrar('dashboard_detalle', float(latencias.sum() / 1000), consultas=LOOKUPS_DETALLE,
+                  p50_ms=float(np.percentile(latencias, 50)), p99_ms=float(np.percentile(latencias, 99)),
+                  carga_snapshot_s=carga_snapshot)
+
+        # Entrenamiento: lectura por bloques de la base (entrenar_modelo requiere scikit-learn y scipy)
+        try:
+            import entrenar_modelo
+        except ImportError as e:
+            print(f"[{filas:>8}] entrenamiento_carga_db omitido: {e}", flush=True)
+        else:
+            def cargar_db():
+                with silenciar():
+                    return entrenar_modelo.cargar_datos_db(db_path, entrenar_modelo.ALL_FEATURES,
+                                                           entrenar_modelo.TARGET_COLUMN)
+
+            t, _ = medir(cargar_db, repeticiones)
+            registrar('entrenamiento_carga_db', t, filas_por_segundo=filas / t)
+    finally:
+        os.chdir(RAIZ)
+        shutil.rmtree(directorio, ignore_errors=True)
+
+    return resultados
+
+
+def ejecutar_en_frio(codigo, directorio):
+    """
+    Corre el programa en un intérprete nuevo (sin módulos ni caché de importación en memoria) con la base
+    apuntando a SQLite en memoria, para no tocar api/comovoy.db.
+    :return: diccionario impreso por el programa en su última línea
+    """
+    entorno = dict(os.environ, COMOVOY_DATABASE_URI='sqlite://')
+    salida = subprocess.run([sys.executable, '-c', codigo], cwd=directorio, env=entorno,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(salida.strip().splitlines()[-1])
+
+
+def ejecutar_arranque(repeticiones):
+    """
+    Tiempo de importación de cada módulo de servicio y latencia hasta la primera predicción con el
+    Pipeline y con el modelo compilado. Cada medición es el mejor de `repeticiones` intérpretes nuevos;
+    la primera corrida solo calienta el caché de archivos del sistema operativo.
+    :return: lista de resultados {'caso', 'filas': 0, 'segundos', ...}
+    """
+    resultados = []
+
+    def registrar(caso, corridas):
+        mejor = min(corridas, key=lambda c: c['segundos'])
+        resultados.append({'caso': caso, 'filas': 0, **mejor})
+        detalles = '  '.join(f"{k}={v:.2f}" if isinstance(v, float) else f"{k}={v}"
+                             for k, v in mejor.items() if k != 'segundos')
+        print(f"[{'arranque':>8}] {caso:<38} {mejor['segundos']:9.4f}s  {detalles}", flush=True)
+
+    def medir_en_frio(caso, codigo, directorio):
+        try:
+            ejecutar_en_frio(codigo, directorio)
+            registrar(caso, [ejecutar_en_frio(codigo, directorio) for _ in range(repeticiones)])
+        except subprocess.CalledProcessError as e:
+            error = (e.stderr or '').strip().splitlines()
+            print(f"[{'arranque':>8}] {caso} omitido: {error[-1] if error else e}", flush=True)
+
+    for caso, directorio, modulo in MODULOS_ARRANQUE:
+        medir_en_frio(caso, CODIGO_IMPORTACION.format(modulo=modulo), directorio)
+
+    sys.path.insert(0, DIR_AGENTE)
+    from agente_prediccion import MODELO_PATH
+    from modelo_compilado import MODELO_COMPILADO_PATH
+
+    for caso, path, compilado in (('arranque_primera_prediccion', MODELO_PATH, False),
+                                  ('arranque_primera_prediccion_compilado', MODELO_COMPILADO_PATH, True)):
+        if not os.path.exists(os.path.join(DIR_AGENTE, path)):
+            print(f"[{'arranque':>8}] {caso} omitido: no existe {path}", flush=True)
+            continue
+        codigo = CODIGO_PRIMERA_PREDICCION.format(compilado=compilado, path=path, filas=FILAS_PRIMERA_PREDICCION)
+        medir_en_frio(caso, codigo, DIR_AGENTE)
+    return resultados
+
+
+def metadatos():
+    """
+    Entorno de la corrida, para saber si dos resultados son comparables.
+    """
+    import numpy as np
+    import pandas as pd
+    import sklearn
+
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=RAIZ,
+                                capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'cpus': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'sklearn': sklearn.__version__,
+    }
+
+
+def comparar(resultados, baseline, tolerancia):
+    """
+    Compara los tiempos con la línea base por (caso, filas) e imprime la tabla.
+    :return: lista de regresiones
+    """
+    referencia = {(r['caso'], r['filas']): r['segundos'] for r in baseline['resultados']}
+    regresiones = []
+    print(f"\n{'caso':<40}{'filas':>9}{'actual (s)':>13}{'base (s)':>12}{'razón':>8}")
+    for r in resultados:
+        base = referencia.get((r['caso'], r['filas']))
+        if base is None:
+            print(f"{r['caso']:<40}{r['filas']:>9}{r['segundos']:>13.4f}{'-':>12}{'-':>8}")
+            continue
+        razon = r['segundos'] / base if base else float('inf')
+        estado = ''
+        if razon > 1 + tolerancia and r['segundos'] - base > MARGEN_MINIMO_S:
+            estado = '  REGRESIÓN'
+            regresiones.append(r)
+        elif razon < 1 - tolerancia:
+            estado = '  mejora'
+        print(f"{r['caso']:<40}{r['filas']:>9}{r['segundos']:>13.4f}{base:>12.4f}{razon:>8.2f}{estado}")
+    return regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks de las rutas críticas de ComoVoy.')
+    parser.add_argument('--tamanos', type=int, nargs='+', default=list(TAMANOS),
+                        help='Cantidades de estudiantes a generar')
+    parser.add_argument('--repeticiones', type=int, default=3, help='Se reporta el mejor tiempo')
+    parser.add_argument('--salida', default=SALIDA_PATH, help='Archivo JSON de resultados')
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='Línea base con la que comparar')
+    parser.add_argument('--guardar-baseline', action='store_true',
+                        help='Guarda los resultados como línea base en vez de comparar')
+    parser.add_argument('--tolerancia', type=float, default=TOLERANCIA)
+    parser.add_argument('--sin-arranque', action='store_true', help='Omite el reporte de arranque en frío')
+    parser.add_argument('--interno', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.interno is not None:
+        # Proceso hijo: un solo tamaño, resultados a --salida
+        resultados = ejecutar_tamano(args.interno, args.repeticiones)
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            json.dump(resultados, f)
+        return
+
+    resultados = [] if args.sin_arranque else ejecutar_arranque(args.repeticiones)
+    for filas in args.tamanos:
+        with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as tmp:
+            salida_hijo = tmp.name
+        try:
+            subprocess.run([sys.executable, os.path.abspath(__file__), '--interno', str(filas),
+                            '--repeticiones', str(args.repeticiones), '--salida', salida_hijo], check=True)
+            with open(salida_hijo, encoding='utf-8') as f:
+                resultados.extend(json.load(f))
+        finally:
+            os.remove(salida_hijo)
+
+    corrida = {'meta': metadatos(), 'resultados': resultados}
+    destino = args.baseline if args.guardar_baseline else args.salida
+    with open(destino, 'w', encoding='utf-8') as f:
+        json.dump(corrida, f, indent=2, ensure_ascii=False)
+    print(f"\nResultados guardados en: {destino}")
+    if args.guardar_baseline:
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"No hay línea base en {args.baseline}; se puede crear con --guardar-baseline")
+        return
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    regresiones = comparar(resultados, baseline, args.tolerancia)
+    if regresiones:
+        print(f"\n{len(regresiones)} caso(s) más lentos que la línea base (tolerancia {args.tolerancia:.0%})")
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,32 @@
+"""
+Configuración común de las pruebas. Como en los benchmarks, los módulos de api/ y app_riesgo_academico/
+se importan por nombre y la API usa una base SQLite temporal (COMOVOY_DATABASE_URI se lee al importar api/app.py).
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+RAIZ = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+os.environ['COMOVOY_DATABASE_URI'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='comovoy_tests_'), 'comovoy.db')
+sys.path[:0] = [os.path.join(RAIZ, 'api'), os.path.join(RAIZ, 'app_riesgo_academico')]
+
+ESTUDIANTES_PRUEBA = 30
+
+
+@pytest.fixture
+def api():
+    """
+    Módulo de la API con la base regenerada: ESTUDIANTES_PRUEBA estudiantes, todos con la versión 2.
+    """
+    import app as modulo_api
+    from generar_datos import poblar_db
+
+    poblar_db(ESTUDIANTES_PRUEBA, semilla=0, vectorizado=True)
+    return modulo_api
+
+
+@pytest.fixture
+def cliente(api):
+    return api.app.test_client()
@@ -0,0 +1,46 @@
+"""
+Transiciones de alertas entre ciclos del agente (calcular_eventos_alerta).
+"""
+import pandas as pd
+
+from agente_prediccion import DELTA_ESCALAMIENTO_IR, UMBRAL_ALERTA, calcular_eventos_alerta, cargar_estado_alertas
+
+
+def ciclo(filas):
+    """
+    df_riesgo y df_alertas de un ciclo a partir de (id, Indice_Riesgo); la probabilidad es IR / 100.
+    """
+    df_riesgo = pd.DataFrame([
+        {'id': i, 'Carrera': 'Medicina', 'Nivel_Alerta': 'ALTO' if ir >= UMBRAL_ALERTA * 100 else 'BAJO',
+         'Indice_Riesgo': ir, 'Riesgo_Probabilidad': ir / 100}
+        for i, ir in filas
+    ])
+    return df_riesgo, df_riesgo[df_riesgo['Riesgo_Probabilidad'] >= UMBRAL_ALERTA]
+
+
+def eventos_por_id(eventos):
+    return dict(zip(eventos['id'], eventos['Evento']))
+
+
+def test_transiciones_de_alerta():
+    estado = cargar_estado_alertas(None)
+
+    eventos = calcular_eventos_alerta(*ciclo([(1, 80), (2, 90), (3, 20)]), estado)
+    assert eventos_por_id(eventos) == {1: 'NUEVA', 2: 'NUEVA'}
+
+    # Un alza menor a DELTA_ESCALAMIENTO_IR no se anuncia; una mayor o igual es ESCALADA
+    eventos = calcular_eventos_alerta(*ciclo([(1, 80 + DELTA_ESCALAMIENTO_IR - 1), (2, 90 + DELTA_ESCALAMIENTO_IR),
+                                              (3, 20)]), estado)
+    assert eventos_por_id(eventos) == {2: 'ESCALADA'}
+    assert estado['alertas'].loc[1, 'Indice_Riesgo'] == 80
+
+    # El 1 baja del umbral y el 2 deja de estar en los datos (eliminado): ambas alertas se resuelven
+    eventos = calcular_eventos_alerta(*ciclo([(1, 40), (3, 20)]), estado)
+    assert eventos_por_id(eventos) == {1: 'RESUELTA', 2: 'RESUELTA'}
+    resueltas = eventos.set_index('id')
+    assert resueltas.loc[1, 'Indice_Riesgo'] == 40
+    assert resueltas.loc[2, 'Indice_Riesgo'] == 90 + DELTA_ESCALAMIENTO_IR
+    assert estado['alertas'].empty
+
+    # Sin cambios no hay eventos
+    assert calcular_eventos_alerta(*ciclo([(1, 40), (3, 20)]), estado).empty
@@ -0,0 +1,137 @@
+"""
+Pruebas de la API de datos (api/app.py) con el cliente de pruebas de Flask.
+"""
+import pandas as pd
+import pytest
+
+from conftest import ESTUDIANTES_PRUEBA
+
+
+def test_patch_reporta_el_estado_de_cada_fila(cliente):
+    respuesta = cliente.patch('/estudiantes', json=[
+        {'id': 1, 'C1': 10},
+        {'id': 2, 'Carrera': 'Otra', 'NEM': 6},
+        {'id': 999999, 'C1': 10},
+        {'id': True, 'C1': 10},
+        {'id': 3, 'campo_inexistente': 1},
+        {'id': 4, 'NEM': 'alto'},
+        {'id': 5},
+    ])
+    assert respuesta.status_code == 200
+    datos = respuesta.get_json()
+    estados = [(r['id'], r['estado']) for r in datos['resultados']]
+    assert estados == [(1, 'actualizado'), (2, 'actualizado'), (999999, 'no_encontrado'), (True, 'invalido'),
+                       (3, 'invalido'), (4, 'invalido'), (5, 'invalido')]
+    assert datos['actualizados'] == 2
+
+    assert cliente.get('/estudiante/1').get_json()['estudiante']['C1'] == 10
+    segundo = cliente.get('/estudiante/2').get_json()['estudiante']
+    assert (segundo['Carrera'], segundo['NEM'], segundo['version']) == ('Otra', 6.0, datos['version'])
+    # Las filas inválidas no se escriben
+    assert cliente.get('/estudiante/4').get_json()['estudiante']['NEM'] != 'alto'
+
+
+def test_patch_rechaza_ids_repetidos(cliente):
+    original = cliente.get('/estudiante/1').get_json()['estudiante']['C1']
+    respuesta = cliente.patch('/estudiantes', json=[{'id': 1, 'C1': 11}, {'id': 2, 'C1': 12}, {'id': 1, 'C1': 13}])
+    datos = respuesta.get_json()
+
+    assert [(r['id'], r['estado']) for r in datos['resultados']] == [(1, 'invalido'), (2, 'actualizado'), (1, 'invalido')]
+    assert datos['actualizados'] == 1
+    assert cliente.get('/estudiante/1').get_json()['estudiante']['C1'] == original
+
+
+def test_patch_sin_filas_validas_no_escribe(cliente):
+    respuesta = cliente.patch('/estudiantes', json=[{'id': 999999, 'C1': 1}, {'id': 'x', 'C1': 1}])
+    assert respuesta.get_json() == {
+        'actualizados': 0,
+        'resultados': [{'id': 999999, 'estado': 'no_encontrado'},
+                       {'id': 'x', 'estado': 'invalido', 'error': 'falta un id entero'}],
+    }
+    assert cliente.get('/estudiantes?since=2').get_json()['estudiantes'] == []
+
+
+def test_patch_valida_el_cuerpo(cliente):
+    assert cliente.patch('/estudiantes', json=[]).status_code == 400
+    assert cliente.patch('/estudiantes', json={'id': 1}).status_code == 400
+
+
+def test_paginacion_por_cursor(cliente):
+    ids, after_id = [], 0
+    while after_id is not None:
+        pagina = cliente.get(f'/estudiantes?limit=12&after_id={after_id}&fields=id,C1').get_json()
+        assert all(set(e) == {'id', 'C1'} for e in pagina['estudiantes'])
+        ids += [e['id'] for e in pagina['estudiantes']]
+        after_id = pagina['siguiente_after_id']
+    assert ids == list(range(1, ESTUDIANTES_PRUEBA + 1))
+
+    # Una página completa que termina justo en el último id trae cursor; la siguiente viene vacía y sin él
+    assert cliente.get(f'/estudiantes?limit=10&after_id={ESTUDIANTES_PRUEBA - 10}').get_json()['siguiente_after_id'] \
+        == ESTUDIANTES_PRUEBA
+    assert cliente.get(f'/estudiantes?limit=10&after_id={ESTUDIANTES_PRUEBA}').get_json() \
+        == {'estudiantes': [], 'siguiente_after_id': None}
+
+
+@pytest.mark.parametrize('consulta', [
+    'limit=abc', 'limit=0', 'limit=-1', 'limit=5001', 'limit=1.5', 'after_id=x', 'after_id=-1', 'since=x',
+    'since=-1', 'since=0&limit=10', 'fields=id,no_existe',
+])
+def test_parametros_invalidos_responden_400(cliente, consulta):
+    respuesta = cliente.get(f'/estudiantes?{consulta}')
+    assert respuesta.status_code == 400
+    assert 'error' in respuesta.get_json()
+
+
+@pytest.mark.parametrize('consulta', ['limit=abc', 'limit=0', 'after_id=-1', 'version=x'])
+def test_parametros_invalidos_columnar_responden_400(cliente, consulta):
+    assert cliente.get(f'/estudiantes.npz?{consulta}').status_code == 400
+
+
+def test_feed_de_cambios_con_eliminados(cliente):
+    version = cliente.get('/estudiantes?since=0').get_json()['version']
+    assert cliente.get(f'/estudiantes?since={version}').get_json() == {'estudiantes': [], 'eliminados': [], 'version': version}
+
+    cliente.patch('/estudiantes', json=[{'id': 1, 'C1': 20}])
+    assert cliente.delete('/estudiante/2').status_code == 200
+
+    cambios = cliente.get(f'/estudiantes?since={version}').get_json()
+    assert [(e['id'], e['C1']) for e in cambios['estudiantes']] == [(1, 20)]
+    assert cambios['eliminados'] == [2]
+    assert cambios['version'] == version + 2
+
+    # Desde la versión del PATCH solo queda pendiente la eliminación
+    intermedio = cliente.get(f'/estudiantes?since={version + 1}').get_json()
+    assert (intermedio['estudiantes'], intermedio['eliminados']) == ([], [2])
+
+    # PUT no puede mover la versión ni el id
+    assert cliente.put('/estudiante/1', json={'version': 0}).status_code == 404
+    assert cliente.get('/estudiante/1').get_json()['estudiante']['version'] == version + 1
+
+
+def test_feed_desde_version_futura_pide_recarga(cliente):
+    respuesta = cliente.get('/estudiantes?since=1000')
+    assert respuesta.status_code == 410
+    assert respuesta.get_json()['version'] == cliente.get('/estudiantes?since=0').get_json()['version']
+
+
+def test_exportacion_columnar_ida_y_vuelta(cliente):
+    from agente_prediccion import leer_columnar
+
+    # Nulos en una columna de texto y en una numérica
+    cliente.patch('/estudiantes', json=[{'id': 3, 'Carrera': None, 'C1': None}])
+    esperado = pd.DataFrame(cliente.get('/estudiantes').get_json())
+
+    paginas, after_id = [], 0
+    while after_id is not None:
+        respuesta = cliente.get(f'/estudiantes.npz?limit=12&after_id={after_id}')
+        df, version = leer_columnar(respuesta.data)
+        paginas.append(df)
+        after_id = respuesta.headers.get('X-Siguiente-After-Id')
+    assert len(paginas) == 3
+    assert version == cliente.get('/estudiantes?since=0').get_json()['version']
+
+    obtenido = pd.concat(paginas, ignore_index=True)[list(esperado.columns)]
+    for columna in esperado.columns:
+        assert [None if pd.isna(v) else v for v in obtenido[columna].tolist()] \
+            == [None if pd.isna(v) else v for v in esperado[columna].tolist()], columna
+    assert obtenido.loc[obtenido['id'] == 3, 'Carrera'].isna().all()
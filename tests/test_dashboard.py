@@ -0,0 +1,47 @@
+"""
+Pruebas del dashboard (dashboard_web.py) sobre un snapshot escrito en un archivo temporal.
+"""
+import json
+
+import pytest
+
+import dashboard_web
+
+ESTUDIANTES = [
+    {"id": 1, "Carrera": "Medicina", "Nivel_Alerta": "Alto", "Indice_Riesgo": 90},
+    {"id": 2, "Carrera": "Medicina", "Nivel_Alerta": "Bajo", "Indice_Riesgo": 10},
+    {"id": 3, "Carrera": None, "Nivel_Alerta": "Medio", "Indice_Riesgo": 50},
+]
+
+
+@pytest.fixture
+def cliente(tmp_path, monkeypatch):
+    path = tmp_path / "dashboard_data.json"
+    path.write_text(json.dumps({"hash": "abc123", "estudiantes": ESTUDIANTES}))
+    monkeypatch.setattr(dashboard_web, "DATA_PATH", str(path))
+    monkeypatch.setattr(dashboard_web, "_snapshot", {**dashboard_web._snapshot, "firma": None})
+    return dashboard_web.app.test_client()
+
+
+def test_dashboard_data_responde_304_con_el_mismo_etag(cliente):
+    respuesta = cliente.get("/dashboard_data")
+    assert respuesta.status_code == 200
+    assert respuesta.headers["ETag"] == '"abc123"'
+    assert respuesta.get_json()["estudiantes"] == ESTUDIANTES
+
+    condicional = cliente.get("/dashboard_data", headers={"If-None-Match": respuesta.headers["ETag"]})
+    assert condicional.status_code == 304
+    assert condicional.data == b""
+    assert cliente.get("/dashboard_data", headers={"If-None-Match": '"otro"'}).status_code == 200
+
+
+def test_api_estudiantes_filtra_y_pagina(cliente):
+    datos = cliente.get("/api/estudiantes?carrera=Medicina&limit=1&page=2").get_json()
+    assert [t["id"] for t in datos["estudiantes"]] == [2]
+    assert datos["total"] == 2
+    assert [t["id"] for t in cliente.get("/api/estudiantes?sin_carrera=1").get_json()["estudiantes"]] == [3]
+
+
+@pytest.mark.parametrize("consulta", ["page=x", "limit=1.5", "page=nan"])
+def test_api_estudiantes_rechaza_numeros_invalidos(cliente, consulta):
+    assert cliente.get(f"/api/estudiantes?{consulta}").status_code == 400
@@ -0,0 +1,66 @@
+"""
+Registro y compactación del historial de riesgo (historial_riesgo.py) sobre una base temporal.
+"""
+import pandas as pd
+import pytest
+
+import historial_riesgo
+from historial_riesgo import RETENCION_HORAS_SEGUNDOS, RETENCION_PUNTOS_SEGUNDOS, SEGUNDOS_DIA, SEGUNDOS_HORA
+
+INICIO = 1_700_000_000 // SEGUNDOS_DIA * SEGUNDOS_DIA
+
+
+@pytest.fixture
+def conexion(tmp_path):
+    conexion = historial_riesgo.conectar(str(tmp_path / 'historial.db'))
+    yield conexion
+    conexion.close()
+
+
+def puntajes(probabilidades):
+    return pd.DataFrame({'id': list(probabilidades), 'Riesgo_Probabilidad': list(probabilidades.values()),
+                         'Nivel_Alerta': 'BAJO'})
+
+
+def test_solo_registra_cambios(conexion):
+    assert historial_riesgo.registrar_puntajes(conexion, puntajes({1: 0.2, 2: 0.3}), 'v1', INICIO) == 2
+    assert historial_riesgo.registrar_puntajes(conexion, puntajes({1: 0.2, 2: 0.5}), 'v1', INICIO + 60) == 1
+    # Otra versión del modelo registra todos los puntajes aunque no cambien
+    assert historial_riesgo.registrar_puntajes(conexion, puntajes({1: 0.2, 2: 0.5}), 'v2', INICIO + 120) == 2
+
+
+def test_compacta_puntos_en_horas_y_horas_en_dias(conexion):
+    for minuto, probabilidad in enumerate([0.1, 0.3, 0.2]):
+        historial_riesgo.registrar_puntajes(conexion, puntajes({1: probabilidad}), 'v1', INICIO + minuto * 60)
+    historial_riesgo.registrar_puntajes(conexion, puntajes({1: 0.6}), 'v1', INICIO + SEGUNDOS_HORA)
+
+    # Aún dentro de la retención de puntos crudos: nada que compactar
+    assert historial_riesgo.compactar_historial(conexion, ahora=INICIO + SEGUNDOS_DIA) == (0, 0, 0)
+
+    assert historial_riesgo.compactar_historial(conexion, ahora=INICIO + RETENCION_PUNTOS_SEGUNDOS + 2 * SEGUNDOS_HORA) \
+        == (4, 0, 0)
+    serie = historial_riesgo.tendencia_estudiante(conexion, 1)
+    assert [(p['tiempo'], p['resolucion']) for p in serie] == [(INICIO, 'hora'), (INICIO + SEGUNDOS_HORA, 'hora')]
+    assert (serie[0]['minimo'], serie[0]['maximo']) == (0.1, 0.3)
+    assert serie[0]['Riesgo_Probabilidad'] == pytest.approx(0.2)
+
+    assert historial_riesgo.compactar_historial(conexion, ahora=INICIO + RETENCION_HORAS_SEGUNDOS + SEGUNDOS_DIA) \
+        == (0, 2, 0)
+    [dia] = historial_riesgo.tendencia_estudiante(conexion, 1)
+    assert (dia['tiempo'], dia['resolucion'], dia['minimo'], dia['maximo']) == (INICIO, 'dia', 0.1, 0.6)
+    assert dia['Riesgo_Probabilidad'] == pytest.approx(0.3)
+
+
+def test_compactar_borra_estudiantes_eliminados(conexion):
+    historial_riesgo.registrar_puntajes(conexion, puntajes({1: 0.2, 2: 0.3}), 'v1', INICIO)
+    historial_riesgo.compactar_historial(conexion, ahora=INICIO + RETENCION_PUNTOS_SEGUNDOS + SEGUNDOS_HORA)
+    historial_riesgo.registrar_puntajes(conexion, puntajes({1: 0.2, 2: 0.9}), 'v1', INICIO + RETENCION_PUNTOS_SEGUNDOS)
+
+    assert [e['id'] for e in historial_riesgo.estudiantes_empeorados(conexion, INICIO, delta_minimo=0.5)] == [2]
+
+    eliminados = historial_riesgo.ids_registrados(conexion) - {1}
+    assert historial_riesgo.compactar_historial(conexion, ahora=INICIO + RETENCION_PUNTOS_SEGUNDOS, eliminados=eliminados) \
+        == (0, 0, 1)
+    assert historial_riesgo.ids_registrados(conexion) == {1}
+    assert historial_riesgo.tendencia_estudiante(conexion, 2) == []
+    assert historial_riesgo.estudiantes_empeorados(conexion, INICIO, delta_minimo=0.5) == []
@@ -0,0 +1,107 @@
+"""
+Paridad entre el modelo compilado (modelo_compilado.py) y el Pipeline de sklearn del que se exporta.
+"""
+import os
+import sys
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app_riesgo_academico'))
+
+from entrenar_modelo import ALL_FEATURES, CATEGORICAL_FEATURES, NUMERIC_FEATURES, construir_pipeline  # noqa: E402
+from agente_prediccion import cargar_modelo_compilado  # noqa: E402
+from modelo_compilado import FILAS_POR_BLOQUE, TOLERANCIA_PARIDAD, ModeloCompilado, exportar  # noqa: E402
+from puntuacion_paralela import FILAS_MINIMAS_PARALELO, ModeloParalelo  # noqa: E402
+
+
+def datos_sinteticos(n, semilla, categorias_extra=()):
+    """
+    Frame con todas las features del modelo: numéricas con ~10% de NaN y categóricas con ~5% de nulos.
+    Carrera tiene más categorías que max_categories del OneHotEncoder, así se ejercita la columna de infrecuentes.
+    """
+    rng = np.random.default_rng(semilla)
+    datos = {columna: rng.normal(50, 15, n) for columna in NUMERIC_FEATURES}
+    for columna in NUMERIC_FEATURES:
+        datos[columna][rng.random(n) < 0.10] = np.nan
+
+    for columna in CATEGORICAL_FEATURES:
+        cantidad = 14 if columna == 'Carrera' else 3
+        opciones = [f'{columna}_{i}' for i in range(cantidad)] + list(categorias_extra)
+        valores = rng.choice(opciones, n).astype(object)
+        valores[rng.random(n) < 0.05] = None
+        datos[columna] = valores
+    return pd.DataFrame(datos)[ALL_FEATURES]
+
+
+@pytest.fixture(scope='module')
+def pipeline():
+    X = datos_sinteticos(400, semilla=0)
+    # El objetivo depende de numéricas y categóricas, así un error en cualquiera de las dos codificaciones cambia la predicción
+    puntaje = np.nan_to_num(X['C1'].to_numpy(), nan=50) + (X['Jornada'] == 'Jornada_0') * 10 \
+        + X['Carrera'].isin(['Carrera_0', 'Carrera_1']) * 10 + X['Carrera'].isna() * 15
+    y = (puntaje > 55).astype(int)
+    modelo = construir_pipeline()
+    modelo.set_params(clasificador__n_estimators=30, clasificador__max_depth=4)
+    return modelo.fit(X, y)
+
+
+@pytest.fixture(scope='module')
+def X_evaluacion():
+    # Más filas que FILAS_POR_BLOQUE para recorrer varios bloques, con categorías no vistas en el ajuste
+    return datos_sinteticos(FILAS_POR_BLOQUE * 2 + 17, semilla=1, categorias_extra=('No_Vista',))
+
+
+def test_paridad_con_pipeline(pipeline, X_evaluacion):
+    compilado = ModeloCompilado.desde_pipeline(pipeline)
+
+    esperado = pipeline.predict_proba(X_evaluacion)
+    np.testing.assert_allclose(compilado.predict_proba(X_evaluacion), esperado, rtol=0, atol=TOLERANCIA_PARIDAD)
+    np.testing.assert_allclose(compilado.predict_proba(X_evaluacion.head(1)), esperado[:1], rtol=0, atol=TOLERANCIA_PARIDAD)
+
+
+@pytest.mark.parametrize('mapear', [True, False])
+def test_paridad_tras_exportar_y_cargar(pipeline, X_evaluacion, tmp_path, mapear):
+    path_modelo = str(tmp_path / 'comovoy.joblib')
+    path_compilado = str(tmp_path / 'comovoy_compilado.npz')
+    joblib.dump(pipeline, path_modelo)
+
+    assert exportar(path_modelo, path_compilado, df_paridad=X_evaluacion) is not None
+    cargado = ModeloCompilado.cargar(path_compilado, mapear=mapear)
+
+    assert list(cargado.feature_names_in_) == list(pipeline.feature_names_in_)
+    np.testing.assert_allclose(cargado.predict_proba(X_evaluacion), pipeline.predict_proba(X_evaluacion),
+                               rtol=0, atol=TOLERANCIA_PARIDAD)
+
+
+def _modelo_del_worker():
+    """
+    Se ejecuta dentro de un worker del pool: tipo del modelo cargado y archivo sobre el que están mapeados sus arreglos.
+    """
+    import puntuacion_paralela
+    modelo = puntuacion_paralela._modelo_worker
+    arreglo = modelo.arreglos['arbol_umbral']
+    return type(modelo).__name__, arreglo.filename if isinstance(arreglo, np.memmap) else None
+
+
+def test_pool_usa_el_modelo_compilado_mapeado(pipeline, tmp_path):
+    path_modelo = str(tmp_path / 'comovoy.joblib')
+    path_compilado = str(tmp_path / 'comovoy_compilado.npz')
+    joblib.dump(pipeline, path_modelo)
+    exportar(path_modelo, path_compilado)
+
+    # Igual que el agente: el .npz va al pool solo si corresponde a la versión del Pipeline
+    compilado = cargar_modelo_compilado(path_modelo, path_compilado)
+    assert compilado is not None
+    X = datos_sinteticos(FILAS_MINIMAS_PARALELO + 100, semilla=2)
+    with ModeloParalelo(path_compilado, 2, compilado) as paralelo:
+        np.testing.assert_allclose(paralelo.predict_proba(X), pipeline.predict_proba(X), rtol=0, atol=TOLERANCIA_PARIDAD)
+        tipo, archivo = paralelo._pool.submit(_modelo_del_worker).result()
+    assert tipo == 'ModeloCompilado'
+    assert os.path.samefile(archivo, path_compilado)
+
+    # Con el Pipeline reentrenado el .npz queda desactualizado y se vuelve al Pipeline
+    joblib.dump(construir_pipeline(), path_modelo)
+    assert cargar_modelo_compilado(path_modelo, path_compilado) is None